@@ -0,0 +1,221 @@
+import argparse
+import bisect
+import json
+import os
+import random
+import re
+import time
+from functools import lru_cache
+
+from change_detection import load_delta
+from normalize import canonical_category, load_classifier
+
+# Matches alert subscriptions (execution/alerts.json, written by /api/alerts) against the
+# listings a scrape run surfaced, and groups the hits into one digest per subscriber.
+#
+# Subscriptions are indexed once per run instead of being tested against every product:
+#   - without keywords: bucketed by category ("All" is its own bucket)
+#   - with keywords:    bucketed by one token of each keyword phrase
+# Every bucket is sorted by minDiscount, so a product only walks the prefix of each bucket
+# whose threshold it meets; the remaining checks run on those candidates alone.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ALERTS_FILE = os.path.join(BASE_DIR, "alerts.json")
+
+ALL = "All"
+SOURCES = {"daraz": "Daraz", "priceoye": "PriceOye"}
+DIGEST_LIMIT = 20   # Deals per subscriber digest, best discount first
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return set(TOKEN_RE.findall((text or "").lower()))
+
+
+def keyword_phrases(keywords):
+    """ "iphone 15, airpods" -> [{"iphone", "15"}, {"airpods"}]; a phrase matches when all its tokens do."""
+    if isinstance(keywords, list):
+        keywords = ",".join(keywords)
+    return [tokens for tokens in (tokenize(part) for part in (keywords or "").split(",")) if tokens]
+
+
+@lru_cache(maxsize=None)
+def product_categories(category):
+    """The subscription categories a product category satisfies ("Electronics" covers every electronics category)."""
+    classifier = load_classifier()
+    category = canonical_category(category or classifier.default)
+    categories = {category}
+    if category == classifier.default or category in classifier.categories:
+        categories.add(classifier.default)
+    return frozenset(categories)
+
+
+class _Bucket:
+    """Entries sorted by minDiscount; `eligible(d)` is the prefix with minDiscount <= d."""
+
+    __slots__ = ("thresholds", "entries")
+
+    def __init__(self, items):
+        items.sort(key=lambda item: item[0])
+        self.thresholds = [t for t, _ in items]
+        self.entries = [e for _, e in items]
+
+    def eligible(self, discount):
+        return self.entries[:bisect.bisect_right(self.thresholds, discount)]
+
+
+class AlertIndex:
+    def __init__(self, subscriptions):
+        self.subscriptions = subscriptions
+        by_category, by_token = {}, {}
+        for sub in subscriptions:
+            if not sub.get("email"):
+                continue
+            threshold = float(sub.get("minDiscount") or 0)
+            category = sub.get("category") or ALL
+            category = category if category == ALL else canonical_category(category)
+            phrases = keyword_phrases(sub.get("keywords"))
+            if not phrases:
+                by_category.setdefault(category, []).append((threshold, sub))
+                continue
+            for i, tokens in enumerate(phrases):
+                # Any token of the phrase will do as the key; the longest is usually the rarest
+                anchor = max(tokens, key=len)
+                by_token.setdefault(anchor, []).append((threshold, (sub, category, i, tokens)))
+        self.by_category = {k: _Bucket(v) for k, v in by_category.items()}
+        self.by_token = {k: _Bucket(v) for k, v in by_token.items()}
+
+    @classmethod
+    def load(cls, path=ALERTS_FILE):
+        if not os.path.exists(path):
+            return cls([])
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def match(self, product):
+        """Subscriptions `product` satisfies (each at most once)."""
+        discount = product.get("discount_percentage") or 0
+        categories = product_categories(product.get("category"))
+
+        matched = {}
+        for category in categories | {ALL}:
+            bucket = self.by_category.get(category)
+            if bucket:
+                for sub in bucket.eligible(discount):
+                    matched[id(sub)] = sub
+
+        name_tokens = tokenize(product.get("name"))
+        for token in name_tokens:
+            bucket = self.by_token.get(token)
+            if not bucket:
+                continue
+            for sub, category, _, tokens in bucket.eligible(discount):
+                if id(sub) in matched:
+                    continue
+                if (category == ALL or category in categories) and tokens <= name_tokens:
+                    matched[id(sub)] = sub
+        return list(matched.values())
+
+    def digests(self, products, limit=DIGEST_LIMIT):
+        """{email: [product, ...]} over `products`, deduplicated per subscriber, best discount first."""
+        per_email = {}
+        for product in products:
+            for sub in self.match(product):
+                deals = per_email.setdefault(sub["email"].strip().lower(), {})
+                deals.setdefault(product.get("key") or product.get("product_url") or product.get("name"), product)
+        return {
+            email: sorted(deals.values(), key=lambda p: p.get("discount_percentage") or 0, reverse=True)[:limit]
+            for email, deals in per_email.items()
+        }
+
+
+def changed_products(source):
+    """New listings plus price drops from the last run's delta (see change_detection.py)."""
+    delta = load_delta(source)
+    if not delta:
+        return []
+    drops = [c for c in delta["changed"] if (c.get("sale_price") or 0) < (c["previous"].get("sale_price") or 0)]
+    return [dict(p, source=SOURCES[source]) for p in delta["new"] + drops]
+
+
+def run_products():
+    products = []
+    for source in SOURCES:
+        products.extend(changed_products(source))
+    return products
+
+
+def linear_digests(subscriptions, products, limit=DIGEST_LIMIT):
+    # Reference implementation: every subscription tested against every product
+    per_email = {}
+    for product in products:
+        discount = product.get("discount_percentage") or 0
+        categories = product_categories(product.get("category"))
+        name_tokens = tokenize(product.get("name"))
+        for sub in subscriptions:
+            category = sub.get("category") or ALL
+            category = category if category == ALL else canonical_category(category)
+            if discount < float(sub.get("minDiscount") or 0):
+                continue
+            if category != ALL and category not in categories:
+                continue
+            phrases = keyword_phrases(sub.get("keywords"))
+            if phrases and not any(tokens <= name_tokens for tokens in phrases):
+                continue
+            deals = per_email.setdefault(sub["email"].strip().lower(), {})
+            deals.setdefault(product.get("key") or product.get("product_url") or product.get("name"), product)
+    return {
+        email: sorted(deals.values(), key=lambda p: p.get("discount_percentage") or 0, reverse=True)[:limit]
+        for email, deals in per_email.items()
+    }
+
+
+def benchmark(subscribers=5000, products=5000, seed=1):
+    """Synthetic run: indexed matching vs. the N x M scan, checked to produce the same digests."""
+    rng = random.Random(seed)
+    names = []
+    for path in (os.path.join(BASE_DIR, "daraz_electronics.json"), os.path.join(BASE_DIR, "priceoye_electronics.json")):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                names.extend((p["name"], p.get("category")) for p in json.load(f))
+    vocab = sorted({t for name, _ in names for t in tokenize(name) if len(t) > 3})
+    categories = [ALL, "Electronics", "Mobile", "Wireless Earbuds", "Smart Watches"]
+
+    subs = [{
+        "email": f"user{i}@example.com",
+        "category": rng.choice(categories),
+        "minDiscount": rng.choice([10, 20, 30, 40, 50, 70]),
+        "keywords": ", ".join(rng.sample(vocab, rng.randint(1, 2))) if rng.random() < 0.6 else "",
+    } for i in range(subscribers)]
+    items = []
+    for i in range(products):
+        name, category = rng.choice(names)
+        items.append({"key": f"p{i}", "name": name, "category": category, "discount_percentage": rng.randint(0, 80)})
+
+    start = time.perf_counter()
+    fast = AlertIndex(subs).digests(items)
+    fast_s = time.perf_counter() - start
+    start = time.perf_counter()
+    slow = linear_digests(subs, items)
+    slow_s = time.perf_counter() - start
+    same = {e: [p["key"] for p in d] for e, d in fast.items()} == {e: [p["key"] for p in d] for e, d in slow.items()}
+    print(f"{subscribers} subscriptions x {products} products -> {len(fast)} digests")
+    print(f"  indexed: {fast_s:.2f}s")
+    print(f"  linear:  {slow_s:.2f}s")
+    print(f"  identical digests: {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match alert subscriptions against the last scrape's changes.")
+    parser.add_argument("--benchmark", action="store_true", help="Compare against the linear scan on synthetic data")
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.subscribers, args.products)
+    else:
+        digests = AlertIndex.load().digests(run_products())
+        for email, deals in digests.items():
+            print(f"{email}: {len(deals)} deals")
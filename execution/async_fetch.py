@@ -0,0 +1,82 @@
+import asyncio
+from urllib.parse import urlparse
+
+import aiohttp
+
+import metrics
+
+# Defaults for the concurrent fetch stage
+MAX_CONCURRENCY = 10      # Total in-flight requests across all hosts
+MAX_PER_HOST = 2          # In-flight requests to a single host
+REQUEST_TIMEOUT = 15      # Seconds per URL (connect + read)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+class FetchResult:
+    def __init__(self, url, status=None, content=b"", headers=None, error=None, elapsed=0.0):
+        self.url = url
+        self.status = status
+        self.content = content
+        self.headers = headers or {}
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and 200 <= self.status < 400
+
+
+async def _fetch_one(session, global_sem, host_sems, url, headers, timeout):
+    host = urlparse(url).netloc
+    host_sem = host_sems.setdefault(host, asyncio.Semaphore(MAX_PER_HOST))
+    loop = asyncio.get_running_loop()
+
+    async with global_sem, host_sem:
+        start = loop.time()
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                content = await response.read()
+                result = FetchResult(url, response.status, content, dict(response.headers))
+                if response.status >= 400:
+                    result.error = f"HTTP {response.status}"
+        except asyncio.TimeoutError:
+            result = FetchResult(url, error=f"Timed out after {timeout}s")
+        except Exception as e:
+            result = FetchResult(url, error=str(e))
+        result.elapsed = loop.time() - start
+        metrics.observe("http_fetch_seconds", result.elapsed, host=host)
+        metrics.count("http_responses", host=host, status=result.status or "error")
+        return result
+
+
+async def fetch_all_async(urls, headers=None, max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST, timeout=REQUEST_TIMEOUT):
+    """
+    Fetches every URL over one pooled session and returns FetchResults in input order.
+    `headers` may be a single dict or a list with one dict per URL.
+    """
+    if isinstance(headers, list):
+        per_url_headers = headers
+    else:
+        per_url_headers = [headers or DEFAULT_HEADERS] * len(urls)
+
+    global_sem = asyncio.Semaphore(max_concurrency)
+    host_sems = {}
+    for url in urls:
+        host_sems.setdefault(urlparse(url).netloc, asyncio.Semaphore(max_per_host))
+
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=max_per_host)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = [
+            _fetch_one(session, global_sem, host_sems, url, h, timeout)
+            for url, h in zip(urls, per_url_headers)
+        ]
+        # gather preserves the order of `tasks`, so results line up with `urls`
+        return await asyncio.gather(*tasks)
+
+
+def fetch_all(urls, **kwargs):
+    """Synchronous entry point for scripts that are not already running an event loop."""
+    return asyncio.run(fetch_all_async(urls, **kwargs))
@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Atomic writes for the shared files under .tmp that several stages publish to (serving
+# artifact, price comparison, price analytics). The monitor runs scrape stages in parallel
+# threads and scrape_jobs.py runs them as parallel processes, so:
+#   - every write goes through its own temp file in the target directory, then os.replace
+#   - writers of one file serialize on "<file>.lock" (O_EXCL lock file, portable to Windows)
+
+LOCK_TIMEOUT = 300        # Seconds to wait for a writer before giving up
+LOCK_STALE_AFTER = 600    # Seconds after which a lock left by a crashed writer is broken
+
+
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT, stale_after=LOCK_STALE_AFTER):
+    """Cross-process (and cross-thread) mutex on `path` + ".lock"."""
+    lock_path = path + ".lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Could not acquire {lock_path}")
+            time.sleep(0.05)
+    try:
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def write_atomic(path, write, mode="w", newline=None):
+    """Calls write(file) on a unique temp file next to `path`, then renames it into place."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    encoding = None if "b" in mode else "utf-8"
+    with tempfile.NamedTemporaryFile(mode, dir=directory, prefix=os.path.basename(path) + ".",
+                                     suffix=".tmp", delete=False, encoding=encoding, newline=newline) as f:
+        tmp = f.name
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.remove(tmp)
+            raise
+    # Temp files are created private; the web app has to be able to read the result
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    write_atomic(path, lambda f: json.dump(data, f, **dump_kwargs))
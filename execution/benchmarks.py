@@ -0,0 +1,293 @@
+import argparse
+import copy
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from alert_matching import AlertIndex
+from brand_page_stream import extract_brand_signals
+from change_detection import diff_snapshots, product_key
+from email_templates import RowCache, render_deals
+from normalize import RS_PRICE_RE, canonical_category, classify_product
+from parse_html import extract_rs_price, parse_daraz_embedded, parse_daraz_html, parse_priceoye_html
+from product_matching import ProductIndex, parse_title
+
+# Offline benchmarks: replays the saved page captures and the product datasets through each
+# pipeline stage (extraction, normalization, categorization, dedup, cross-source product
+# matching, alert matching, email rendering) without a browser or network. Reports ops/sec
+# and peak traced memory per stage, and compares with a saved baseline (exit status 1 when
+# a stage regresses by more than 20%, 2 when the baseline was recorded over different inputs).
+#
+#   python benchmarks.py                       # run at the dataset's natural size
+#   python benchmarks.py --products 100000     # synthetically scaled product set
+#   python benchmarks.py --save-baseline       # record the current numbers as the baseline
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BASE_DIR, "..", ".tmp", "benchmarks", "baseline.json")
+
+DATASETS = {"daraz": "daraz_electronics.json", "priceoye": "priceoye_electronics.json"}
+
+REGRESSION_THRESHOLD = 0.20   # Flag stages >20% slower or using >20% more peak memory than baseline
+MEMORY_FLOOR_MB = 1.0         # ...but only when peak memory also grew by at least this much
+
+# A baseline is only comparable with a run over the same inputs
+RUN_PARAMETERS = ("products", "subscriptions", "digests")
+
+
+def _read(name):
+    with open(os.path.join(BASE_DIR, name), "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def load_fixtures():
+    """Every saved page capture (*.html) next to the scrapers."""
+    return {name: _read(name) for name in sorted(os.listdir(BASE_DIR)) if name.endswith(".html")}
+
+
+def load_products():
+    products = []
+    for source, name in DATASETS.items():
+        if os.path.exists(os.path.join(BASE_DIR, name)):
+            products.extend((source, p) for p in json.loads(_read(name)))
+    return products
+
+
+def scale_products(products, target, seed=1):
+    """
+    Grows (source, product) pairs to `target` by cloning them with distinct product keys
+    and jittered prices, so dedup and matching see `target` different listings.
+    """
+    if target is None or target <= len(products):
+        return products[:target] if target else products
+    rng = random.Random(seed)
+    scaled = list(products)
+    i = 0
+    while len(scaled) < target:
+        source, product = products[i % len(products)]
+        clone = dict(product)
+        n = len(scaled)
+        if source == "daraz":
+            clone["product_url"] = f"https://www.daraz.pk/products/-i{900000000 + n}-s{1000 + n}.html"
+        else:
+            clone["product_url"] = f"{product['product_url'].split('?')[0]}-v{n}"
+        clone["sale_price"] = round((product.get("sale_price") or 1000) * rng.uniform(0.8, 1.2), 0)
+        clone["discount_percentage"] = rng.randint(0, 80)
+        scaled.append((source, clone))
+        i += 1
+    return scaled
+
+
+def synthetic_subscriptions(products, count=2000, seed=1):
+    rng = random.Random(seed)
+    words = sorted({w.lower() for _, p in products[:2000] for w in p["name"].split() if len(w) > 3 and w.isalpha()})
+    categories = ["All", "Electronics", "Mobile", "Wireless Earbuds", "Smart Watches"]
+    return [{
+        "email": f"user{i}@example.com",
+        "category": rng.choice(categories),
+        "minDiscount": rng.choice([10, 20, 30, 50, 70]),
+        "keywords": rng.choice(words) if words and rng.random() < 0.5 else "",
+    } for i in range(count)]
+
+
+# -- stages: each returns the number of operations it performed ------------------
+
+def bench_extract(ctx):
+    cards = 0
+    for html in ctx["fixtures"].values():
+        cards += len(parse_daraz_html(html, min_discount=0))
+        cards += len(parse_daraz_embedded(html, min_discount=0) or [])
+        parse_priceoye_html(html, "Mobiles")
+    return max(cards, 1)
+
+
+def bench_brand_signals(ctx):
+    for html in ctx["fixtures"].values():
+        extract_brand_signals(html, "https://example.com/sale", "Electronics")
+    return len(ctx["fixtures"])
+
+
+def bench_normalize(ctx):
+    n = 0
+    for _, p in ctx["products"]:
+        extract_rs_price(f"Rs. {p.get('sale_price') or 0:,.0f}")
+        RS_PRICE_RE.findall(f"Rs. {p.get('original_price') or 0:,.0f} Rs. {p.get('sale_price') or 0:,.0f}")
+        canonical_category(p.get("category"))
+        n += 1
+    return n
+
+
+def bench_categorize(ctx):
+    for _, p in ctx["products"]:
+        classify_product(p["name"])
+    return len(ctx["products"])
+
+
+def bench_dedup(ctx):
+    by_source = {}
+    for source, p in ctx["products"]:
+        by_source.setdefault(source, []).append(p)
+    for source, items in by_source.items():
+        current = {}
+        for p in items:
+            current.setdefault(product_key(source, p), p)
+        # Previous run: same listings with every 10th price changed and a few missing
+        previous = {}
+        for i, (key, p) in enumerate(current.items()):
+            if i % 50 == 0:
+                continue
+            previous[key] = dict(p, sale_price=(p.get("sale_price") or 0) + 1) if i % 10 == 0 else p
+        diff_snapshots(source, previous, current)
+    return len(ctx["products"])
+
+
+def bench_product_match(ctx):
+    parse_title.cache_clear()
+    ProductIndex(ctx["products"])
+    return len(ctx["products"])
+
+
+def bench_alert_match(ctx):
+    index = AlertIndex(ctx["subscriptions"])
+    index.digests([dict(p, key=str(i)) for i, (_, p) in enumerate(ctx["products"])])
+    return len(ctx["products"])
+
+
+def bench_render(ctx):
+    rows = RowCache()
+    deals = [{
+        "Brand Name": p["name"], "Category": p.get("category") or "Electronics",
+        "Discount": f"{p.get('discount_percentage', 0)}%", "Source": source,
+    } for source, p in ctx["products"][:5000]]
+    rng = random.Random(1)
+    digests = ctx["digests"]
+    for _ in range(digests):
+        render_deals(rng.sample(deals, min(10, len(deals))), "Deals Matching Your Alerts", rows)
+    return digests
+
+
+STAGES = {
+    "extract": bench_extract,
+    "brand_signals": bench_brand_signals,
+    "normalize": bench_normalize,
+    "categorize": bench_categorize,
+    "dedup": bench_dedup,
+    "product_match": bench_product_match,
+    "alert_match": bench_alert_match,
+    "render": bench_render,
+}
+
+
+def _measure(func, ctx, min_time):
+    """Best ops/sec over repeated runs (at least `min_time` seconds in total), then peak memory of one run."""
+    best, total, ops = 0.0, 0.0, 0
+    while total < min_time or best == 0.0:
+        gc.collect()
+        start = time.perf_counter()
+        ops = func(ctx)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        best = max(best, ops / elapsed if elapsed else float("inf"))
+    gc.collect()
+    tracemalloc.start()
+    func(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops": ops, "ops_per_sec": round(best, 1), "peak_mb": round(peak / 1024 / 1024, 2)}
+
+
+def run(stages=None, products=None, subscriptions=2000, digests=10000, min_time=1.0):
+    base_products = load_products()
+    scaled = scale_products(base_products, products)
+    ctx = {
+        "fixtures": load_fixtures(),
+        "products": scaled,
+        "subscriptions": synthetic_subscriptions(scaled, subscriptions),
+        "digests": digests,
+    }
+    results = {}
+    for name in stages or STAGES:
+        results[name] = _measure(STAGES[name], ctx, min_time)
+        r = results[name]
+        print(f"{name:14s} {r['ops_per_sec']:>14,.1f} ops/s  {r['peak_mb']:>8.2f} MB peak  ({r['ops']} ops/run)")
+    return {"products": len(scaled), "subscriptions": subscriptions, "digests": digests,
+            "python": sys.version.split()[0], "results": results}
+
+
+def mismatched_parameters(report, baseline):
+    return [f"{name}: baseline {baseline.get(name)}, this run {report[name]}"
+            for name in RUN_PARAMETERS if baseline.get(name) != report[name]]
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD, memory_floor=MEMORY_FLOOR_MB):
+    """Prints the change per stage against `baseline`; returns the names of regressed stages."""
+    regressed = []
+    print("\nvs. baseline:")
+    for name, r in report["results"].items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+        speed = r["ops_per_sec"] / old["ops_per_sec"] - 1 if old["ops_per_sec"] else 0.0
+        memory = r["peak_mb"] / old["peak_mb"] - 1 if old["peak_mb"] else 0.0
+        flag = ""
+        memory_grew = memory > threshold and r["peak_mb"] - old["peak_mb"] >= memory_floor
+        if speed < -threshold or memory_grew:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:14s} speed {speed:+7.1%}  memory {memory:+7.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks over the saved fixtures and datasets.")
+    parser.add_argument("--stage", choices=list(STAGES), action="append", help="Only these stages")
+    parser.add_argument("--products", type=int, help="Scale the product set to this many listings (e.g. 100000)")
+    parser.add_argument("--subscriptions", type=int, default=2000)
+    parser.add_argument("--digests", type=int, default=10000)
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds to repeat each stage for")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="Also write this run's report to a JSON file")
+    args = parser.parse_args()
+
+    report = run(args.stage, args.products, args.subscriptions, args.digests, args.min_time)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        # Keep stages that were not re-run this time
+        merged = copy.deepcopy(report)
+        merged["results"] = dict(baseline.get("results", {}), **report["results"])
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(merged, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        mismatched = mismatched_parameters(report, baseline)
+        if mismatched:
+            # Numbers over different inputs say nothing about regressions
+            print("\nBaseline was recorded with different run parameters; not comparing:")
+            for line in mismatched:
+                print(f"  {line}")
+            print("Re-run with the baseline's parameters, or record a new baseline with --save-baseline.")
+            sys.exit(2)
+        regressed = compare(report, baseline)
+        if regressed:
+            sys.exit(1)
+    else:
+        print("\nNo baseline yet; run with --save-baseline to record one.")
+
+
+if __name__ == "__main__":
+    main()
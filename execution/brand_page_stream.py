@@ -0,0 +1,190 @@
+import argparse
+import os
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from normalize import DISCOUNT_CLASS_RE, PERCENT_2DIGIT_RE, banner_alt_re
+
+# Single-pass, bounded-memory replacement for the BeautifulSoup discount/image extraction
+# in scrape_retailers.parse_brand_page(). The page is fed to an incremental tokenizer in
+# chunks; only running maxima and a few candidate URLs are kept, never the document tree.
+
+LABEL_TAGS = {"span", "div", "p"}
+NOISY_TAGS = {"header", "footer", "nav", "script", "style"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+MAX_POSSIBLE_DISCOUNT = 99  # extract_max_discount only reads 1-2 digit percentages
+CHUNK_SIZE = 64 * 1024
+
+
+class _RunningMax:
+    """Max of `(\\d{1,2})%` over a text fed in pieces, as if the pieces were concatenated."""
+
+    __slots__ = ("value", "carry")
+
+    def __init__(self):
+        self.value = 0
+        self.carry = ""
+
+    def feed(self, text):
+        window = self.carry + text
+        for m in PERCENT_2DIGIT_RE.findall(window):
+            v = int(m)
+            if v > self.value:
+                self.value = v
+        # A match can span pieces by at most two leading digits
+        self.carry = window[-2:]
+
+
+class BrandPageScanner(HTMLParser):
+    def __init__(self, category):
+        super().__init__(convert_charrefs=True)
+        self.alt_re = banner_alt_re(category)
+        self.stack = []            # open tag names (void tags excluded)
+        self.labels = []           # (stack depth, _RunningMax) for open discount labels
+        self.noisy_depth = 0       # > 0 while inside header/footer/nav/script/style
+        self.label_max = 0
+        self.page_text = _RunningMax()
+        self.og_image = None       # content of the first og:image meta ("" if empty)
+        self.banner_any = None     # first banner image anywhere
+        self.banner_clean = None   # first banner image outside noisy elements
+
+    # -- tokenizer callbacks --------------------------------------------------
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta":
+            if self.og_image is None and attrs.get("property") == "og:image":
+                self.og_image = attrs.get("content") or ""
+            return
+        if tag == "img":
+            if self.banner_clean is None and self.alt_re.search(attrs.get("alt") or ""):
+                src = attrs.get("src") or attrs.get("data-src") or attrs.get("data-lazy-src")
+                if src and src.startswith("http"):
+                    if self.banner_any is None:
+                        self.banner_any = src
+                    if not self.noisy_depth:
+                        self.banner_clean = src
+            return
+        if tag in VOID_TAGS:
+            return
+        self.stack.append(tag)
+        if tag in NOISY_TAGS:
+            self.noisy_depth += 1
+        if tag in LABEL_TAGS and DISCOUNT_CLASS_RE.search(attrs.get("class") or ""):
+            self.labels.append((len(self.stack), _RunningMax()))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return
+        # Close everything up to the most recent matching tag, like html.parser's tree builder
+        while self.stack:
+            open_tag = self.stack.pop()
+            depth = len(self.stack) + 1
+            if open_tag in NOISY_TAGS:
+                self.noisy_depth -= 1
+            while self.labels and self.labels[-1][0] >= depth:
+                _, running = self.labels.pop()
+                self.label_max = max(self.label_max, running.value)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        for _, running in self.labels:
+            running.feed(data)
+        if not self.noisy_depth:
+            self.page_text.feed(data)
+
+    # -- results ---------------------------------------------------------------
+
+    def close(self):
+        super().close()
+        for _, running in self.labels:
+            self.label_max = max(self.label_max, running.value)
+        self.labels = []
+
+    @property
+    def image_resolved(self):
+        return self.og_image and "logo" not in self.og_image.lower()
+
+    @property
+    def confident(self):
+        """Nothing later in the page can change the result."""
+        open_max = max((r.value for _, r in self.labels), default=0)
+        return max(self.label_max, open_max) >= MAX_POSSIBLE_DISCOUNT and bool(self.image_resolved)
+
+    def result(self, url):
+        if self.label_max > 0:
+            discount = self.label_max
+            banner = self.banner_any
+        else:
+            # Matches the soup fallback: noisy elements were removed before reading page text
+            discount = self.page_text.value
+            banner = self.banner_clean
+        image_url = self.og_image or ""
+        if not image_url or "logo" in image_url.lower():
+            image_url = banner or image_url
+        if image_url and not image_url.startswith("http"):
+            image_url = urljoin(url, image_url)
+        return discount, image_url
+
+
+def _decode(content, encoding=None):
+    if isinstance(content, str):
+        return content
+    return content.decode(encoding or "utf-8", errors="replace")
+
+
+def extract_brand_signals(content, url, category, encoding=None, chunk_size=CHUNK_SIZE):
+    """
+    Returns (max discount, image url) for a brand sale page, streaming `content`
+    (bytes, str, or an iterable of byte chunks) through the tokenizer and stopping
+    early once the result can no longer change.
+    """
+    scanner = BrandPageScanner(category)
+    if isinstance(content, (bytes, str)):
+        text = _decode(content, encoding)
+        chunks = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+    else:
+        chunks = (_decode(c, encoding) for c in content)
+    for chunk in chunks:
+        scanner.feed(chunk)
+        if scanner.confident:
+            break
+    scanner.close()
+    return scanner.result(url)
+
+
+def validate(paths, category="Clothing"):
+    """Compares the streaming extractor against the BeautifulSoup implementation on saved pages."""
+    from scrape_retailers import extract_brand_signals_soup
+
+    ok = True
+    for path in paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        url = "https://example.com/sale"
+        start = time.perf_counter()
+        soup_result = extract_brand_signals_soup(content, url, category)
+        soup_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        stream_result = extract_brand_signals(content, url, category)
+        stream_ms = (time.perf_counter() - start) * 1000
+        same = soup_result == stream_result
+        ok = ok and same
+        print(f"{os.path.basename(path)}: {'OK' if same else 'MISMATCH'} "
+              f"soup={soup_result} ({soup_ms:.1f} ms) stream={stream_result} ({stream_ms:.1f} ms)")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate the streaming brand page extractor on saved pages.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--category", default="Clothing")
+    args = parser.parse_args()
+    validate(args.files, args.category)
@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import datetime
+from urllib.parse import urlsplit, urlunsplit
+
+from atomic_files import write_json_atomic
+
+# Stable product keys and snapshot diffing, so a run only has to write and alert on
+# listings that are new, gone, or changed price since the previous run.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DELTA_DIR = os.path.join(BASE_DIR, "..", ".tmp")
+
+# Fields whose change makes a listing "price-changed"
+PRICE_FIELDS = ("sale_price", "original_price", "discount_percentage")
+
+DARAZ_ID_RE = re.compile(r'-i(\d+)(?:-s(\d+))?\.html')
+
+
+def product_key(source, product):
+    """
+    Stable identity of a listing within a source:
+      Daraz    -> item_id/sku_id from the product URL (tracking query strings change every run)
+      PriceOye -> the URL slug, e.g. "mobiles/honor/honor-x9d"
+    Falls back to the URL without query/fragment, then to the name.
+    """
+    url = product.get("product_url") or ""
+    if url:
+        parts = urlsplit(url)
+        if source == "daraz":
+            match = DARAZ_ID_RE.search(parts.path)
+            if match:
+                item_id, sku_id = match.groups()
+                return f"i{item_id}-s{sku_id}" if sku_id else f"i{item_id}"
+        elif source == "priceoye":
+            slug = parts.path.strip("/")
+            if slug:
+                return slug
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    return f"name:{product.get('name', '')}"
+
+
+def price_changed(before, after):
+    return any(before.get(f) != after.get(f) for f in PRICE_FIELDS)
+
+
+def diff_snapshots(source, previous, current):
+    """
+    Compares two keyed snapshots ({key: product}) and returns a compact delta:
+    new / removed / changed listings plus an unchanged count.
+    """
+    new, changed = [], []
+    for key, product in current.items():
+        before = previous.get(key)
+        if before is None:
+            new.append(dict(product, key=key))
+        elif price_changed(before, product):
+            changed.append(dict(
+                product,
+                key=key,
+                previous={f: before.get(f) for f in PRICE_FIELDS},
+            ))
+    removed = [
+        {"key": key, "name": product.get("name"), "product_url": product.get("product_url")}
+        for key, product in previous.items() if key not in current
+    ]
+    return {
+        "source": source,
+        "generated_at": datetime.datetime.now().isoformat(),
+        "new": new,
+        "removed": removed,
+        "changed": changed,
+        "unchanged_count": len(current) - len(new) - len(changed),
+    }
+
+
+def is_empty(delta):
+    return not (delta["new"] or delta["removed"] or delta["changed"])
+
+
+def delta_path(source):
+    return os.path.join(DELTA_DIR, f"{source}_delta.json")
+
+
+def write_delta(delta, path=None):
+    path = path or delta_path(delta["source"])
+    write_json_atomic(path, delta, separators=(",", ":"))
+    return path
+
+
+def load_delta(source, path=None):
+    """Returns the last delta written for `source`, or None if there is none yet."""
+    path = path or delta_path(source)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
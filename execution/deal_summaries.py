@@ -0,0 +1,187 @@
+import argparse
+import bisect
+import heapq
+import json
+import os
+import random
+import statistics
+import time
+
+from normalize import PERCENT_RE
+
+# Summary tables materialized with the serving artifact after every scrape: per category
+# and per source the top-K deals by discount, counts, average/median discount and price
+# buckets. The API and emailer read these instead of re-sorting every deal per request.
+#
+# Top-K is a bounded min-heap per group, filled in one pass over the rows: O(n log K).
+
+TOP_K = 24
+ALL = "All"
+LIVE_MARKER = "Real"   # Sources containing this are live scrapes ("Daraz Real-time", "Scraped (Real)")
+
+# Upper bounds (Rs) of the price buckets; the last bucket is open-ended
+PRICE_BUCKETS = (5000, 10000, 25000, 50000, 100000)
+
+
+def _bucket_labels(bounds=PRICE_BUCKETS):
+    labels, low = [], 0
+    for high in bounds:
+        labels.append(f"{low // 1000}k-{high // 1000}k" if low else f"<{high // 1000}k")
+        low = high
+    labels.append(f"{low // 1000}k+")
+    return labels
+
+
+BUCKET_LABELS = _bucket_labels()
+
+
+def price_bucket(price):
+    return BUCKET_LABELS[bisect.bisect_right(PRICE_BUCKETS, price)]
+
+
+def discount_value(value):
+    """Discount as a number from an int/float or a "-40%" / "Up to 50%" string."""
+    if isinstance(value, (int, float)):
+        return abs(value)
+    match = PERCENT_RE.search(value or "")
+    return int(match.group(1)) if match else 0
+
+
+def section(source):
+    return "live" if LIVE_MARKER in (source or "") else "estimates"
+
+
+class DealSummary:
+    """Running count / discount stats / price buckets for one group plus its top-K deals."""
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.discounts = []
+        self.buckets = dict.fromkeys(BUCKET_LABELS, 0)
+        self._heap = []   # (discount, -seq, item): smallest kept deal on top
+        self._seq = 0
+
+    def add(self, discount, price, item):
+        self.discounts.append(discount)
+        if price:
+            self.buckets[price_bucket(price)] += 1
+        self._seq += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (discount, -self._seq, item))
+        elif discount > self._heap[0][0]:
+            # Ties keep the earlier deal (scrape order), like a stable sort by discount
+            heapq.heapreplace(self._heap, (discount, -self._seq, item))
+
+    def top(self):
+        return [item for _, _, item in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+    def to_dict(self):
+        n = len(self.discounts)
+        return {
+            "count": n,
+            "avg_discount": round(sum(self.discounts) / n, 2) if n else 0.0,
+            "median_discount": statistics.median(self.discounts) if n else 0,
+            "price_buckets": self.buckets,
+            "top": self.top(),
+        }
+
+
+def summarize(rows, k=TOP_K):
+    """
+    Summaries of serving rows (publish_sales), with `top` as row indexes:
+      {"sections": {"live"|"estimates": {category|"All": summary}},
+       "sources": {source: summary}, "categories": {category|"All": summary}}
+    """
+    sections, sources, categories = {}, {}, {}
+    for i, row in enumerate(rows):
+        discount = discount_value(row.get("Discount Percentage"))
+        price = row.get("Price")
+        category = (row.get("Category") or "").strip()
+        source = row.get("Source") or ""
+        for groups, name in _groups(sections.setdefault(section(source), {}), categories, sources, source, category):
+            summary = groups.get(name)
+            if summary is None:
+                summary = groups[name] = DealSummary(k)
+            summary.add(discount, price, i)
+    return {
+        "top_k": k,
+        "sections": {name: _as_dicts(groups) for name, groups in sections.items()},
+        "sources": _as_dicts(sources),
+        "categories": _as_dicts(categories),
+    }
+
+
+def _groups(by_category, categories, sources, source, category):
+    yield sources, source
+    yield by_category, ALL
+    yield categories, ALL
+    if category:
+        yield by_category, category
+        yield categories, category
+
+
+def _as_dicts(groups):
+    return {name: summary.to_dict() for name, summary in groups.items()}
+
+
+def top_deals(items, k, discount=lambda item: item.get("discount_percentage") or 0):
+    """The `k` items with the highest discount, in order (heap selection, ties in input order)."""
+    summary = DealSummary(k)
+    for item in items:
+        summary.add(discount_value(discount(item)), None, item)
+    return summary.top()
+
+
+def benchmark(rows=200000, k=TOP_K, requests=100, seed=1):
+    rng = random.Random(seed)
+    categories = ["Mobile", "Electronics", "Smart Watches", "Wireless Earbuds", "Clothing", "Shoes"]
+    data = [{
+        "Category": rng.choice(categories), "Source": rng.choice(["Daraz Real-time", "PriceOye Real-time", "Estimated"]),
+        "Discount Percentage": f"-{rng.randint(0, 90)}%", "Price": rng.randint(500, 300000),
+    } for _ in range(rows)]
+
+    start = time.perf_counter()
+    summaries = summarize(data, k)
+    materialize = time.perf_counter() - start
+
+    # Per request: what the callers did before (filter + sort every row) vs a summary lookup
+    names = [rng.choice([ALL] + categories) for _ in range(requests)]
+    start = time.perf_counter()
+    for name in names:
+        group = [r for r in data if name == ALL or r["Category"] == name]
+        sorted(group, key=lambda r: discount_value(r["Discount Percentage"]), reverse=True)[:k]
+    recompute = (time.perf_counter() - start) / requests
+    start = time.perf_counter()
+    for name in names:
+        [data[i] for i in summaries["categories"][name]["top"]]
+    lookup = (time.perf_counter() - start) / requests
+    print(f"{rows} rows, top {k}")
+    print(f"materialize every summary (once per scrape): {materialize:.3f}s")
+    print(f"per request, filter + sort:  {recompute * 1000:9.3f} ms")
+    print(f"per request, summary lookup: {lookup * 1000:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deal summaries (top-K, counts, discount stats, price buckets).")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.rows)
+        return
+
+    from publish_sales import SERVING_FILE
+    if not os.path.exists(SERVING_FILE):
+        print("No serving artifact yet; run publish_sales.py first.")
+        return
+    with open(SERVING_FILE, "r", encoding="utf-8") as f:
+        summaries = json.load(f).get("summaries", {})
+    for name, groups in summaries.get("sections", {}).items():
+        for category, s in groups.items():
+            print(f"{name:10s} {category:18s} {s['count']:6d} deals  avg {s['avg_discount']:5.1f}%  "
+                  f"median {s['median_discount']}%")
+
+
+if __name__ == "__main__":
+    main()
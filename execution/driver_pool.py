@@ -0,0 +1,207 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+
+try:
+    import psutil
+except ImportError:  # Memory-based recycling is skipped without psutil
+    psutil = None
+
+MOBILE_UA = "Mozilla/5.0 (iPhone; CPU iPhone OS 13_2_3 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/13.0.3 Mobile/15E148 Safari/604.1"
+DESKTOP_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Browser profiles used by the scrapers
+PROFILES = {
+    "mobile": {"window_size": "375,812", "user_agent": MOBILE_UA},
+    "desktop": {"window_size": "1920,1080", "user_agent": DESKTOP_UA},
+}
+
+# Recycling defaults
+MAX_PAGES_PER_DRIVER = 50
+MAX_MEMORY_MB = 1500
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_driver_path():
+    """
+    Returns the chromedriver binary to use. CHROMEDRIVER_PATH (set in the Dockerfile)
+    wins; otherwise webdriver_manager resolves it once per process.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            env_path = os.getenv("CHROMEDRIVER_PATH")
+            if env_path and os.path.exists(env_path):
+                _driver_path = env_path
+            else:
+                from webdriver_manager.chrome import ChromeDriverManager
+                _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def create_driver(profile="desktop", headless=True, user_agent=None, window_size=None):
+    settings = PROFILES[profile]
+    options = Options()
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument(f"--window-size={window_size or settings['window_size']}")
+    options.add_argument(f"--user-agent={user_agent or settings['user_agent']}")
+
+    # Anti-detection
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+
+    chrome_bin = os.getenv("CHROME_BIN")
+    if chrome_bin and os.path.exists(chrome_bin):
+        options.binary_location = chrome_bin
+
+    service = Service(resolve_driver_path())
+    driver = webdriver.Chrome(service=service, options=options)
+
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+        "source": """
+            Object.defineProperty(navigator, 'webdriver', {
+            get: () => undefined
+            })
+        """
+    })
+    return driver
+
+
+def driver_memory_mb(driver):
+    """Resident memory of chromedriver plus its Chrome children, or None if unknown."""
+    if psutil is None:
+        return None
+    try:
+        proc = psutil.Process(driver.service.process.pid)
+        procs = [proc] + proc.children(recursive=True)
+        return sum(p.memory_info().rss for p in procs) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class DriverPool:
+    """
+    Keeps `size` warm Chrome instances and hands them out via `acquire()`.
+    A driver is replaced once it has loaded `max_pages` pages or its process
+    tree grows beyond `max_memory_mb`.
+    """
+
+    def __init__(self, size=1, profile="desktop", max_pages=MAX_PAGES_PER_DRIVER, max_memory_mb=MAX_MEMORY_MB, **driver_kwargs):
+        self.size = size
+        self.profile = profile
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        if max_memory_mb and psutil is None:
+            print(f"psutil is not installed: drivers won't be recycled at {max_memory_mb} MB, only by page count")
+        self.driver_kwargs = driver_kwargs
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _new_driver(self):
+        driver = create_driver(self.profile, **self.driver_kwargs)
+        driver._pool_pages = 0
+        original_get = driver.get
+
+        # Count navigations so the pool knows when to recycle this browser
+        def counting_get(url):
+            driver._pool_pages += 1
+            return original_get(url)
+
+        driver.get = counting_get
+        with self._lock:
+            self._all.append(driver)
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _needs_recycle(self, driver):
+        if self.max_pages and driver._pool_pages >= self.max_pages:
+            return True
+        if self.max_memory_mb:
+            mem = driver_memory_mb(driver)
+            if mem is not None and mem > self.max_memory_mb:
+                return True
+        return False
+
+    def start(self):
+        if not self._started:
+            for _ in range(self.size):
+                self._idle.put(self._new_driver())
+            self._started = True
+        return self
+
+    def _replace(self, driver):
+        """Swaps `driver` for a new one; if Chrome won't start, leaves an empty slot (None) to fill later."""
+        self._discard(driver)
+        try:
+            self._idle.put(self._new_driver())
+        except Exception as e:
+            print(f"Could not start a replacement Chrome driver: {e}")
+            self._idle.put(None)
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        self.start()
+        driver = self._idle.get(timeout=timeout)
+        if driver is None:
+            try:
+                driver = self._new_driver()
+            except Exception:
+                self._idle.put(None)
+                raise
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            # The session may be dead (crashed tab, lost chromedriver); don't hand it out again
+            broken = not self._is_alive(driver)
+            raise
+        finally:
+            if broken or self._needs_recycle(driver):
+                print(f"Recycling Chrome driver after {driver._pool_pages} pages")
+                self._replace(driver)
+            else:
+                self._idle.put(driver)
+
+    @staticmethod
+    def _is_alive(driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        with self._lock:
+            drivers = list(self._all)
+        for driver in drivers:
+            self._discard(driver)
+        self._idle = queue.Queue()
+        self._started = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,174 @@
+import argparse
+import html
+import random
+import re
+import time
+
+# Email HTML rendering. Templates are compiled once into str.format() strings, values
+# are HTML-escaped on substitution, and the table row for each deal is rendered once and
+# shared by every digest it appears in, so a run's cost follows the number of distinct
+# deals rather than subscribers x deals.
+#
+# Placeholders: {{ name }} is escaped, {{{ name }}} is inserted as-is (pre-rendered HTML).
+
+PLACEHOLDER_RE = re.compile(r"\{\{\{\s*(\w+)\s*\}\}\}|\{\{\s*(\w+)\s*\}\}")
+
+
+class Template:
+    """Compiled once into a str.format() string; rendering escapes the values and formats in C."""
+
+    def __init__(self, source):
+        parts, self.escaped, pos = [], set(), 0
+        for m in PLACEHOLDER_RE.finditer(source):
+            parts.append(source[pos:m.start()].replace("{", "{{").replace("}", "}}"))
+            raw_name, name = m.groups()
+            parts.append("{" + (raw_name or name) + "}")
+            if raw_name is None:
+                self.escaped.add(name)
+            pos = m.end()
+        parts.append(source[pos:].replace("{", "{{").replace("}", "}}"))
+        self.format = "".join(parts).format
+
+    def render(self, **values):
+        for name in self.escaped:
+            value = values[name]
+            values[name] = "" if value is None else html.escape(str(value))
+        return self.format(**values)
+
+
+DEALS_PAGE = Template("""
+        <html>
+        <body style="font-family: sans-serif; color: #333;">
+            <h2 style="color: #0d9488;">{{ heading }}</h2>
+            <table border="0" cellpadding="10" cellspacing="1" style="background-color: #e5e7eb; width: 100%;">
+                <tr style="background-color: #1f2937; color: white;">
+                    <th>Brand/Product</th>
+                    <th>Category</th>
+                    <th>Discount</th>
+                    <th>Source</th>
+                </tr>
+        {{{ rows }}}
+            </table>
+            <p>Visit <a href="http://localhost:3000">Retail Monitor Pakistan</a> to see all live deals!</p>
+            <hr>
+            <p style="font-size: 12px; color: #666;">Generated by Agentic Retail Monitor</p>
+        </body>
+        </html>
+        """)
+
+DEAL_ROW = Template("""
+                <tr style="background-color: white;">
+                    <td>{{ name }}</td>
+                    <td>{{ category }}</td>
+                    <td style="color: #0d9488; font-weight: bold;">{{ discount }}</td>
+                    <td>{{ source }}</td>
+                </tr>
+            """)
+
+CONFIRMATION_PAGE = Template("""
+        <html>
+        <body style="font-family: sans-serif; color: #333;">
+            <h2 style="color: #4f46e5;">Subscription Confirmed!</h2>
+            <p>Hello,</p>
+            <p>You have successfully subscribed to price alerts on <b>Retail Monitor Pakistan</b>. We will notify you whenever we find massive price drops in your selected categories.</p>
+            <p>Happy Shopping!</p>
+            <hr>
+            <p style="font-size: 12px; color: #666;">This is an automated message from Retail Monitor.</p>
+        </body>
+        </html>
+        """)
+
+
+class RowCache:
+    """Rendered DEAL_ROW fragments keyed by the deal's displayed values."""
+
+    def __init__(self):
+        self.rows = {}
+        self.hits = 0
+
+    def row(self, deal):
+        key = (deal["Brand Name"], deal["Category"], deal["Discount"], deal["Source"])
+        fragment = self.rows.get(key)
+        if fragment is None:
+            fragment = DEAL_ROW.render(name=key[0], category=key[1], discount=key[2], source=key[3])
+            self.rows[key] = fragment
+        else:
+            self.hits += 1
+        return fragment
+
+
+def render_deals(deals, heading, cache=None):
+    cache = cache or RowCache()
+    return DEALS_PAGE.render(heading=heading, rows="".join(map(cache.row, deals)))
+
+
+def render_confirmation():
+    return CONFIRMATION_PAGE.render()
+
+
+def _concat_render(deals, heading, escape=lambda v: v):
+    # Reference: the original per-digest f-string concatenation (unescaped unless `escape` is given)
+    html_content = f"""
+        <html>
+        <body style="font-family: sans-serif; color: #333;">
+            <h2 style="color: #0d9488;">{heading}</h2>
+            <table>
+        """
+    for deal in deals:
+        html_content += f"""
+                <tr style="background-color: white;">
+                    <td>{escape(deal['Brand Name'])}</td>
+                    <td>{escape(deal['Category'])}</td>
+                    <td style="color: #0d9488; font-weight: bold;">{escape(deal['Discount'])}</td>
+                    <td>{escape(deal['Source'])}</td>
+                </tr>
+            """
+    html_content += """
+            </table>
+        </body>
+        </html>
+        """
+    return html_content
+
+
+def benchmark(digests=10000, deals_per_digest=10, catalog=1000, seed=1):
+    """Renders `digests` personalized digests drawn from a shared catalog of deals."""
+    rng = random.Random(seed)
+    deals = [{
+        "Brand Name": f"Product {i} <Pro> & Co",
+        "Category": rng.choice(["Mobile", "Wireless Earbuds", "Smart Watches", "Electronics"]),
+        "Discount": f"{rng.randint(5, 80)}%",
+        "Source": rng.choice(["Daraz", "PriceOye"]),
+    } for i in range(catalog)]
+    picks = [rng.sample(deals, deals_per_digest) for _ in range(digests)]
+
+    start = time.perf_counter()
+    for chosen in picks:
+        _concat_render(chosen, "Deals Matching Your Alerts")
+    concat_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for chosen in picks:
+        _concat_render(chosen, "Deals Matching Your Alerts", html.escape)
+    escaped_s = time.perf_counter() - start
+
+    cache = RowCache()
+    start = time.perf_counter()
+    for chosen in picks:
+        render_deals(chosen, "Deals Matching Your Alerts", cache)
+    compiled_s = time.perf_counter() - start
+
+    print(f"{digests} digests x {deals_per_digest} deals ({catalog} distinct deals)")
+    print(f"  f-string concatenation: {concat_s:.2f}s ({digests / concat_s:,.0f}/s, unescaped)")
+    print(f"  ... with html.escape:   {escaped_s:.2f}s ({digests / escaped_s:,.0f}/s)")
+    print(f"  compiled + row cache:   {compiled_s:.2f}s ({digests / compiled_s:,.0f}/s, "
+          f"{len(cache.rows)} rows rendered, {cache.hits} reused)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark digest rendering.")
+    parser.add_argument("--digests", type=int, default=10000)
+    parser.add_argument("--deals", type=int, default=10)
+    parser.add_argument("--catalog", type=int, default=1000)
+    args = parser.parse_args()
+    benchmark(args.digests, args.deals, args.catalog)
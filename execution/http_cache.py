@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import time
+
+# On-disk HTTP cache for brand sale pages. Stores each page body with its ETag /
+# Last-Modified validators and the result parsed from it, so a 304 reuses the parsed
+# result without downloading or re-parsing. Bounded by entry count and total bytes (LRU).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "..", ".tmp", "http_cache")
+MAX_ENTRIES = 200
+MAX_BYTES = 100 * 1024 * 1024
+
+
+class HttpCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                print(f"Ignoring unreadable HTTP cache index: {e}")
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+    def conditional_headers(self, url, headers):
+        """Adds If-None-Match / If-Modified-Since for URLs we hold a cached body for."""
+        entry = self.index.get(url)
+        headers = dict(headers)
+        if entry and os.path.exists(self._body_path(url)):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get(self, url):
+        """Returns the cache entry for `url` (marking it recently used), or None."""
+        entry = self.index.get(url)
+        if entry is None:
+            return None
+        entry["last_used"] = time.time()
+        return entry
+
+    def body(self, url):
+        path = self._body_path(url)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def store(self, url, headers, content, parsed, brand=None, category=None):
+        """
+        Caches a 200 response when it carries validators; otherwise there is nothing to revalidate.
+        `brand` / `category` record what `parsed` was parsed as, since one page can serve several brands.
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            self.index.pop(url, None)
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._body_path(url), "wb") as f:
+            f.write(content)
+        self.index[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": len(content),
+            "parsed": parsed,
+            "brand": brand,
+            "category": category,
+            "last_used": time.time(),
+        }
+
+    def update_parsed(self, url, parsed, brand=None, category=None):
+        if url in self.index:
+            self.index[url].update(parsed=parsed, brand=brand, category=category)
+
+    def _evict(self):
+        by_age = sorted(self.index.items(), key=lambda kv: kv[1].get("last_used", 0))
+        total = sum(e.get("size", 0) for _, e in by_age)
+        while by_age and (len(by_age) > self.max_entries or total > self.max_bytes):
+            url, entry = by_age.pop(0)
+            total -= entry.get("size", 0)
+            del self.index[url]
+            try:
+                os.remove(self._body_path(url))
+            except OSError:
+                pass
+
+    def save(self):
+        self._evict()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_file)
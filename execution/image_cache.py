@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+from async_fetch import fetch_all
+from atomic_files import write_atomic, write_json_atomic
+import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow the CDN's own (already small) variant is cached as-is
+    Image = None
+
+# Local thumbnail cache for product and brand images, so the dashboard loads small local
+# files instead of hotlinking dozens of full-size images from remote CDNs:
+#   - CDN size suffixes are normalized, so one image scraped at different sizes is one entry
+#   - downloads run concurrently over the pooled fetcher (global and per-host limits)
+#   - thumbnails are resized WebP files named by the hash of their content, bounded by
+#     entry count and total bytes (LRU)
+#   - URLs that fail are marked dead and only retried after a backoff
+#
+#   python image_cache.py              # cache every image in the serving artifact, then republish
+#   python image_cache.py --stats
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "..", ".tmp", "images")
+MAX_ENTRIES = 5000
+MAX_BYTES = 200 * 1024 * 1024
+
+THUMB_SIZE = 320          # Longest side in px; cards render images 128px tall
+THUMB_QUALITY = 75
+MAX_CONCURRENCY = 16
+MAX_PER_HOST = 4
+REQUEST_TIMEOUT = 15
+
+# Dead-URL backoff: retry after 1, 2, 4 ... days, up to a month; gone-for-good statuses start there
+RETRY_BASE = 86400
+RETRY_MAX = 30 * 86400
+GONE_STATUSES = {404, 410}
+
+# (size suffix pattern, replacement giving the canonical image, suffix to download or None to keep the scraped one)
+CDN_SIZE_RULES = [
+    # Daraz / Lazada CDN: "<id>.jpg_360x360q80.jpg_.webp" -> "<id>.jpg"; listing-size JPEG is downloaded
+    (re.compile(r"(\.(?:jpe?g|png))_\d+x\d+q\d+\.(?:jpe?g|png|webp)(?:_\.webp)?$", re.I), r"\1", "_360x360q80.jpg"),
+    (re.compile(r"(\.(?:jpe?g|png))_\.webp$", re.I), r"\1", "_360x360q80.jpg"),
+    # PriceOye: "<slug>-100x100.webp" -> "<slug>.webp"
+    (re.compile(r"-\d+x\d+(\.(?:webp|jpe?g|png))$", re.I), r"\1", None),
+]
+
+
+def normalize_image_url(url):
+    """(canonical url, url to download) for a scraped image URL; the canonical url keys the cache."""
+    url = (url or "").strip()
+    if url.startswith("//"):
+        url = "https:" + url
+    for pattern, replacement, download_suffix in CDN_SIZE_RULES:
+        canonical, n = pattern.subn(replacement, url)
+        if n:
+            return canonical, canonical + download_suffix if download_suffix else url
+    return url, url
+
+
+def make_thumbnail(content):
+    """(bytes, extension) of the resized WebP thumbnail; the original bytes without Pillow."""
+    if Image is None:
+        return content, _sniff_extension(content)
+    with Image.open(io.BytesIO(content)) as img:
+        img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        out = io.BytesIO()
+        img.save(out, "WEBP", quality=THUMB_QUALITY, method=4)
+        return out.getvalue(), "webp"
+
+
+def _sniff_extension(content):
+    if content[:3] == b"\xff\xd8\xff":
+        return "jpg"
+    if content[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "webp"
+    if content[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    return None
+
+
+class ImageCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.entries = {}   # canonical url -> {"file", "size", "last_used"}
+        self.dead = {}      # canonical url -> {"status", "error", "failures", "retry_at"}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                self.entries = index.get("entries", {})
+                self.dead = index.get("dead", {})
+            except Exception as e:
+                print(f"Ignoring unreadable image cache index: {e}")
+
+    def thumbnail(self, url):
+        """File name of the cached thumbnail for `url` (any size variant), or None."""
+        if not url:
+            return None
+        entry = self.entries.get(normalize_image_url(url)[0])
+        if entry and os.path.exists(os.path.join(self.cache_dir, entry["file"])):
+            return entry["file"]
+        return None
+
+    def _due(self, canonical, now):
+        dead = self.dead.get(canonical)
+        return dead is None or dead["retry_at"] <= now
+
+    def _mark_dead(self, canonical, status, error, now):
+        failures = self.dead.get(canonical, {}).get("failures", 0) + 1
+        delay = RETRY_MAX if status in GONE_STATUSES else min(RETRY_BASE * 2 ** (failures - 1), RETRY_MAX)
+        self.dead[canonical] = {"status": status, "error": error, "failures": failures, "retry_at": now + delay}
+
+    def _store(self, canonical, content):
+        thumb, ext = make_thumbnail(content)
+        if ext is None:
+            raise ValueError("not an image")
+        # Content-addressed: identical images under different URLs share one file
+        name = f"{hashlib.sha256(thumb).hexdigest()[:32]}.{ext}"
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.exists(path):
+            write_atomic(path, lambda f: f.write(thumb), mode="wb")
+        self.entries[canonical] = {"file": name, "size": len(thumb), "last_used": time.time()}
+        self.dead.pop(canonical, None)
+
+    def cache_images(self, urls, max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST):
+        """
+        Downloads and thumbnails every image not cached yet; cached ones are only marked used
+        and dead ones are skipped until their retry time. Returns counts by outcome.
+        """
+        now = time.time()
+        counts = {"cached": 0, "fetched": 0, "failed": 0, "skipped_dead": 0}
+        todo, seen = {}, set()
+        for url in urls:
+            if not url or not url.startswith(("http://", "https://", "//")):
+                continue
+            canonical, download = normalize_image_url(url)
+            if canonical in seen:
+                continue
+            seen.add(canonical)
+            if canonical in self.entries and self.thumbnail(canonical):
+                self.entries[canonical]["last_used"] = now
+                counts["cached"] += 1
+            elif not self._due(canonical, now):
+                counts["skipped_dead"] += 1
+            else:
+                todo[canonical] = download
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if todo:
+            print(f"Fetching {len(todo)} images (max {max_concurrency}, {max_per_host}/host)...")
+            with metrics.timer("images", source="images"):
+                results = fetch_all(list(todo.values()), max_concurrency=max_concurrency,
+                                    max_per_host=max_per_host, timeout=REQUEST_TIMEOUT)
+            for canonical, res in zip(todo, results):
+                try:
+                    if not res.ok or res.status != 200:
+                        raise ValueError(res.error or f"HTTP {res.status}")
+                    self._store(canonical, res.content)
+                    counts["fetched"] += 1
+                except Exception as e:
+                    self._mark_dead(canonical, res.status, str(e), now)
+                    counts["failed"] += 1
+        for outcome, n in counts.items():
+            metrics.count("images", n, source="images", result=outcome)
+        return counts
+
+    def _evict(self):
+        by_age = sorted(self.entries.items(), key=lambda kv: kv[1].get("last_used", 0))
+        # Files can be shared by several URLs: count their bytes once, delete with the last user
+        refs = Counter(e["file"] for _, e in by_age)
+        total = sum({e["file"]: e["size"] for _, e in by_age}.values())
+        while by_age and (len(self.entries) > self.max_entries or total > self.max_bytes):
+            url, entry = by_age.pop(0)
+            del self.entries[url]
+            refs[entry["file"]] -= 1
+            if not refs[entry["file"]]:
+                total -= entry["size"]
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry["file"]))
+                except OSError:
+                    pass
+
+    def save(self):
+        self._evict()
+        write_json_atomic(self.index_file, {"entries": self.entries, "dead": self.dead})
+
+    def stats(self):
+        files = {e["file"]: e["size"] for e in self.entries.values()}
+        hosts = {}
+        for url in self.dead:
+            host = urlparse(url).netloc
+            hosts[host] = hosts.get(host, 0) + 1
+        return {"entries": len(self.entries), "files": len(files), "bytes": sum(files.values()),
+                "dead": len(self.dead), "dead_by_host": hosts}
+
+
+def cache_serving_images(republish=True):
+    """Caches every image the published rows reference, then republishes so rows pick up their thumbnails."""
+    from publish_sales import load_artifact, publish
+    artifact = load_artifact()
+    if not artifact:
+        print("No serving artifact yet; nothing to cache.")
+        return None
+    cache = ImageCache()
+    counts = cache.cache_images(row.get("ImageURL") for row in artifact["rows"])
+    cache.save()
+    print(f"Images: {counts['fetched']} fetched, {counts['cached']} already cached, "
+          f"{counts['failed']} failed, {counts['skipped_dead']} skipped (dead)")
+    if republish and counts["fetched"]:
+        publish()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache scraped images as small local thumbnails.")
+    parser.add_argument("--stats", action="store_true", help="Print cache size and dead URLs")
+    parser.add_argument("--no-publish", action="store_true", help="Don't republish the serving artifact")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(ImageCache().stats(), indent=2))
+        return
+    cache_serving_images(republish=not args.no_publish)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+import argparse
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from dotenv import load_dotenv
+
+import metrics
+
+# Outgoing mail: a small pool of persistent SMTP sessions (STARTTLS + login once per
+# connection, then many messages), a shared send-rate limit, and retry with backoff for
+# transient failures. Messages are either sent in-process via dispatch(), or spooled to
+# .tmp/mail_queue/ and delivered by a long-lived worker (`python mail_dispatch.py worker`).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, "..", ".env"))
+
+SPOOL_DIR = os.path.join(BASE_DIR, "..", ".tmp", "mail_queue")
+FAILED_DIR = os.path.join(SPOOL_DIR, "failed")
+WORKER_FILE = os.path.join(SPOOL_DIR, "worker.json")
+
+POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+RATE_PER_SEC = float(os.getenv("SMTP_RATE_PER_SEC", "5"))
+MAX_MESSAGES_PER_CONNECTION = 100   # Most providers cap messages per session
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0                  # Seconds; doubles per attempt
+POLL_INTERVAL = 2.0
+SENDING_STALE_AFTER = 600           # Seconds before a claimed message is presumed abandoned by a dead worker
+# Credentials are only ever sent over TLS; SMTP_STARTTLS=0 allows a plaintext local relay
+REQUIRE_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+
+
+def smtp_config():
+    return {
+        "host": os.getenv("SMTP_HOST"),
+        "port": os.getenv("SMTP_PORT"),
+        "user": os.getenv("SMTP_USER"),
+        "password": os.getenv("SMTP_PASS"),
+        "sender": os.getenv("SMTP_FROM") or os.getenv("SMTP_USER") or "retail-monitor@localhost",
+    }
+
+
+def build_message(sender, to_email, subject, html_content):
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+
+def is_transient(error):
+    """Worth retrying: dropped connections, network errors and 4xx replies."""
+    # SMTPException subclasses OSError, so SMTP replies are classified before network errors
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class RateLimiter:
+    """Token bucket shared by every connection in the pool."""
+
+    def __init__(self, rate_per_sec=RATE_PER_SEC, burst=None):
+        self.rate = rate_per_sec
+        self.capacity = burst or max(1.0, rate_per_sec)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SmtpConnection:
+    """One SMTP session, opened lazily and reused until it drops or hits its message cap."""
+
+    def __init__(self, config):
+        self.config = config
+        self.server = None
+        self.sent = 0
+
+    def _open(self):
+        server = smtplib.SMTP(self.config["host"], int(self.config["port"]), timeout=30)
+        server.ehlo()
+        if REQUIRE_STARTTLS:
+            if not server.has_extn("starttls"):
+                server.close()
+                raise smtplib.SMTPNotSupportedError(
+                    f"{self.config['host']} does not offer STARTTLS (set SMTP_STARTTLS=0 to send without TLS)")
+            server.starttls()
+            server.ehlo()
+        if self.config.get("user") and self.config.get("password") and server.has_extn("auth"):
+            server.login(self.config["user"], self.config["password"])
+        self.server = server
+        self.sent = 0
+
+    def send(self, msg):
+        if self.server is None or self.sent >= MAX_MESSAGES_PER_CONNECTION:
+            self.close()
+            self._open()
+        try:
+            self.server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Let the retry reconnect from scratch
+            self.server = None
+            raise
+        self.sent += 1
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+
+class SmtpPool:
+    def __init__(self, config=None, size=POOL_SIZE, rate_per_sec=RATE_PER_SEC):
+        self.config = config or smtp_config()
+        self.size = max(1, size)
+        self.limiter = RateLimiter(rate_per_sec)
+        self._idle = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(SmtpConnection(self.config))
+
+    @property
+    def sender(self):
+        return self.config.get("sender") or self.config.get("user") or "retail-monitor@localhost"
+
+    @property
+    def configured(self):
+        return bool(self.config.get("host") and self.config.get("port"))
+
+    def send(self, msg, max_attempts=MAX_ATTEMPTS):
+        """Sends `msg`, retrying transient failures with exponential backoff. Returns True on success."""
+        conn = self._idle.get()
+        try:
+            for attempt in range(1, max_attempts + 1):
+                self.limiter.acquire()
+                start = time.perf_counter()
+                try:
+                    conn.send(msg)
+                    metrics.observe("smtp_send_seconds", time.perf_counter() - start, host=self.config["host"])
+                    metrics.count("emails", result="sent")
+                    return True
+                except Exception as e:
+                    if not is_transient(e) or attempt == max_attempts:
+                        print(f"Failed to send email to {msg['To']}: {e}")
+                        metrics.count("emails", result="failed")
+                        return False
+                    metrics.count("emails", result="retried")
+                    delay = BACKOFF_BASE * 2 ** (attempt - 1)
+                    print(f"Send to {msg['To']} failed ({e}); retrying in {delay:.0f}s")
+                    conn.close()
+                    time.sleep(delay)
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def dispatch(messages, pool=None):
+    """
+    Sends (to_email, subject, html) tuples over the pool's connections concurrently and
+    returns how many were delivered.
+    """
+    own_pool = pool is None
+    pool = pool or SmtpPool()
+    work = queue.Queue()
+    for item in messages:
+        work.put(item)
+    sent = [0]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                to_email, subject, html_content = work.get_nowait()
+            except queue.Empty:
+                return
+            msg = build_message(pool.sender, to_email, subject, html_content)
+            if pool.send(msg):
+                print(f"Email sent successfully to {to_email}")
+                with lock:
+                    sent[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(min(pool.size, work.qsize()))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if own_pool:
+        pool.close()
+    return sent[0]
+
+
+# -- spool + worker -------------------------------------------------------------
+
+def enqueue_email(to_email, subject=None, html=None, template=None):
+    """
+    Spools a message for the worker. Either `subject` + `html`, or a named `template`
+    rendered by the worker (see send_email_alert.render_template).
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    item = {"to": to_email, "subject": subject, "html": html, "template": template,
+            "queued_at": time.time(), "attempts": 0}
+    name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+    tmp = os.path.join(SPOOL_DIR, name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(item, f)
+    os.replace(tmp, os.path.join(SPOOL_DIR, name))
+    return name
+
+
+def _spooled():
+    if not os.path.isdir(SPOOL_DIR):
+        return []
+    return sorted(n for n in os.listdir(SPOOL_DIR) if n.endswith(".json") and n != os.path.basename(WORKER_FILE))
+
+
+def _render(item):
+    if item.get("template"):
+        from send_email_alert import render_template
+        return render_template(item["template"], item)
+    return item["subject"], item["html"]
+
+
+def _deliver_spooled(pool, name):
+    # Claim the message first so a second worker can never send it too
+    path = os.path.join(SPOOL_DIR, name + ".sending")
+    try:
+        os.rename(os.path.join(SPOOL_DIR, name), path)
+        os.utime(path)   # Claim time, for _requeue_abandoned()
+        with open(path, "r", encoding="utf-8") as f:
+            item = json.load(f)
+    except (OSError, ValueError):
+        return
+    try:
+        subject, html_content = _render(item)
+        msg = build_message(pool.sender, item["to"], subject, html_content)
+        sent = pool.send(msg)
+    except Exception as e:
+        # A malformed item (missing fields, unknown template) must not take the sender down
+        print(f"Could not deliver spooled message {name}: {e}")
+        sent = False
+    if sent:
+        print(f"Email sent successfully to {item['to']}")
+        os.remove(path)
+    else:
+        os.makedirs(FAILED_DIR, exist_ok=True)
+        os.replace(path, os.path.join(FAILED_DIR, name))
+
+
+def _requeue_abandoned(stale_after=SENDING_STALE_AFTER):
+    """Returns messages claimed by a worker that died mid-send to the spool."""
+    if not os.path.isdir(SPOOL_DIR):
+        return
+    for name in os.listdir(SPOOL_DIR):
+        if not name.endswith(".json.sending"):
+            continue
+        path = os.path.join(SPOOL_DIR, name)
+        try:
+            if time.time() - os.path.getmtime(path) > stale_after:
+                os.rename(path, path[:-len(".sending")])
+                print(f"Requeued abandoned message {name[:-len('.sending')]}")
+        except OSError:
+            pass
+
+
+def run_worker(idle_exit=None, poll_interval=POLL_INTERVAL):
+    """Delivers spooled messages until stopped, or until idle for `idle_exit` seconds."""
+    pool = SmtpPool()
+    if not pool.configured:
+        print("Error: Missing SMTP configuration in .env")
+        return
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    _requeue_abandoned()
+    in_flight = set()
+    lock = threading.Lock()
+    work = queue.Queue()
+
+    def sender():
+        while True:
+            name = work.get()
+            if name is None:
+                return
+            try:
+                _deliver_spooled(pool, name)
+            finally:
+                with lock:
+                    in_flight.discard(name)
+
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(pool.size)]
+    for t in threads:
+        t.start()
+
+    idle_since = time.time()
+    print(f"Mail worker started ({pool.size} connections, {pool.limiter.rate}/s)")
+    try:
+        while True:
+            with open(WORKER_FILE, "w", encoding="utf-8") as f:
+                json.dump({"pid": os.getpid(), "heartbeat": time.time()}, f)
+            with lock:
+                pending = [n for n in _spooled() if n not in in_flight]
+                in_flight.update(pending)
+                busy = bool(in_flight)
+            for name in pending:
+                work.put(name)
+            if busy:
+                idle_since = time.time()
+            elif idle_exit is not None and time.time() - idle_since > idle_exit:
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for _ in threads:
+            work.put(None)
+        for t in threads:
+            t.join()
+        pool.close()
+        try:
+            os.remove(WORKER_FILE)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Outgoing mail queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Deliver spooled messages")
+    worker.add_argument("--idle-exit", type=float, help="Exit after this many idle seconds")
+    enq = sub.add_parser("enqueue", help="Spool a templated message")
+    enq.add_argument("to")
+    enq.add_argument("--template", default="confirmation")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_worker(args.idle_exit)
+    else:
+        print(enqueue_email(args.to, template=args.template))
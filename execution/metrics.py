@@ -0,0 +1,171 @@
+import bisect
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Process-wide run metrics for the scrapers and mailer: time per stage (navigate, wait,
+# scroll, extract, write, ...), counters (cards seen/kept/dropped by reason, which card
+# selector matched, emails sent) and latency histograms per host. Written at the end of a
+# run as .tmp/metrics/<run>.json and, with METRICS_PROMETHEUS=1, a Prometheus text file.
+#
+# Worker processes (scrape_scheduler) send collect() snapshots back and the parent merge()s them.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_DIR = os.path.join(BASE_DIR, "..", ".tmp", "metrics")
+PROMETHEUS_ENABLED = os.getenv("METRICS_PROMETHEUS", "") not in ("", "0", "false")
+PREFIX = "retail_monitor"
+
+# Seconds; upper bounds of the latency histogram buckets (+Inf is implied)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.datetime.now().isoformat()
+        self.timings = {}      # (stage, labels) -> [calls, total seconds, max seconds]
+        self.counters = {}     # (name, labels) -> value
+        self.histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+    def add_time(self, stage, seconds, **labels):
+        key = _key(stage, labels)
+        with self.lock:
+            entry = self.timings.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start, **labels)
+
+    def count(self, name, n=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            entry = self.histograms.setdefault(key, [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            entry[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+            entry[-1] += value
+
+    # -- transport between processes -------------------------------------------
+
+    def collect(self):
+        """Snapshot of everything recorded so far, then reset (for worker processes)."""
+        with self.lock:
+            snapshot = {
+                "timings": [[k[0], list(k[1]), v] for k, v in self.timings.items()],
+                "counters": [[k[0], list(k[1]), v] for k, v in self.counters.items()],
+                "histograms": [[k[0], list(k[1]), v] for k, v in self.histograms.items()],
+            }
+            self.timings, self.counters, self.histograms = {}, {}, {}
+            self.started_at = datetime.datetime.now().isoformat()
+        return snapshot
+
+    def merge(self, snapshot):
+        with self.lock:
+            for name, labels, (calls, total, longest) in snapshot["timings"]:
+                entry = self.timings.setdefault((name, tuple(map(tuple, labels))), [0, 0.0, 0.0])
+                entry[0] += calls
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                self.counters[key] = self.counters.get(key, 0) + value
+            for name, labels, buckets in snapshot["histograms"]:
+                entry = self.histograms.setdefault((name, tuple(map(tuple, labels))), [0] * len(buckets[:-1]) + [0.0])
+                for i, v in enumerate(buckets):
+                    entry[i] += v
+
+    # -- output ------------------------------------------------------------------
+
+    def report(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "generated_at": datetime.datetime.now().isoformat(),
+                "stages": [
+                    {"stage": name, "labels": dict(labels), "calls": calls,
+                     "total_s": round(total, 4), "avg_s": round(total / calls, 4), "max_s": round(longest, 4)}
+                    for (name, labels), (calls, total, longest) in sorted(self.timings.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": sum(entry[:-1]), "sum": round(entry[-1], 4),
+                     "buckets": {str(le): n for le, n in zip(list(LATENCY_BUCKETS) + ["+Inf"], entry[:-1])}}
+                    for (name, labels), entry in sorted(self.histograms.items())
+                ],
+            }
+
+    def prometheus(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            if self.timings:
+                lines += [f"# TYPE {PREFIX}_stage_seconds_total counter", f"# TYPE {PREFIX}_stage_calls_total counter"]
+                for (name, labels), (calls, total, _) in sorted(self.timings.items()):
+                    stage = (("stage", name),) + labels
+                    lines.append(f"{PREFIX}_stage_seconds_total{fmt(stage)} {total:.6f}")
+                    lines.append(f"{PREFIX}_stage_calls_total{fmt(stage)} {calls}")
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{PREFIX}_{name}_total{fmt(labels)} {value}")
+            for (name, labels), entry in sorted(self.histograms.items()):
+                cumulative = 0
+                for le, n in zip(list(LATENCY_BUCKETS) + ["+Inf"], entry[:-1]):
+                    cumulative += n
+                    lines.append(f"{PREFIX}_{name}_bucket{fmt(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{PREFIX}_{name}_sum{fmt(labels)} {entry[-1]:.6f}")
+                lines.append(f"{PREFIX}_{name}_count{fmt(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+# Module-level shortcuts onto the process-wide instance
+add_time = metrics.add_time
+timer = metrics.timer
+count = metrics.count
+observe = metrics.observe
+
+
+def card_dropped(source, reason):
+    metrics.count("cards_dropped", source=source, reason=reason)
+
+
+def write_report(run, prometheus=None):
+    """Writes .tmp/metrics/<run>.json (and <run>.prom if enabled); returns the JSON path."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{run}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(metrics.report(), run=run), f, indent=2)
+    if PROMETHEUS_ENABLED if prometheus is None else prometheus:
+        prom_path = os.path.join(METRICS_DIR, f"{run}.prom")
+        tmp = prom_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(metrics.prometheus())
+        os.replace(tmp, prom_path)
+    print(f"Metrics report written to {path}")
+    return path
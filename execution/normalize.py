@@ -0,0 +1,118 @@
+import json
+import os
+import re
+import time
+from functools import lru_cache
+
+# Shared, precompiled text normalization and product categorization.
+# Category keyword rules live in category_rules.json so every scraper classifies the same way.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_FILE = os.path.join(BASE_DIR, "category_rules.json")
+
+RS_PRICE_RE = re.compile(r'Rs\.\s?([\d,]+)')
+DISCOUNT_BADGE_RE = re.compile(r'-(\d+)%')
+PERCENT_RE = re.compile(r'(\d+)%')
+PERCENT_2DIGIT_RE = re.compile(r'(\d{1,2})%')
+REVIEWS_RE = re.compile(r'\((\d+)\)')
+IMAGE_EXT_RE = re.compile(r'\.(jpg|png|webp)', re.I)
+NON_DIGIT_RE = re.compile(r'[^\d]')
+SPACES_RE = re.compile(r'[ \t\xa0]+')
+DISCOUNT_CLASS_RE = re.compile(r'badge|label|discount|sale|price-tag|reduction', re.I)
+# Server-rendered page state on Daraz: catalog/search pages (pageData) and campaign pages (__FIRST_SCREEN_DATA)
+EMBEDDED_STATE_RE = re.compile(r'window\.(pageData|__FIRST_SCREEN_DATA)\s*=\s*(?=\{)')
+PRICE_NUMBER_RE = re.compile(r'[\d,]+(?:\.\d+)?')
+
+
+@lru_cache(maxsize=None)
+def banner_alt_re(category):
+    """Alt-text pattern used to find a category banner image on brand sale pages."""
+    patterns = [category.lower(), "banner", "sale", "hero"]
+    return re.compile('|'.join(re.escape(p) for p in patterns), re.I)
+
+
+def keyword_re(keywords):
+    """
+    One precompiled alternation for a keyword list; `search` matches wherever any
+    keyword occurs (substring semantics, like `kw in text`) in a single C-level scan.
+    Longest keywords go first so overlapping alternatives resolve the same way every run.
+    """
+    ordered = sorted({kw.lower() for kw in keywords}, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(kw) for kw in ordered))
+
+
+class CategoryClassifier:
+    """Picks the highest-priority category whose keywords appear in a product name."""
+
+    def __init__(self, rules):
+        self.default = rules.get("default", "Electronics")
+        self.aliases = rules.get("aliases", {})
+        self.categories = [c["name"] for c in rules["categories"]]
+        # Priority order is the order categories appear in the rules file
+        self._patterns = [(c["name"], keyword_re(c["keywords"])) for c in rules["categories"]]
+
+    def classify(self, name, default=None):
+        lower_name = (name or "").lower()
+        for category, pattern in self._patterns:
+            if pattern.search(lower_name):
+                return category
+        return default if default is not None else self.default
+
+    def canonical(self, category):
+        """Maps source-specific category names (e.g. PriceOye's "Mobiles") to shared ones."""
+        return self.aliases.get(category, category)
+
+
+@lru_cache(maxsize=1)
+def load_classifier(path=RULES_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        return CategoryClassifier(json.load(f))
+
+
+def classify_product(name, default=None):
+    return load_classifier().classify(name, default)
+
+
+def canonical_category(category):
+    return load_classifier().canonical(category)
+
+
+def _linear_classify(name, rules):
+    # Reference implementation: the original chain of `any(kw in lower_name ...)` scans
+    lower_name = name.lower()
+    for c in rules["categories"]:
+        if any(kw in lower_name for kw in c["keywords"]):
+            return c["name"]
+    return rules.get("default", "Electronics")
+
+
+def benchmark(names, rounds=20):
+    with open(RULES_FILE, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    classifier = load_classifier()
+
+    mismatches = [n for n in names if classifier.classify(n) != _linear_classify(n, rules)]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for n in names:
+            _linear_classify(n, rules)
+    linear = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for n in names:
+            classifier.classify(n)
+    compiled = time.perf_counter() - start
+
+    total = len(names) * rounds
+    print(f"Names: {len(names)} x {rounds} rounds, mismatches vs linear scan: {len(mismatches)}")
+    print(f"Linear scan: {total / linear:,.0f} names/sec")
+    print(f"Compiled classifier: {total / compiled:,.0f} names/sec")
+    return mismatches
+
+
+if __name__ == "__main__":
+    with open(os.path.join(BASE_DIR, "priceoye_electronics.json"), "r", encoding="utf-8") as f:
+        names = [p["name"] for p in json.load(f)]
+    benchmark(names)
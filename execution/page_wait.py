@@ -0,0 +1,169 @@
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+import metrics
+
+# Readiness-driven waiting shared by the Selenium scrapers: instead of fixed sleeps,
+# wait for the document, the network and the product cards, and stop scrolling once
+# no new cards appear.
+
+POLL_INTERVAL = 0.2
+READY_TIMEOUT = 15
+CARDS_TIMEOUT = 10
+NETWORK_IDLE_MS = 500
+SCROLL_PAUSE = 0.2
+SCROLL_STABLE_ROUNDS = 2
+SCROLL_MAX_STEPS = 60
+
+# Counts matches for every selector in one query; used to pick the first selector (in
+# priority order) that has cards, so all candidates share a single timeout.
+COUNT_SELECTORS_JS = """
+return arguments[0].map((sel) => {
+    try { return document.querySelectorAll(sel).length; } catch (e) { return 0; }
+});
+"""
+
+RESOURCE_COUNT_JS = "return performance.getEntriesByType('resource').length;"
+
+SCROLL_STEP_JS = """
+const [selector, step] = arguments;
+window.scrollBy(0, step || window.innerHeight);
+const doc = document.scrollingElement || document.documentElement;
+return {
+    count: document.querySelectorAll(selector).length,
+    height: doc.scrollHeight,
+    atBottom: window.innerHeight + window.scrollY >= doc.scrollHeight - 2
+};
+"""
+
+
+class WaitStats:
+    """Accumulates time spent waiting per phase for one page (also recorded in the run metrics)."""
+
+    def __init__(self, label="", source=None):
+        self.label = label
+        self.source = source
+        self.phases = {}
+
+    @contextmanager
+    def timed(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+            metrics.add_time("scroll" if phase == "scroll" else "wait", elapsed, source=self.source, phase=phase)
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+    def summary(self):
+        parts = ", ".join(f"{k} {v:.2f}s" for k, v in self.phases.items())
+        return f"Waited {self.total:.2f}s on {self.label} ({parts})"
+
+
+def wait_for_document_ready(driver, timeout=READY_TIMEOUT):
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+def wait_for_network_idle(driver, idle_ms=NETWORK_IDLE_MS, timeout=READY_TIMEOUT):
+    """Waits until no new resource requests have started for `idle_ms`."""
+    deadline = time.monotonic() + timeout
+    last_count = -1
+    last_change = time.monotonic()
+    while time.monotonic() < deadline:
+        count = driver.execute_script(RESOURCE_COUNT_JS)
+        now = time.monotonic()
+        if count != last_count:
+            last_count = count
+            last_change = now
+        elif (now - last_change) * 1000 >= idle_ms:
+            return True
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def wait_for_cards(driver, selectors, timeout=CARDS_TIMEOUT):
+    """
+    Polls all `selectors` together until at least one matches.
+    Returns the first matching selector in priority order, or None on timeout.
+    """
+    if isinstance(selectors, str):
+        selectors = [selectors]
+
+    def first_match(d):
+        counts = d.execute_script(COUNT_SELECTORS_JS, list(selectors))
+        for selector, count in zip(selectors, counts):
+            if count:
+                return selector
+        return False
+
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(first_match)
+    except TimeoutException:
+        return None
+
+
+def scroll_until_stable(driver, card_selector, step=None, pause=SCROLL_PAUSE, stable_rounds=SCROLL_STABLE_ROUNDS, max_steps=SCROLL_MAX_STEPS):
+    """
+    Scrolls a viewport at a time (so lazy images load) and stops once the page bottom
+    is reached and neither the card count nor the page height changed for
+    `stable_rounds` checks. Returns the final card count.
+    """
+    last = None
+    stable = 0
+    count = 0
+    for _ in range(max_steps):
+        state = driver.execute_script(SCROLL_STEP_JS, card_selector, step)
+        count = state["count"]
+        if state["atBottom"]:
+            current = (count, state["height"])
+            stable = stable + 1 if current == last else 0
+            last = current
+            if stable >= stable_rounds:
+                break
+        time.sleep(pause)
+    return count
+
+
+def navigate(driver, url, source=None):
+    """driver.get() timed as the "navigate" stage, with per-host page load latency."""
+    start = time.perf_counter()
+    try:
+        driver.get(url)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.add_time("navigate", elapsed, source=source)
+        metrics.observe("page_load_seconds", elapsed, host=urlparse(url).netloc)
+
+
+def wait_for_page(driver, selectors, stats, cards_timeout=CARDS_TIMEOUT, scroll=True):
+    """
+    Full readiness sequence used after `driver.get()`: document ready, first card
+    selector present, network idle, then adaptive scroll. Returns the matched selector.
+    """
+    with stats.timed("ready"):
+        wait_for_document_ready(driver)
+    with stats.timed("cards"):
+        selector = wait_for_cards(driver, selectors, timeout=cards_timeout)
+    metrics.count("selector_matched", source=stats.source, selector=selector or "none")
+    if selector is None:
+        return None
+    with stats.timed("network"):
+        wait_for_network_idle(driver)
+    if scroll:
+        with stats.timed("scroll"):
+            scroll_until_stable(driver, selector)
+    return selector
@@ -0,0 +1,496 @@
+import argparse
+import datetime
+import json
+import os
+import time
+from urllib.parse import urljoin
+
+import lxml.html
+
+from metrics import card_dropped
+from normalize import (
+    DISCOUNT_BADGE_RE, EMBEDDED_STATE_RE, IMAGE_EXT_RE, NON_DIGIT_RE, PERCENT_RE, PRICE_NUMBER_RE, REVIEWS_RE,
+    RS_PRICE_RE, SPACES_RE, canonical_category, classify_product,
+)
+
+# Pure HTML -> product parsing for Daraz and PriceOye pages.
+# Selenium only has to fetch `driver.page_source`; everything here runs without a browser,
+# so archived dumps (execution/*_debug.html) can be re-parsed and benchmarked in bulk.
+
+DARAZ_BASE_URL = "https://www.daraz.pk/"
+PRICEOYE_BASE_URL = "https://priceoye.pk/"
+DARAZ_MIN_DISCOUNT = 25
+
+# Block-level tags: innerText puts a line break around these
+BLOCK_TAGS = {"div", "p", "li", "ul", "section", "article", "header", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "br", "tr", "table"}
+
+
+def _class_xpath(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _any_class_xpath(*class_names):
+    return " or ".join(_class_xpath(c) for c in class_names)
+
+
+# Same selectors, same priority, as card_selectors in scrape_daraz_electronics.scrape_page()
+DARAZ_CARD_XPATHS = [
+    (".search-product-item", f".//*[{_class_xpath('search-product-item')}]"),
+    (".product-jfy-item", f".//*[{_class_xpath('product-jfy-item')}]"),
+    (".jfy-product-card-wrapper", f".//*[{_class_xpath('jfy-product-card-wrapper')}]"),
+    ("[data-qa-locator='product-item']", ".//*[@data-qa-locator='product-item']"),
+    (".unit-content", f".//*[{_class_xpath('unit-content')}]"),
+]
+DARAZ_NAME_XPATH = f".//*[{_any_class_xpath('RfADt', 'jfy-product-card-name', 'title', 'name')}]"
+DARAZ_PRICE_XPATH = f".//*[{_any_class_xpath('ooOxS', 'jfy-product-card-price', 'price')}]"
+DARAZ_COINS_XPATH = f".//*[{_any_class_xpath('WNoq3', 'coins')}]"
+
+PRICEOYE_CARD_XPATH = f".//a[{_class_xpath('ga-dataset')}]"
+
+
+def extract_rs_price(text):
+    if not text: return 0.0
+    match = RS_PRICE_RE.search(text)
+    if match:
+        return float(match.group(1).replace(',', ''))
+    return 0.0
+
+
+def extract_digits_price(text):
+    if not text: return 0.0
+    # Clean up "Rs." and commas
+    clean = NON_DIGIT_RE.sub('', text)
+    return float(clean) if clean else 0.0
+
+
+def inner_text(el):
+    """Approximates the browser's innerText: text nodes, with line breaks around block elements."""
+    if el is None:
+        return ""
+    parts = []
+
+    def walk(node):
+        tag = node.tag if isinstance(node.tag, str) else ""
+        if tag in ("script", "style"):
+            return
+        block = tag in BLOCK_TAGS
+        if block:
+            parts.append("\n")
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+        if block:
+            parts.append("\n")
+
+    walk(el)
+    lines = [SPACES_RE.sub(' ', line).strip() for line in "".join(parts).split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def _first(el, xpath):
+    found = el.xpath(xpath)
+    return found[0] if found else None
+
+
+def daraz_card_fields(card, base_url=DARAZ_BASE_URL):
+    """Builds the same raw field dict that BULK_EXTRACT_JS returns, from an lxml card element."""
+    name_el = _first(card, DARAZ_NAME_XPATH)
+    price_el = _first(card, DARAZ_PRICE_XPATH)
+    img = _first(card, ".//img")
+    image = None
+    if img is not None:
+        src = img.get("src") or img.get("data-src")
+        image = urljoin(base_url, src) if src else None
+    return {
+        "text": inner_text(card),
+        "has_mall": "mall" in lxml.html.tostring(card, encoding="unicode").lower(),
+        "name": inner_text(name_el) if name_el is not None else None,
+        "links": [
+            {"href": urljoin(base_url, a.get("href")) if a.get("href") else None, "title": a.get("title"), "text": inner_text(a)}
+            for a in card.xpath(".//a")
+        ],
+        "price_text": inner_text(price_el) if price_el is not None else None,
+        "coins": [inner_text(c) for c in card.xpath(DARAZ_COINS_XPATH)],
+        "rating": card.get("data-rating"),
+        "image": image,
+    }
+
+
+def parse_daraz_card_fields(fields, min_discount=DARAZ_MIN_DISCOUNT):
+    """
+    Turns raw Daraz card fields (see BULK_EXTRACT_JS in scrape_daraz_electronics.py)
+    into a product dict, or None if the card is filtered out.
+    """
+    text = fields.get("text") or ""
+
+    # Basic info
+    name = (fields.get("name") or "").strip()
+    product_url = ""
+
+    # Find product URL
+    for link in fields.get("links") or []:
+        href = link.get("href")
+        if href and "/products/" in href:
+            product_url = href
+            # If we don't have a name yet, try this link's title/text
+            if not name:
+                t = (link.get("title") or link.get("text") or "").strip()
+                if len(t) > 10 and not t.startswith("http") and not IMAGE_EXT_RE.search(t):
+                    name = t
+            if product_url and name: break
+
+    if not name:
+        # Last resort: take the longest text block that's not a price
+        text_blocks = [t.strip() for t in text.split('\n') if len(t.strip()) > 15]
+        for b in text_blocks:
+            if "Rs." not in b and "-" not in b:
+                name = b
+                break
+
+    if not name:
+        card_dropped("daraz", "no_name")
+        return None
+    if product_url.startswith("//"): product_url = "https:" + product_url
+
+    # Sale Price
+    sale_price = 0.0
+    if fields.get("price_text") is not None:
+        sale_price = extract_rs_price(fields["price_text"])
+    else:
+        rs_matches = RS_PRICE_RE.findall(text)
+        if rs_matches: sale_price = float(rs_matches[0].replace(',', ''))
+
+    if sale_price == 0.0:
+        card_dropped("daraz", "no_price")
+        return None
+
+    # Original Price & Discount
+    orig_price = sale_price
+    discount = 0
+
+    # Remove coins section
+    clean_text = text
+    for c in fields.get("coins") or []: clean_text = clean_text.replace(c, "")
+
+    disc_match = DISCOUNT_BADGE_RE.search(clean_text)
+    if disc_match:
+        discount = int(disc_match.group(1))
+
+    # Look for another price (original)
+    all_prices = RS_PRICE_RE.findall(clean_text)
+    price_vals = [float(p.replace(',', '')) for p in all_prices]
+    if len(price_vals) > 1:
+        others = [p for p in price_vals if abs(p - sale_price) > 5]
+        if others:
+            orig_price = max(others)
+            if orig_price > sale_price:
+                calc_disc = int(((orig_price - sale_price) / orig_price) * 100)
+                discount = max(discount, calc_disc)
+
+    if discount > 0 and orig_price == sale_price:
+        orig_price = round(sale_price / (1 - (discount / 100)), 2)
+
+    # Filter by discount
+    if discount < min_discount:
+        card_dropped("daraz", "below_min_discount")
+        return None
+
+    # Rating & Reviews
+    rating = 0.0
+    reviews = 0
+    review_match = REVIEWS_RE.search(clean_text)
+    if review_match: reviews = int(review_match.group(1))
+
+    if fields.get("rating"): rating = float(fields["rating"])
+
+    # Image
+    image_url = fields.get("image") or ""
+
+    # Badges
+    badges = []
+    if "Free Shipping" in clean_text: badges.append("Free Shipping")
+    if "COD" in clean_text: badges.append("COD")
+    if fields.get("has_mall"): badges.append("Daraz Mall")
+
+    # Categorization rules are shared with PriceOye (category_rules.json)
+    category = classify_product(name)
+
+    return {
+        "name": name,
+        "category": category,
+        "brand": "Unknown",
+        "sale_price": sale_price,
+        "original_price": orig_price,
+        "discount_percentage": discount,
+        "image_url": image_url,
+        "product_url": product_url,
+        "rating": rating,
+        "reviews": reviews,
+        "badges": badges,
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+
+def find_daraz_cards(doc):
+    """Returns (selector, cards) for the first card selector that matches, like scrape_page()."""
+    for selector, xpath in DARAZ_CARD_XPATHS:
+        cards = doc.xpath(xpath)
+        if cards:
+            return selector, cards
+    return None, []
+
+
+def parse_daraz_html(html, base_url=DARAZ_BASE_URL, min_discount=DARAZ_MIN_DISCOUNT):
+    """Parses a Daraz listing page (page_source) into the product dicts scrape_page() emits."""
+    if not html:
+        return []
+    doc = lxml.html.fromstring(html)
+    _, cards = find_daraz_cards(doc)
+    products = []
+    for card in cards:
+        try:
+            product = parse_daraz_card_fields(daraz_card_fields(card, base_url), min_discount)
+            if product:
+                products.append(product)
+        except Exception:
+            continue
+    return products
+
+
+# -- Daraz embedded JSON state ----------------------------------------------------
+# Daraz server-renders the listing data into the page as JSON, so a plain HTTP fetch is
+# enough when it is present; no browser, no scrolling. Two shapes are known:
+#   window.pageData           -> mods.listItems[] with name / price / originalPrice / discount / itemUrl
+#   window.__FIRST_SCREEN_DATA -> items[] with itemTitle / itemPrice{...} / itemUrl (campaign pages)
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def extract_embedded_state(html):
+    """Returns the decoded window.pageData / __FIRST_SCREEN_DATA objects found in `html`."""
+    states = []
+    for match in EMBEDDED_STATE_RE.finditer(html or ""):
+        try:
+            state, _ = _JSON_DECODER.raw_decode(html, match.end())
+        except ValueError:
+            continue
+        states.append(state)
+    return states
+
+
+def daraz_embedded_items(state):
+    """Every listing object (catalog or campaign shape) anywhere in a decoded state object."""
+    items = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "itemId" in node and ("name" in node or "itemTitle" in node):
+                items.append(node)
+                return
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(state)
+    return items
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = PRICE_NUMBER_RE.search(str(value or ""))
+    return float(match.group().replace(",", "")) if match else 0.0
+
+
+def parse_daraz_embedded_item(item, base_url=DARAZ_BASE_URL, min_discount=DARAZ_MIN_DISCOUNT):
+    """Maps one embedded listing to the product dict scrape_page() emits, or None if filtered out."""
+    name = (item.get("name") or item.get("itemTitle") or "").strip()
+    if not name:
+        card_dropped("daraz", "no_name")
+        return None
+
+    price = item.get("itemPrice") if isinstance(item.get("itemPrice"), dict) else {}
+    if price:
+        sale_price = _number(price.get("itemDiscountPrice") or price.get("itemPrice"))
+        orig_price = _number(price.get("itemPrice")) or sale_price
+        discount = int(_number(price.get("itemDiscount")))
+    else:
+        sale_price = _number(item.get("price"))
+        orig_price = _number(item.get("originalPrice")) or sale_price
+        discount = int(_number(item.get("discount")))
+    if sale_price == 0.0:
+        card_dropped("daraz", "no_price")
+        return None
+
+    if orig_price > sale_price:
+        discount = max(discount, int(((orig_price - sale_price) / orig_price) * 100))
+    elif discount > 0:
+        orig_price = round(sale_price / (1 - (discount / 100)), 2)
+
+    if discount < min_discount:
+        card_dropped("daraz", "below_min_discount")
+        return None
+
+    product_url = item.get("itemUrl") or item.get("productUrl") or ""
+    if product_url:
+        product_url = urljoin(base_url, product_url)
+    elif item.get("skuId"):
+        product_url = urljoin(base_url, f"/products/-i{item['itemId']}-s{item['skuId']}.html")
+    else:
+        product_url = urljoin(base_url, f"/products/-i{item['itemId']}.html")
+
+    metric = item.get("itemMetric") or {}
+    rating = _number(item.get("ratingScore") or metric.get("itemRating"))
+    reviews = int(_number(item.get("review") or metric.get("itemReviews")))
+
+    badges = []
+    if item.get("freeShipping") or (item.get("itemBenefit") or {}).get("freeShipping"):
+        badges.append("Free Shipping")
+    if "DazMall" in (item.get("buType") or []) or item.get("isMall") or item.get("mall"):
+        badges.append("Daraz Mall")
+
+    image_url = item.get("image") or item.get("itemImg") or ""
+    return {
+        "name": name,
+        "category": classify_product(name),
+        "brand": item.get("brandName") or "Unknown",
+        "sale_price": sale_price,
+        "original_price": orig_price,
+        "discount_percentage": discount,
+        "image_url": urljoin(base_url, image_url) if image_url else "",
+        "product_url": product_url,
+        "rating": rating,
+        "reviews": reviews,
+        "badges": badges,
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+
+
+def parse_daraz_embedded(html, base_url=DARAZ_BASE_URL, min_discount=DARAZ_MIN_DISCOUNT):
+    """
+    Products from a Daraz page's embedded JSON state. Returns None when the page carries
+    no embedded listings (the caller should render it in a browser instead).
+    """
+    items = [item for state in extract_embedded_state(html) for item in daraz_embedded_items(state)]
+    if not items:
+        return None
+    products, seen = [], set()
+    for item in items:
+        # Campaign pages list some items in more than one module
+        key = (item.get("itemId"), item.get("skuId"))
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            product = parse_daraz_embedded_item(item, base_url, min_discount)
+        except Exception:
+            card_dropped("daraz", "error")
+            continue
+        if product:
+            products.append(product)
+    return products
+
+
+def parse_priceoye_card(card, category_name, base_url=PRICEOYE_BASE_URL):
+    name_el = _first(card, f".//*[{_class_xpath('p-title')}]")
+    if name_el is None:
+        card_dropped("priceoye", "no_name")
+        return None
+    name = inner_text(name_el).strip()
+    product_url = urljoin(base_url, card.get("href") or "")
+
+    # Prices
+    sale_price_el = _first(card, f".//*[{_class_xpath('price-box')}]")
+    sale_price = extract_digits_price(inner_text(sale_price_el))
+
+    orig_price = sale_price
+    discount = 0
+
+    # Original Price: sometimes "Rs. 0" if not applicable, so we extract and check
+    orig_price_el = _first(card, f".//*[{_class_xpath('price-diff-retail')}]")
+    if orig_price_el is not None:
+        ext_orig = extract_digits_price(inner_text(orig_price_el))
+        if ext_orig > 0:
+            orig_price = ext_orig
+
+    # Discount Percentage
+    disc_el = _first(card, f".//*[{_class_xpath('price-diff-saving')}]")
+    if disc_el is not None:
+        disc_match = PERCENT_RE.search(inner_text(disc_el))
+        if disc_match:
+            discount = int(disc_match.group(1))
+
+    # Final correction: if we have a discount but orig_price == sale_price, calculate back
+    if discount > 0 and orig_price == sale_price:
+        orig_price = round(sale_price / (1 - (discount / 100)), 0)
+
+    # Image
+    img_el = _first(card, f".//img[{_class_xpath('product-thumbnail')}]")
+    if img_el is None:
+        card_dropped("priceoye", "no_image")
+        return None
+    image_url = img_el.get("src") or img_el.get("data-src")
+
+    return {
+        "name": name,
+        "category": canonical_category(category_name),
+        "sale_price": sale_price,
+        "original_price": orig_price,
+        "discount_percentage": discount,
+        "image_url": image_url,
+        "product_url": product_url,
+        "source": "PriceOye",
+        "timestamp": datetime.datetime.now().isoformat()
+    }
+
+
+def parse_priceoye_html(html, category_name, base_url=PRICEOYE_BASE_URL):
+    """Parses a PriceOye category page (page_source) into the product dicts scrape_category() emits."""
+    if not html:
+        return []
+    doc = lxml.html.fromstring(html)
+    products = []
+    for card in doc.xpath(PRICEOYE_CARD_XPATH):
+        try:
+            product = parse_priceoye_card(card, category_name, base_url)
+            if product:
+                products.append(product)
+        except Exception:
+            continue
+    return products
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse saved Daraz/PriceOye pages into product JSON.")
+    parser.add_argument("files", nargs="+", help="Saved page_source HTML files")
+    parser.add_argument("--source", choices=["daraz", "priceoye"], default="daraz")
+    parser.add_argument("--category", default="Mobiles", help="Category name for PriceOye pages")
+    parser.add_argument("--min-discount", type=int, default=DARAZ_MIN_DISCOUNT, help="Daraz discount filter")
+    parser.add_argument("--output", help="Write all parsed products to this JSON file")
+    args = parser.parse_args()
+
+    all_products = []
+    for path in args.files:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        start = time.perf_counter()
+        if args.source == "daraz":
+            products = parse_daraz_html(html, min_discount=args.min_discount)
+        else:
+            products = parse_priceoye_html(html, args.category)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{os.path.basename(path)}: {len(products)} products in {elapsed:.1f} ms")
+        all_products.extend(products)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(all_products, f, indent=4)
+        print(f"Saved {len(all_products)} products to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import time
+from collections import deque
+
+from atomic_files import file_lock, write_json_atomic
+
+# Price analytics over the stored observations (product_store.price_observations): each
+# product's rolling 30/90-day low, "discounts" whose original price was inflated just before
+# the sale, and price-drop events. Observations are only stored when a price changes, so
+# a product's price is a step function: a price counts for a window until the next change.
+#
+# Updated incrementally after every scrape: each product keeps running aggregates in
+# `price_stats` (monotonic-deque window minima/maxima), so a run only touches the products
+# whose price changed instead of rescanning the whole history.
+#
+#   python price_history.py report              # rolling lows, fake discounts, recent drops
+#   python price_history.py rebuild             # recompute every aggregate from the full history
+#   python price_history.py --benchmark         # incremental vs full rescan on synthetic history
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_FILE = os.path.join(BASE_DIR, "..", ".tmp", "price_analytics.json")
+
+DAY = 86400
+WINDOWS = {"low_30": (30 * DAY, False), "low_90": (90 * DAY, False), "high_30": (30 * DAY, True)}
+
+DROP_THRESHOLD = float(os.getenv("PRICE_DROP_THRESHOLD", "0.10"))   # Emit a "drop" event at >=10% off the last price
+INFLATION_TOLERANCE = 0.05   # Original price this far above the 30-day high was never really charged
+HIKE_WINDOW = 14 * DAY       # Original price raised this recently before a discount counts as a pre-sale hike
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_stats (
+    product_id INTEGER PRIMARY KEY REFERENCES products (id),
+    observations INTEGER NOT NULL,
+    first_observed REAL NOT NULL,
+    last_observed REAL NOT NULL,
+    sale_price REAL,
+    original_price REAL,
+    original_changed REAL,
+    previous_original REAL,
+    min_price REAL,
+    max_price REAL,
+    windows TEXT NOT NULL,
+    fake_discount TEXT
+);
+
+CREATE TABLE IF NOT EXISTS price_events (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL REFERENCES products (id),
+    run_id INTEGER,
+    kind TEXT NOT NULL,
+    old_price REAL,
+    new_price REAL,
+    change_pct REAL,
+    detail TEXT,
+    observed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_price_events_run ON price_events (run_id);
+CREATE INDEX IF NOT EXISTS idx_price_events_product ON price_events (product_id, observed_at);
+"""
+
+
+def _epoch(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class Window:
+    """
+    Lowest (or highest) price of a step series over the trailing `span` seconds.
+    Entries are [start, end, price] with end None for the current price; a price that
+    a later, lower (higher) one beats can never be the answer again and is dropped, so
+    each observation costs O(1) amortized.
+    """
+
+    def __init__(self, span, highest=False, entries=()):
+        self.span = span
+        self.highest = highest
+        self.entries = deque(list(e) for e in entries)
+
+    def _beaten(self, old, new):
+        return old <= new if self.highest else old >= new
+
+    def add(self, t, price):
+        if self.entries:
+            self.entries[-1][1] = t
+        while self.entries and self._beaten(self.entries[-1][2], price):
+            self.entries.pop()
+        self.entries.append([t, None, price])
+        self.expire(t)
+
+    def expire(self, now):
+        while self.entries[0][1] is not None and self.entries[0][1] <= now - self.span:
+            self.entries.popleft()
+
+    def value(self, now=None):
+        """The window's extreme as of `now` (default: the last observation)."""
+        if not self.entries:
+            return None
+        if now is None:
+            return self.entries[0][2]
+        for start, end, price in self.entries:
+            if end is None or end > now - self.span:
+                return price
+        return None
+
+
+class PriceState:
+    """Running aggregates for one product; observe() returns the events a new price raises."""
+
+    def __init__(self, row=None):
+        row = row or {}
+        self.observations = row.get("observations", 0)
+        self.first_observed = row.get("first_observed")
+        self.last_observed = row.get("last_observed")
+        self.sale_price = row.get("sale_price")
+        self.original_price = row.get("original_price")
+        self.original_changed = row.get("original_changed")
+        self.previous_original = row.get("previous_original")
+        self.min_price = row.get("min_price")
+        self.max_price = row.get("max_price")
+        self.fake_discount = row.get("fake_discount")
+        stored = json.loads(row["windows"]) if row.get("windows") else {}
+        self.windows = {name: Window(span, highest, stored.get(name, ()))
+                        for name, (span, highest) in WINDOWS.items()}
+
+    def _fake_discount_reason(self, sale, original, t):
+        """Why a discount on this observation isn't a real one, judged against the history before it."""
+        if not original or not sale or original <= sale or not self.observations:
+            return None
+        high_30 = self.windows["high_30"].value(t)
+        low_30 = self.windows["low_30"].value(t)
+        if high_30 and original > high_30 * (1 + INFLATION_TOLERANCE):
+            return "inflated_original"
+        if self.original_price and original > self.original_price:
+            hiked = True
+        else:
+            # Raised at the last change, recently, and still at that level
+            hiked = (original == self.original_price and self.previous_original is not None
+                     and original > self.previous_original and t - self.original_changed <= HIKE_WINDOW)
+        if hiked and low_30 and sale >= low_30:
+            return "hike_before_sale"
+        return None
+
+    def observe(self, t, sale, original):
+        if sale is None:
+            return []
+        if self.last_observed is not None and t < self.last_observed:
+            # Out-of-order timestamp (e.g. a re-imported snapshot): keep the series monotonic
+            t = self.last_observed
+        events = []
+        previous = self.sale_price
+        if previous and sale < previous * (1 - DROP_THRESHOLD):
+            low_30 = self.windows["low_30"].value(t)
+            events.append({"kind": "drop", "old_price": previous, "new_price": sale,
+                           "change_pct": round((sale - previous) / previous * 100, 1),
+                           "detail": "below_30d_low" if low_30 is not None and sale < low_30 else None})
+        reason = self._fake_discount_reason(sale, original, t)
+        if reason and reason != self.fake_discount:
+            events.append({"kind": "fake_discount", "old_price": original, "new_price": sale,
+                           "change_pct": round((sale - original) / original * 100, 1), "detail": reason})
+        self.fake_discount = reason
+
+        if original != self.original_price:
+            self.previous_original = self.original_price
+            self.original_changed = t
+        for window in self.windows.values():
+            window.add(t, sale)
+        self.observations += 1
+        self.first_observed = self.first_observed if self.first_observed is not None else t
+        self.last_observed = t
+        self.sale_price = sale
+        self.original_price = original
+        self.min_price = sale if self.min_price is None else min(self.min_price, sale)
+        self.max_price = sale if self.max_price is None else max(self.max_price, sale)
+        return events
+
+    def row(self, product_id):
+        windows = {name: list(w.entries) for name, w in self.windows.items()}
+        return (product_id, self.observations, self.first_observed, self.last_observed, self.sale_price,
+                self.original_price, self.original_changed, self.previous_original, self.min_price, self.max_price,
+                json.dumps(windows, separators=(",", ":")), self.fake_discount)
+
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def _load_states(conn, product_ids):
+    states = {}
+    ids = list(set(product_ids))
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT * FROM price_stats WHERE product_id IN ({placeholders})", chunk):
+            states[row["product_id"]] = PriceState(dict(row))
+    return states
+
+
+def _save(conn, states, events):
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO price_stats (product_id, observations, first_observed, last_observed, sale_price,
+                                            original_price, original_changed, previous_original, min_price,
+                                            max_price, windows, fake_discount)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [state.row(product_id) for product_id, state in states.items()],
+    )
+    conn.executemany(
+        """
+        INSERT INTO price_events (product_id, run_id, kind, old_price, new_price, change_pct, detail, observed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(e["product_id"], e["run_id"], e["kind"], e["old_price"], e["new_price"], e["change_pct"],
+          e["detail"], e["observed_at"]) for e in events],
+    )
+
+
+def _apply(states, observations):
+    events = []
+    for obs in sorted(observations, key=lambda o: (_epoch(o["observed_at"]), o.get("id") or 0)):
+        t = _epoch(obs["observed_at"])
+        state = states.setdefault(obs["product_id"], PriceState())
+        for event in state.observe(t, obs["sale_price"], obs["original_price"]):
+            event.update(product_id=obs["product_id"], run_id=obs.get("run_id"), observed_at=t)
+            events.append(event)
+    return events
+
+
+def update(conn, observations):
+    """
+    Folds new observations (dicts with product_id, run_id, sale_price, original_price,
+    observed_at) into the running aggregates; returns the events they raised. Runs in
+    the caller's transaction.
+    """
+    if not observations:
+        return []
+    states = _load_states(conn, [o["product_id"] for o in observations])
+    events = _apply(states, observations)
+    _save(conn, {o["product_id"]: states[o["product_id"]] for o in observations}, events)
+    return events
+
+
+def rebuild(conn):
+    """Recomputes every aggregate and event from the full observation history."""
+    with conn:
+        conn.execute("DELETE FROM price_events")
+        conn.execute("DELETE FROM price_stats")
+        states, events = {}, []
+        rows = conn.execute("SELECT * FROM price_observations ORDER BY product_id, observed_at, id")
+        for row in rows:
+            events.extend(_apply(states, [dict(row)]))
+        _save(conn, states, events)
+    return len(states), len(events)
+
+
+def product_stats(conn, now=None):
+    """Rolling lows and fake-discount verdicts for every product with history, as of `now`."""
+    now = now or time.time()
+    rows = conn.execute(
+        """
+        SELECT p.source, p.product_key, p.name, p.product_url, s.*
+        FROM price_stats s JOIN products p ON p.id = s.product_id
+        """
+    )
+    stats = []
+    for row in rows:
+        state = PriceState(dict(row))
+        low_30 = state.windows["low_30"].value(now)
+        stats.append({
+            "source": row["source"], "key": row["product_key"], "name": row["name"],
+            "product_url": row["product_url"], "sale_price": state.sale_price,
+            "original_price": state.original_price, "low_30": low_30,
+            "low_90": state.windows["low_90"].value(now), "all_time_low": state.min_price,
+            "at_30d_low": low_30 is not None and state.sale_price is not None and state.sale_price <= low_30,
+            "observations": state.observations, "fake_discount": state.fake_discount,
+        })
+    return stats
+
+
+def recent_events(conn, since_days=7, now=None):
+    since = (now or time.time()) - since_days * DAY
+    rows = conn.execute(
+        """
+        SELECT p.source, p.product_key, p.name, p.product_url, e.kind, e.old_price, e.new_price,
+               e.change_pct, e.detail, e.observed_at, e.run_id
+        FROM price_events e JOIN products p ON p.id = e.product_id
+        WHERE e.observed_at >= ? ORDER BY e.observed_at DESC, e.id DESC
+        """,
+        (since,),
+    )
+    return [dict(row, observed_at=datetime.datetime.fromtimestamp(row["observed_at"]).isoformat()) for row in rows]
+
+
+def write_report(conn, path=REPORT_FILE):
+    stats = product_stats(conn)
+    report = {
+        "generated_at": datetime.datetime.now().isoformat(),
+        "products": stats,
+        "fake_discounts": [s for s in stats if s["fake_discount"]],
+        "events": recent_events(conn),
+    }
+    with file_lock(path):
+        write_json_atomic(path, report, separators=(",", ":"))
+    return report
+
+
+def _rescan(history):
+    """Reference: every product's aggregates recomputed from its whole history."""
+    states = {}
+    for product_id, observations in history.items():
+        _apply(states, observations)
+    return states
+
+
+def benchmark(products=5000, runs=90, change_rate=0.2, seed=1):
+    """Per-run cost of the incremental update vs rescanning the full history, over `runs` daily scrapes."""
+    rng = random.Random(seed)
+    prices = {i: rng.uniform(1000, 200000) for i in range(products)}
+    history = {i: [] for i in range(products)}
+    states = {}
+    incremental = rescan = last_rescan = 0.0
+    start_t = time.time() - runs * DAY
+    for run in range(runs):
+        t = start_t + run * DAY
+        batch = []
+        for i in range(products):
+            if run and rng.random() > change_rate:
+                continue
+            prices[i] = round(prices[i] * rng.uniform(0.85, 1.1))
+            batch.append({"product_id": i, "run_id": run, "sale_price": prices[i],
+                          "original_price": round(prices[i] * rng.uniform(1.0, 1.5)), "observed_at": t})
+        for obs in batch:
+            history[obs["product_id"]].append(obs)
+        started = time.perf_counter()
+        _apply(states, batch)
+        incremental += time.perf_counter() - started
+        if run % 10 == 9:   # Rescanning every run would take too long to benchmark
+            started = time.perf_counter()
+            _rescan(history)
+            last_rescan = time.perf_counter() - started
+            rescan += last_rescan * 10
+    observations = sum(len(h) for h in history.values())
+    print(f"{products} products, {runs} runs, {observations} observations")
+    print(f"incremental: {incremental / runs * 1000:.1f} ms/run")
+    print(f"full rescan: {rescan / runs * 1000:.1f} ms/run (last run {last_rescan * 1000:.0f} ms, grows with history)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling price lows, fake-discount detection and price-drop events.")
+    parser.add_argument("command", nargs="?", choices=["report", "rebuild"], default="report")
+    parser.add_argument("--db", help="Product store (default .tmp/products.db)")
+    parser.add_argument("--benchmark", action="store_true", help="Compare incremental updates with full rescans")
+    parser.add_argument("--products", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.products)
+        return
+
+    from product_store import DB_FILE, connect
+    conn = connect(args.db or DB_FILE)
+    try:
+        if args.command == "rebuild":
+            products, events = rebuild(conn)
+            print(f"Rebuilt aggregates for {products} products ({events} events)")
+        report = write_report(conn)
+        drops = [e for e in report["events"] if e["kind"] == "drop"]
+        print(f"{len(report['products'])} products with history, {len(report['fake_discounts'])} fake discounts, "
+              f"{len(drops)} price drops in the last 7 days -> {REPORT_FILE}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import argparse
+import json
+import os
+import random
+import re
+import time
+from functools import lru_cache
+
+from atomic_files import file_lock, write_json_atomic
+
+# Cross-source product matching: the same phone listed on Daraz and PriceOye under different
+# titles ("Redmi 15 8GB+128GB - PTA APPROVED" / "Xiaomi Redmi 15") is grouped into one
+# canonical product, so the serving artifact and emails can show the cheapest offer once
+# instead of every listing.
+#
+# Titles are reduced to brand, model tokens, variant words (pro, ultra, ...) and storage.
+# Listings are only compared within a block of the same brand and model number ("a17",
+# "15", "x9d"), so matching stays near-linear in the number of listings; within a block two
+# listings match when one model is a prefix of the other, the variants are equal and the
+# storage doesn't conflict. Accessories ("... AirPods Pro Case") and unbranded titles are
+# never grouped.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPARISON_FILE = os.path.join(BASE_DIR, "..", ".tmp", "price_comparison.json")
+
+BRANDS = {
+    "samsung", "apple", "xiaomi", "oppo", "vivo", "realme", "infinix", "tecno", "itel", "honor",
+    "huawei", "nokia", "hmd", "nothing", "oneplus", "motorola", "google", "sparx", "qmobile",
+    "lenovo", "zte", "sony", "lg", "audionic", "ronin", "anker", "soundcore", "jbl", "baseus",
+    "haylou", "qcy", "dany", "zero", "faster", "mibro", "amazfit", "kieslect",
+    "faywa", "sego", "gresso", "philips", "digit", "vgo", "gfive",
+}
+# Sub-brands and product lines that imply the maker
+BRAND_ALIASES = {
+    "redmi": "xiaomi", "poco": "xiaomi", "mi": "xiaomi",
+    "galaxy": "samsung", "iphone": "apple", "airpods": "apple", "ipad": "apple",
+    "pixel": "google", "moto": "motorola", "oneplus": "oneplus",
+}
+# Dropped from model tokens: they never distinguish two products
+NOISE = {
+    "pta", "approved", "non", "official", "warranty", "brand", "new", "box", "packed", "original",
+    "mobile", "phone", "smartphone", "smart", "phones", "dual", "sim", "with", "and", "for", "the",
+    "4g", "5g", "lte", "ram", "rom", "gb", "tb", "storage", "version", "global", "local", "pakistan",
+    "black", "white", "blue", "green", "red", "gold", "silver", "grey", "gray", "purple", "pink",
+    "midnight", "graphite", "titanium", "galaxy",
+}
+VARIANTS = {"pro", "plus", "max", "ultra", "lite", "mini", "prime", "neo", "fe", "se", "edge", "fold", "flip", "turbo", "air"}
+ACCESSORY_WORDS = {
+    "case", "cover", "protector", "glass", "tempered", "charger", "cable", "strap", "skin", "pouch",
+    "holder", "stand", "adapter", "sticker", "lens", "mount", "tripod", "replacement",
+}
+
+STORAGE_PAIR_RE = re.compile(r"(\d+)\s*gb\s*(?:ram)?\s*[+/\-|,&]?\s*(\d+)\s*(gb|tb)\b", re.I)
+STORAGE_ONE_RE = re.compile(r"(\d+)\s*(gb|tb)\b", re.I)
+TOKEN_RE = re.compile(r"[a-z0-9']+\+?")
+# Model names come first; specs and marketing copy start at one of these
+MODEL_END_RE = re.compile(r"[(\[|,]| - ")
+
+
+def _gb(value, unit):
+    return int(value) * (1024 if unit.lower() == "tb" else 1)
+
+
+def parse_storage(title):
+    """ "8GB+256GB" -> "8/256", "(12GB-256GB)" -> "12/256", "128GB" -> "128", else None."""
+    match = STORAGE_PAIR_RE.search(title)
+    if match:
+        return f"{int(match.group(1))}/{_gb(match.group(2), match.group(3))}"
+    sizes = [_gb(v, u) for v, u in STORAGE_ONE_RE.findall(title)]
+    storage = [s for s in sizes if s >= 32]
+    return str(max(storage)) if storage else None
+
+
+class Title:
+    __slots__ = ("brand", "model", "variants", "storage", "anchor")
+
+    def __init__(self, brand, model, variants, storage):
+        self.brand = brand
+        self.model = model          # tuple of model tokens, in title order (variants excluded)
+        self.variants = variants    # frozenset of variant words
+        self.storage = storage
+        # Blocking token: the first model token carrying a digit ("a17", "15"), else the first token
+        self.anchor = next((t for t in model if any(c.isdigit() for c in t)), model[0] if model else "")
+
+    @property
+    def key(self):
+        parts = [self.brand, *self.model, *sorted(self.variants)]
+        if self.storage:
+            parts.append(self.storage)
+        return " ".join(parts)
+
+    def __repr__(self):
+        return f"Title({self.key!r})"
+
+
+@lru_cache(maxsize=65536)
+def parse_title(name):
+    """Brand / model / variants / storage of a listing title, or None if it can't be matched."""
+    lowered = (name or "").lower()
+    storage = parse_storage(lowered)
+    head = MODEL_END_RE.split(lowered, 1)[0]
+    # Model tokens stop where the specs start
+    spec = STORAGE_ONE_RE.search(head)
+    if spec:
+        head = head[:spec.start()]
+
+    tokens = [t.replace("+", " plus").strip() for t in TOKEN_RE.findall(head)]
+    tokens = [p for t in tokens for p in t.split()]
+    if ACCESSORY_WORDS.intersection(TOKEN_RE.findall(lowered)):
+        return None
+
+    brand = None
+    model, variants = [], set()
+    for token in tokens:
+        if brand is None and token in BRANDS:
+            brand = token
+            continue
+        if brand is None and token in BRAND_ALIASES:
+            brand = BRAND_ALIASES[token]
+        if token == brand or token in NOISE:
+            continue
+        if token in VARIANTS:
+            variants.add(token)
+        else:
+            model.append(token)
+    if brand is None or not model:
+        return None
+    return Title(brand, tuple(model), frozenset(variants), storage)
+
+
+def _same_product(a, b):
+    if a.variants != b.variants:
+        return False
+    if a.storage and b.storage and a.storage != b.storage:
+        return False
+    short, long_ = (a.model, b.model) if len(a.model) <= len(b.model) else (b.model, a.model)
+    return long_[:len(short)] == short
+
+
+class Offer:
+    __slots__ = ("source", "product", "title")
+
+    def __init__(self, source, product, title):
+        self.source = source
+        self.product = product
+        self.title = title
+
+    @property
+    def price(self):
+        return self.product.get("sale_price") or float("inf")
+
+
+class ProductGroup:
+    """One canonical product and every listing of it, cheapest first."""
+
+    def __init__(self, first):
+        self.offers = [first]
+
+    @property
+    def title(self):
+        # The most specific title in the group (storage known, then the shortest model)
+        return min((o.title for o in self.offers if o.title),
+                   key=lambda t: (t.storage is None, len(t.model)), default=None)
+
+    @property
+    def key(self):
+        title = self.title
+        return title.key if title else None
+
+    @property
+    def cheapest(self):
+        return self.offers[0]
+
+    @property
+    def sources(self):
+        return sorted({o.source for o in self.offers})
+
+    def to_dict(self):
+        prices = [o.price for o in self.offers if o.price != float("inf")]
+        return {
+            "key": self.key,
+            "name": self.cheapest.product.get("name"),
+            "sources": self.sources,
+            "cheapest": {"source": self.cheapest.source, "price": self.cheapest.product.get("sale_price"),
+                         "url": self.cheapest.product.get("product_url")},
+            "price_spread": (max(prices) - min(prices)) if prices else 0,
+            "offers": [{"source": o.source, "name": o.product.get("name"),
+                        "price": o.product.get("sale_price"), "url": o.product.get("product_url")}
+                       for o in self.offers],
+        }
+
+
+class ProductIndex:
+    """
+    Groups (source, product) listings into canonical products. Unmatchable listings
+    (accessories, no known brand) each stay a group of their own.
+    """
+
+    def __init__(self, listings):
+        self.groups = []
+        blocks = {}   # (brand, anchor) -> [ProductGroup, ...]
+        pending = []
+        for source, product in listings:
+            offer = Offer(source, product, parse_title(product.get("name")))
+            if offer.title is None:
+                self.groups.append(ProductGroup(offer))
+            elif offer.title.storage:
+                self._place(blocks, offer)
+            else:
+                pending.append(offer)
+        # Listings without storage attach only when that's unambiguous
+        for offer in pending:
+            self._place(blocks, offer)
+        for group in self.groups:
+            group.offers.sort(key=lambda o: o.price)
+
+    def _place(self, blocks, offer):
+        title = offer.title
+        block = blocks.setdefault((title.brand, title.anchor), [])
+        candidates = [g for g in block if _same_product(g.offers[0].title, title)]
+        if title.storage is None and len({g.offers[0].title.storage for g in candidates}) > 1:
+            # Matches several storage variants: keep it apart rather than guess
+            candidates = [g for g in candidates if g.offers[0].title.storage is None]
+        if candidates:
+            candidates[0].offers.append(offer)
+            return
+        group = ProductGroup(offer)
+        block.append(group)
+        self.groups.append(group)
+
+    @classmethod
+    def from_sources(cls, sources):
+        """`sources` is {source name: [product, ...]}."""
+        return cls((source, p) for source, products in sources.items() for p in products)
+
+    def cross_source(self):
+        return [g for g in self.groups if len(g.sources) > 1]
+
+    def cheapest_offers(self):
+        """(source, product) of the cheapest listing per canonical product, in first-seen order."""
+        return [(g.cheapest.source, g.cheapest.product) for g in self.groups]
+
+
+def cheapest_offers(listings):
+    return ProductIndex(listings).cheapest_offers()
+
+
+def load_listings():
+    listings = []
+    for source, name in (("Daraz", "daraz_electronics.json"), ("PriceOye", "priceoye_electronics.json")):
+        path = os.path.join(BASE_DIR, name)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                listings.extend((source, p) for p in json.load(f))
+    return listings
+
+
+def write_comparison(index, path=COMPARISON_FILE):
+    """Writes the multi-listing groups (price comparison) to .tmp/price_comparison.json."""
+    groups = sorted((g for g in index.groups if len(g.offers) > 1), key=lambda g: -len(g.sources))
+    with file_lock(path):
+        write_json_atomic(path, [g.to_dict() for g in groups], indent=2)
+    return path
+
+
+def _all_pairs(listings):
+    # Reference: every listing compared with every other (same rules, no blocking)
+    titles = [parse_title(p.get("name")) for _, p in listings]
+    matches = 0
+    for i, a in enumerate(titles):
+        if a is None:
+            continue
+        for b in titles[i + 1:]:
+            if b is not None and a.brand == b.brand and a.anchor == b.anchor and _same_product(a, b):
+                matches += 1
+    return matches
+
+
+def benchmark(listings=20000, seed=1):
+    """Synthetic catalog of `listings` variations of the saved titles: blocked index vs. all-pairs."""
+    rng = random.Random(seed)
+    base = load_listings()
+    suffixes = ["", " PTA Approved", " 8GB+256GB", " - Official Warranty", " Dual Sim", " 5G"]
+    items = []
+    for i in range(listings):
+        source, product = rng.choice(base)
+        name = f"{product['name']}{rng.choice(suffixes)}"
+        items.append((rng.choice(["Daraz", "PriceOye"]), dict(product, name=name, sale_price=rng.randint(1000, 200000))))
+
+    parse_title.cache_clear()
+    start = time.perf_counter()
+    index = ProductIndex(items)
+    indexed_s = time.perf_counter() - start
+    print(f"{listings} listings -> {len(index.groups)} products ({len(index.cross_source())} on both sources)")
+    print(f"  blocked index: {indexed_s:.2f}s")
+    sample = items[:min(listings, 5000)]
+    start = time.perf_counter()
+    _all_pairs(sample)
+    pairs_s = time.perf_counter() - start
+    scale = (listings / len(sample)) ** 2
+    print(f"  all-pairs on {len(sample)}: {pairs_s:.2f}s (~{pairs_s * scale:.0f}s extrapolated to {listings})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Group listings across sources into canonical products.")
+    parser.add_argument("--benchmark", action="store_true", help="Time the blocked index on a synthetic catalog")
+    parser.add_argument("--listings", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.listings)
+    else:
+        listings = load_listings()
+        index = ProductIndex(listings)
+        for group in index.cross_source():
+            offers = ", ".join(f"{o.source} Rs {o.product.get('sale_price'):,.0f}" for o in group.offers)
+            print(f"{group.key}: {offers}")
+        print(f"{len(listings)} listings -> {len(index.groups)} products, {len(index.cross_source())} on both sources")
+        print(f"Wrote {write_comparison(index)}")
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import sqlite3
+import datetime
+
+import metrics
+import price_history
+from atomic_files import write_json_atomic
+from change_detection import diff_snapshots, is_empty, product_key, write_delta
+from publish_sales import publish
+
+# Persistent product / price history store (SQLite, WAL mode).
+# Every scrape batch is upserted into `products` (current state per listing); only new and
+# price-changed listings get a `price_observations` row. The JSON files the web API and
+# emailer read are exported from the latest run, and only rewritten when something changed.
+# Rolling lows and price events over the observations are kept by price_history.py.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_FILE = os.path.join(BASE_DIR, "..", ".tmp", "products.db")
+
+SOURCE_FILES = {
+    "daraz": os.path.join(BASE_DIR, "daraz_electronics.json"),
+    "priceoye": os.path.join(BASE_DIR, "priceoye_electronics.json"),
+}
+
+# Key order of each source's JSON export, matching what the scrapers used to write
+EXPORT_FIELDS = {
+    "daraz": ["name", "category", "brand", "sale_price", "original_price", "discount_percentage",
+              "image_url", "product_url", "rating", "reviews", "badges", "timestamp"],
+    "priceoye": ["name", "category", "sale_price", "original_price", "discount_percentage",
+                 "image_url", "product_url", "source", "timestamp"],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    product_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    product_key TEXT NOT NULL,
+    product_url TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT,
+    brand TEXT,
+    image_url TEXT,
+    sale_price REAL,
+    original_price REAL,
+    discount_percentage INTEGER,
+    rating REAL,
+    reviews INTEGER,
+    badges TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    last_run_id INTEGER,
+    last_position INTEGER,
+    UNIQUE (source, product_key)
+);
+CREATE INDEX IF NOT EXISTS idx_products_source_url ON products (source, product_url);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products (category);
+CREATE INDEX IF NOT EXISTS idx_products_discount ON products (discount_percentage);
+CREATE INDEX IF NOT EXISTS idx_products_last_run ON products (source, last_run_id, last_position);
+
+CREATE TABLE IF NOT EXISTS price_observations (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES scrape_runs (id),
+    product_id INTEGER NOT NULL REFERENCES products (id),
+    sale_price REAL,
+    original_price REAL,
+    discount_percentage INTEGER,
+    observed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_observations_product ON price_observations (product_id, observed_at);
+CREATE INDEX IF NOT EXISTS idx_observations_discount ON price_observations (discount_percentage);
+"""
+
+
+def connect(path=DB_FILE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    price_history.ensure_schema(conn)
+    return conn
+
+
+def _product_ids(conn, source, keys):
+    ids = {}
+    keys = list(set(keys))
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(keys), 500):
+        chunk = keys[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT id, product_key FROM products WHERE source = ? AND product_key IN ({placeholders})",
+            [source, *chunk],
+        )
+        ids.update({row["product_key"]: row["id"] for row in rows})
+    return ids
+
+
+def latest_run_id(conn, source):
+    row = conn.execute("SELECT MAX(id) AS id FROM scrape_runs WHERE source = ?", (source,)).fetchone()
+    return row["id"]
+
+
+def _snapshot(conn, source, run_id):
+    """Keyed current state of every listing seen in `run_id`, in scrape order."""
+    if run_id is None:
+        return {}
+    rows = conn.execute(
+        "SELECT * FROM products WHERE source = ? AND last_run_id = ? ORDER BY last_position",
+        (source, run_id),
+    )
+    return {row["product_key"]: dict(row) for row in rows}
+
+
+def save_batch(conn, source, products):
+    """
+    Upserts one scrape batch and returns (run_id, delta) against the previous run.
+    Rows with the same product key collapse to their first position in the batch.
+    The delta carries the price events (drops, fake discounts) the batch raised.
+    """
+    now = datetime.datetime.now().isoformat()
+    current = {}
+    for p in products:
+        current.setdefault(product_key(source, p), p)
+
+    with conn:
+        previous = _snapshot(conn, source, latest_run_id(conn, source))
+        delta = diff_snapshots(source, previous, current)
+
+        run_id = conn.execute(
+            "INSERT INTO scrape_runs (source, started_at, product_count) VALUES (?, ?, ?)",
+            (source, now, len(current)),
+        ).lastrowid
+
+        conn.executemany(
+            """
+            INSERT INTO products (source, product_key, product_url, name, category, brand, image_url,
+                                  sale_price, original_price, discount_percentage, rating, reviews, badges,
+                                  first_seen, last_seen, last_run_id, last_position)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (source, product_key) DO UPDATE SET
+                product_url = excluded.product_url,
+                name = excluded.name,
+                category = excluded.category,
+                brand = excluded.brand,
+                image_url = excluded.image_url,
+                sale_price = excluded.sale_price,
+                original_price = excluded.original_price,
+                discount_percentage = excluded.discount_percentage,
+                rating = excluded.rating,
+                reviews = excluded.reviews,
+                badges = excluded.badges,
+                last_seen = excluded.last_seen,
+                last_run_id = excluded.last_run_id,
+                last_position = excluded.last_position
+            """,
+            [
+                (source, key, p.get("product_url") or "", p.get("name", ""), p.get("category"), p.get("brand"),
+                 p.get("image_url"), p.get("sale_price"), p.get("original_price"), p.get("discount_percentage"),
+                 p.get("rating"), p.get("reviews"), json.dumps(p["badges"]) if "badges" in p else None,
+                 p.get("timestamp") or now, p.get("timestamp") or now, run_id, pos)
+                for pos, (key, p) in enumerate(current.items())
+            ],
+        )
+
+        # History only grows for listings that are new or changed price
+        touched = delta["new"] + delta["changed"]
+        ids = _product_ids(conn, source, [p["key"] for p in touched])
+        observations = [{
+            "run_id": run_id, "product_id": ids[p["key"]], "sale_price": p.get("sale_price"),
+            "original_price": p.get("original_price"), "discount_percentage": p.get("discount_percentage"),
+            "observed_at": p.get("timestamp") or now,
+        } for p in touched]
+        conn.executemany(
+            """
+            INSERT INTO price_observations (run_id, product_id, sale_price, original_price,
+                                            discount_percentage, observed_at)
+            VALUES (:run_id, :product_id, :sale_price, :original_price, :discount_percentage, :observed_at)
+            """,
+            observations,
+        )
+        # Running aggregates only move for the products observed in this batch
+        delta["price_events"] = price_history.update(conn, observations)
+    return run_id, delta
+
+
+def export_latest(conn, source):
+    """Rebuilds the scraper's JSON rows for the latest run, in scrape order."""
+    fields = EXPORT_FIELDS[source]
+    items = []
+    for row in _snapshot(conn, source, latest_run_id(conn, source)).values():
+        row["badges"] = json.loads(row["badges"]) if row["badges"] else []
+        row["timestamp"] = row["last_seen"]
+        row["source"] = "PriceOye" if source == "priceoye" else "Daraz"
+        items.append({field: row.get(field) for field in fields})
+    return items
+
+
+def export_json(conn, source, path=None):
+    path = path or SOURCE_FILES[source]
+    items = export_latest(conn, source)
+    # publish() may be reading it from a parallel stage: never expose a half-written file
+    write_json_atomic(path, items, indent=4)
+    return len(items)
+
+
+def save_and_export(source, products, output_file=None, db_path=DB_FILE):
+    """
+    Called by the scrapers: store the batch, write the run's delta, and refresh the
+    legacy JSON snapshot only when something changed. Returns the delta.
+    """
+    output_file = output_file or SOURCE_FILES[source]
+    conn = connect(db_path)
+    try:
+        with metrics.timer("write", source=source):
+            run_id, delta = save_batch(conn, source, products)
+            write_delta(delta)
+            print(f"Stored run {run_id} in {db_path}: {len(delta['new'])} new, {len(delta['changed'])} changed, "
+                  f"{len(delta['removed'])} removed, {delta['unchanged_count']} unchanged")
+            if not is_empty(delta) or not os.path.exists(output_file):
+                export_json(conn, source, output_file)
+                publish()
+            price_history.write_report(conn)
+        for kind in ("new", "changed", "removed"):
+            metrics.count("listings", len(delta[kind]), source=source, change=kind)
+        for event in delta["price_events"]:
+            metrics.count("price_events", source=source, kind=event["kind"])
+        return delta
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the product/price history store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import the current JSON snapshots as a run")
+    imp.add_argument("--source", choices=list(SOURCE_FILES), action="append")
+    exp = sub.add_parser("export", help="Write the latest run back to the JSON snapshot files")
+    exp.add_argument("--source", choices=list(SOURCE_FILES), action="append")
+    parser.add_argument("--db", default=DB_FILE)
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    try:
+        for source in args.source or list(SOURCE_FILES):
+            if args.command == "import":
+                if not os.path.exists(SOURCE_FILES[source]):
+                    continue
+                with open(SOURCE_FILES[source], "r", encoding="utf-8") as f:
+                    products = json.load(f)
+                run_id, delta = save_batch(conn, source, products)
+                print(f"Imported {len(products)} {source} products as run {run_id} ({len(delta['new'])} new)")
+            else:
+                count = export_json(conn, source)
+                print(f"Exported {count} {source} products to {SOURCE_FILES[source]}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import csv
+import datetime
+import hashlib
+import json
+import os
+
+from atomic_files import file_lock, write_json_atomic
+from deal_summaries import summarize
+from image_cache import ImageCache
+from product_matching import ProductIndex, write_comparison
+
+# Builds the serving artifact /api/sales reads: every deal normalized into the row shape
+# the dashboard renders, plus category and source indexes and the deal summaries (see
+# deal_summaries.py). Written after each scrape so the API never parses the CSV/JSON
+# sources per request. Rows whose image is in the local thumbnail cache (image_cache.py)
+# get a "Thumb" path served by /api/images.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(BASE_DIR, "..", ".tmp", "live_retail_sales.csv")
+DARAZ_FILE = os.path.join(BASE_DIR, "daraz_electronics.json")
+PRICEOYE_FILE = os.path.join(BASE_DIR, "priceoye_electronics.json")
+SERVING_FILE = os.path.join(BASE_DIR, "..", ".tmp", "sales_serving.json")
+
+MOBILE_CATEGORIES = {"Mobiles", "Smart Phones", "Mobile"}
+SOURCE_LABELS = {"daraz": "Daraz Real-time", "priceoye": "PriceOye Real-time"}
+
+
+def _short_name(name):
+    return name[:30] + "..." if len(name) > 30 else name
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def csv_rows(path=CSV_FILE):
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for entry in csv.DictReader(f):
+            entry = {k: (v or "").strip() for k, v in entry.items()}
+            # Same discount format as the electronics rows
+            if entry.get("Discount Percentage") and not entry["Discount Percentage"].startswith("-"):
+                entry["Discount Percentage"] = f"-{entry['Discount Percentage']}"
+            rows.append(entry)
+    return rows
+
+
+def daraz_row(item):
+    return {
+        "Brand Name": _short_name(item["name"]),
+        "Category": "Mobile" if item.get("category") == "Mobiles" else (item.get("category") or "Electronics"),
+        "Discount Percentage": f"-{item['discount_percentage']}%",
+        "Source": SOURCE_LABELS["daraz"],
+        "URL": item["product_url"],
+        "ImageURL": item.get("image_url"),
+        "FullTitle": item["name"],
+        "Rating": item.get("rating"),
+        "Reviews": item.get("reviews"),
+        "Price": item.get("sale_price"),
+        "OriginalPrice": item.get("original_price"),
+    }
+
+
+def priceoye_row(item):
+    return {
+        "Brand Name": _short_name(item["name"]),
+        "Category": "Mobile" if item.get("category") in MOBILE_CATEGORIES else item.get("category"),
+        "Discount Percentage": f"-{item['discount_percentage']}%",
+        "Source": SOURCE_LABELS["priceoye"],
+        "URL": item["product_url"],
+        "ImageURL": item.get("image_url"),
+        "FullTitle": item["name"],
+        "Price": item.get("sale_price"),
+        "OriginalPrice": item.get("original_price"),
+    }
+
+
+ROW_BUILDERS = {"daraz": daraz_row, "priceoye": priceoye_row}
+
+
+def daraz_rows(path=DARAZ_FILE):
+    return [daraz_row(item) for item in _load_json(path)]
+
+
+def priceoye_rows(path=PRICEOYE_FILE):
+    return [priceoye_row(item) for item in _load_json(path)]
+
+
+def electronics_rows(daraz_path=DARAZ_FILE, priceoye_path=PRICEOYE_FILE):
+    """
+    Daraz + PriceOye rows with duplicate listings of one product (across or within sources)
+    folded into a single row for the cheapest offer; the others are listed under "Offers".
+    """
+    listings = [("daraz", item) for item in _load_json(daraz_path)]
+    listings += [("priceoye", item) for item in _load_json(priceoye_path)]
+    index = ProductIndex(listings)
+    rows = []
+    for group in index.groups:
+        row = ROW_BUILDERS[group.cheapest.source](group.cheapest.product)
+        if len(group.offers) > 1:
+            row["ProductKey"] = group.key
+            row["Offers"] = [{
+                "Source": SOURCE_LABELS[o.source],
+                "Price": o.product.get("sale_price"),
+                "URL": o.product["product_url"],
+            } for o in group.offers]
+        rows.append(row)
+    write_comparison(index)
+    print(f"Matched {len(listings)} electronics listings into {len(rows)} products "
+          f"({len(index.cross_source())} sold on both sites)")
+    return rows
+
+
+def attach_thumbnails(rows, cache=None):
+    cache = cache or ImageCache()
+    for row in rows:
+        thumb = cache.thumbnail(row.get("ImageURL"))
+        if thumb:
+            row["Thumb"] = f"/api/images/{thumb}"
+    return rows
+
+
+def build_indexes(rows):
+    by_category, by_source = {}, {}
+    for i, row in enumerate(rows):
+        by_category.setdefault((row.get("Category") or "").strip(), []).append(i)
+        by_source.setdefault(row.get("Source") or "", []).append(i)
+    return {"category": by_category, "source": by_source}
+
+
+def build_artifact():
+    rows = attach_thumbnails(csv_rows() + electronics_rows())
+    version = hashlib.sha1(json.dumps(rows, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return {
+        "version": version,
+        "generated_at": datetime.datetime.now().isoformat(),
+        "rows": rows,
+        "indexes": build_indexes(rows),
+        "summaries": summarize(rows),
+    }
+
+
+def load_artifact(path=SERVING_FILE):
+    """The last published artifact, or None before the first publish."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def publish(path=SERVING_FILE):
+    # Stages publish concurrently (monitor threads, scrape job processes): one publisher at a
+    # time, each building from the sources as they are when it gets the lock
+    with file_lock(path):
+        artifact = build_artifact()
+        # Write then rename so the API never sees a half-written file
+        write_json_atomic(path, artifact, separators=(",", ":"))
+    print(f"Published {len(artifact['rows'])} rows (version {artifact['version']}) to {path}")
+    return artifact["version"]
+
+
+if __name__ == "__main__":
+    publish()
@@ -0,0 +1,294 @@
+import argparse
+import glob
+import html
+import json
+import os
+import random
+import re
+import shlex
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import lxml.html
+
+from normalize import EMBEDDED_STATE_RE
+from parse_html import find_daraz_cards
+
+# Local stand-in for daraz.pk, priceoye.pk and the brand sale pages, so the scrapers can be
+# load tested end to end (headless Chrome included) without the internet. Serves the saved
+# captures with configurable latency, jitter and injected errors:
+#
+#   /daraz/?page=N             Daraz listing captures (those with product cards), cycled by page
+#   /priceoye/<category>?page=N  PriceOye category pages rendered from priceoye_electronics.json
+#   /brand/<slug>              a saved capture per brand, for scrape_retailers.py
+#   /_replay/stats             request counts by route and status
+#
+#   python replay_server.py --port 8765 --latency 300 --jitter 200 --error-rate 0.05
+#   eval "$(python replay_server.py env --port 8765)"   # point the scrapers at it
+#   python scrape_scheduler.py --workers 4
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRICEOYE_DATASET = os.path.join(BASE_DIR, "priceoye_electronics.json")
+DEFAULT_PORT = 8765
+PRICEOYE_PER_PAGE = 24
+
+# Captured pages still reference the live sites' scripts; Chrome would try to fetch and
+# run them, so they are stripped unless --keep-scripts is given. Inline scripts carrying
+# the embedded page state are kept for the plain-HTTP fast path.
+SCRIPT_RE = re.compile(r"<script\b[^>]*>.*?</script\s*>", re.I | re.S)
+
+
+def _strip_script(match):
+    return match.group(0) if EMBEDDED_STATE_RE.search(match.group(0)) else ""
+
+
+PRICEOYE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title} - PriceOye (replay)</title></head>
+<body><div class="productBox">
+{cards}
+</div></body></html>
+"""
+
+PRICEOYE_CARD = """<a class="ga-dataset" href="{url}">
+  <div class="image-box"><img class="product-thumbnail" src="{image}" alt="{name}"></div>
+  <div class="detail-box">
+    <div class="p-title">{name}</div>
+    <div class="price-box">Rs {sale:,.0f}</div>
+    <div class="price-diff"><span class="price-diff-retail">Rs {original:,.0f}</span>
+      <span class="price-diff-saving">{discount}% OFF</span></div>
+  </div>
+</a>"""
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def load_captures(keep_scripts=False):
+    """(daraz listing pages, all pages) from the saved *.html captures, as encoded bodies."""
+    daraz, pages = [], []
+    for path in sorted(glob.glob(os.path.join(BASE_DIR, "*.html"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        if not keep_scripts:
+            content = SCRIPT_RE.sub(_strip_script, content)
+        body = content.encode("utf-8")
+        pages.append((os.path.basename(path), body))
+        try:
+            _, cards = find_daraz_cards(lxml.html.fromstring(content))
+        except Exception:
+            cards = []
+        if cards:
+            daraz.append((os.path.basename(path), body))
+    return daraz, pages
+
+
+def load_priceoye(path=PRICEOYE_DATASET):
+    """{category slug: (category name, [product, ...])} from the saved PriceOye dataset."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        products = json.load(f)
+    categories = {}
+    for p in products:
+        categories.setdefault(slugify(p["category"]), (p["category"], []))[1].append(p)
+    return categories
+
+
+def render_priceoye_page(category, products, page, per_page=PRICEOYE_PER_PAGE):
+    # Pages past the end wrap around, so any page count can be requested under load
+    pages = max(1, -(-len(products) // per_page))
+    start = ((page - 1) % pages) * per_page
+    cards = [PRICEOYE_CARD.format(
+        url=html.escape(p["product_url"]), image=html.escape(p.get("image_url") or ""),
+        name=html.escape(p["name"]), sale=p.get("sale_price") or 0,
+        original=p.get("original_price") or p.get("sale_price") or 0, discount=p.get("discount_percentage") or 0,
+    ) for p in products[start:start + per_page]]
+    return PRICEOYE_PAGE.format(title=html.escape(category), cards="\n".join(cards)).encode("utf-8")
+
+
+class Faults:
+    """Latency, jitter and error injection, drawn from one seeded RNG."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_statuses=(503,), drop_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = list(error_statuses)
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Returns (delay seconds, action) where action is "ok", "drop" or an HTTP status."""
+        with self.lock:
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            roll = self.rng.random()
+            if roll < self.drop_rate:
+                return delay, "drop"
+            if roll < self.drop_rate + self.error_rate:
+                return delay, self.rng.choice(self.error_statuses)
+            return delay, "ok"
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, faults, keep_scripts=False, quiet=False):
+        super().__init__(address, ReplayHandler)
+        self.faults = faults
+        self.quiet = quiet
+        self.daraz_pages, self.pages = load_captures(keep_scripts)
+        self.priceoye = load_priceoye()
+        self.stats = Counter()
+        self.bytes_sent = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, route, status, size=0):
+        with self.lock:
+            self.stats[(route, str(status))] += 1
+            self.bytes_sent += size
+
+    def stats_report(self):
+        with self.lock:
+            by_route = {}
+            for (route, status), n in sorted(self.stats.items()):
+                by_route.setdefault(route, {})[status] = n
+            elapsed = time.time() - self.started
+            total = sum(self.stats.values())
+            return {"uptime_s": round(elapsed, 1), "requests": total,
+                    "requests_per_sec": round(total / elapsed, 2) if elapsed else 0.0,
+                    "bytes_sent": self.bytes_sent, "routes": by_route}
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _route(self, path, query):
+        """Returns (route name, status, body) for a request path."""
+        page = int((query.get("page") or ["1"])[0] or 1)
+        parts = [p for p in path.split("/") if p]
+        if not parts:
+            return "index", 200, b"<html><body>Retail monitor replay server</body></html>"
+        if parts[0] == "daraz":
+            if not self.server.daraz_pages:
+                return "daraz", 404, b"No Daraz captures with product cards"
+            _, body = self.server.daraz_pages[(page - 1) % len(self.server.daraz_pages)]
+            return "daraz", 200, body
+        if parts[0] == "priceoye" and len(parts) > 1:
+            entry = self.server.priceoye.get(parts[1])
+            if entry is None:
+                return "priceoye", 404, b"Unknown category"
+            return "priceoye", 200, render_priceoye_page(entry[0], entry[1], page)
+        if parts[0] == "brand" and len(parts) > 1 and self.server.pages:
+            # Stable capture per brand, so repeated runs parse the same page for it
+            index = sum(parts[1].encode("utf-8")) % len(self.server.pages)
+            return "brand", 200, self.server.pages[index][1]
+        return "other", 404, b"Not found"
+
+    def do_GET(self):
+        split = urlsplit(self.path)
+        if split.path == "/_replay/stats":
+            body = json.dumps(self.server.stats_report(), indent=2).encode("utf-8")
+            self._send(200, body, "application/json")
+            return
+        try:
+            route, status, body = self._route(split.path, parse_qs(split.query))
+        except ValueError:
+            route, status, body = "other", 400, b"Bad request"
+
+        delay, action = self.server.faults.draw()
+        if delay:
+            time.sleep(delay)
+        if action == "drop":
+            # Reset the connection without a response
+            self.server.record(route, "dropped")
+            self.close_connection = True
+            self.connection.close()
+            return
+        if action != "ok":
+            status, body = action, f"Injected error {action}".encode("utf-8")
+        self.server.record(route, status, len(body))
+        self._send(status, body)
+
+    do_HEAD = do_GET
+
+
+def scraper_env(base):
+    """Environment overrides that point every scraper at the replay server at `base`."""
+    import scrape_priceoye_electronics
+    import scrape_retailers
+
+    categories = {name: f"{base}/priceoye/{slugify(name)}" for name in scrape_priceoye_electronics.CATEGORIES}
+    brands = {name: {"url": f"{base}/brand/{slugify(name)}", "category": info["category"]}
+              for name, info in scrape_retailers.TARGET_BRANDS.items()}
+    return {
+        "DARAZ_BASE_URL": f"{base}/daraz/",
+        "PRICEOYE_CATEGORIES": json.dumps(categories),
+        "TARGET_BRANDS": json.dumps(brands),
+        # One host serves everything; don't throttle it like a real site
+        "SCRAPE_MAX_PER_HOST": "8",
+        "SCRAPE_MIN_HOST_INTERVAL": "0",
+    }
+
+
+def serve(host, port, faults, keep_scripts=False, quiet=False):
+    server = ReplayServer((host, port), faults, keep_scripts, quiet)
+    print(f"Replay server on http://{host}:{port} "
+          f"({len(server.daraz_pages)} Daraz listing captures, {len(server.pages)} pages, "
+          f"{len(server.priceoye)} PriceOye categories)")
+    print(f"Latency {faults.latency * 1000:.0f}ms +/- {faults.jitter * 1000:.0f}ms, "
+          f"errors {faults.error_rate:.0%} ({', '.join(map(str, faults.error_statuses))}), drops {faults.drop_rate:.0%}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats_report(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve saved captures as a local stand-in for the retail sites.")
+    parser.add_argument("command", nargs="?", choices=["serve", "env"], default="serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0, help="Mean response delay in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="Uniform +/- delay spread in ms")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, action="append", help="Status codes to inject (default 503)")
+    parser.add_argument("--drop-rate", type=float, default=0, help="Fraction of connections closed without a response")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible fault injection")
+    parser.add_argument("--keep-scripts", action="store_true", help="Serve captures with their <script> tags")
+    parser.add_argument("--quiet", action="store_true", help="Don't log each request")
+    args = parser.parse_args()
+
+    if args.command == "env":
+        for name, value in scraper_env(f"http://{args.host}:{args.port}").items():
+            print(f"export {name}={shlex.quote(value)}")
+        return
+
+    faults = Faults(args.latency / 1000, args.jitter / 1000, args.error_rate,
+                    args.error_status or [503], args.drop_rate, args.seed)
+    serve(args.host, args.port, faults, args.keep_scripts, args.quiet)
+
+
+if __name__ == "__main__":
+    main()
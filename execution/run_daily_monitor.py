@@ -1,27 +1,257 @@
-import os
-import subprocess
+import argparse
+import datetime
 import sys
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+# In-process monitor: every step is imported and called as a function and the steps run as a
+# small DAG, so independent scrapers run side by side and each step starts as soon as its
+# inputs are ready. Output streams live, prefixed with the step name. With --every / --cron
+# the monitor stays up and re-runs on schedule instead of being launched by hand.
+
+
+def _scrape_retail():
+    import scrape_retailers
+    scrape_retailers.main()
+
+
+def _scrape_electronics():
+    import scrape_scheduler
+    scrape_scheduler.scrape_sources("all")
+
+
+def _cache_images():
+    import image_cache
+    image_cache.cache_serving_images()
+
+
+def _email_top_deals():
+    import send_email_alert
+    send_email_alert.send_email()
+
+
+def _email_digests():
+    import send_email_alert
+    send_email_alert.send_digests()
+
+
+class Stage:
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+
+
+STAGES = [
+    Stage("retail", _scrape_retail),
+    Stage("electronics", _scrape_electronics),
+    Stage("email", _email_top_deals, deps=["retail", "electronics"]),
+    Stage("digests", _email_digests, deps=["electronics"]),
+    Stage("images", _cache_images, deps=["retail", "electronics"]),
+]
+
+
+class _StageOutput:
+    """stdout that prefixes each line with the writing thread's stage name and flushes at once."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        # Line-buffered per thread so concurrent stages never split each other's lines
+        prefix = getattr(self.local, "prefix", "")
+        *lines, self.local.partial = (getattr(self.local, "partial", "") + text).split("\n")
+        if lines:
+            with self.lock:
+                self.stream.write("".join(f"{prefix}{line}\n" for line in lines))
+                self.stream.flush()
+        return len(text)
+
+    def end_line(self):
+        if getattr(self.local, "partial", ""):
+            self.write("\n")
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def select_stages(names=None):
+    """The named stages plus everything they depend on, in declaration order."""
+    if not names:
+        return list(STAGES)
+    by_name = {s.name: s for s in STAGES}
+    wanted, todo = set(), list(names)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(by_name[name].deps)
+    return [s for s in STAGES if s.name in wanted]
+
+
+def run_dag(stages, max_parallel=4):
+    """
+    Runs `stages` (which must include their dependencies) as soon as their dependencies
+    succeed; returns {name: "ok" | "failed" | "skipped"}.
+    """
+    out = sys.stdout if isinstance(sys.stdout, _StageOutput) else _StageOutput(sys.stdout)
+    previous_stdout, sys.stdout = sys.stdout, out
+    status = {}
+    pending = {s.name: s for s in stages}
+    timings = {}
+
+    def run(stage):
+        out.local.prefix = f"[{stage.name}] "
+        start = time.perf_counter()
+        try:
+            stage.func()
+            return "ok"
+        except Exception:
+            out.end_line()
+            traceback.print_exc(file=sys.stdout)
+            return "failed"
+        finally:
+            timings[stage.name] = time.perf_counter() - start
+            metrics.add_time("pipeline", timings[stage.name], step=stage.name)
+            out.end_line()
+            out.local.prefix = ""
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+            running = {}
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    dep_status = [status.get(d) for d in stage.deps]
+                    if any(s in ("failed", "skipped") for s in dep_status):
+                        status[name] = "skipped"
+                        print(f"Skipping {name}: a dependency did not succeed")
+                        del pending[name]
+                    elif all(s == "ok" for s in dep_status):
+                        print(f"Starting {name}")
+                        running[executor.submit(run, stage)] = name
+                        del pending[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    status[name] = future.result()
+                    print(f"Finished {name}: {status[name]} ({timings[name]:.1f}s)")
+    finally:
+        out.end_line()
+        sys.stdout = previous_stdout
+    return status
+
+
+# -- scheduling -----------------------------------------------------------------
+
+def parse_interval(text):
+    """ "90s", "15m", "6h", "1d" -> seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def _cron_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-"))
+        else:
+            start = end = int(part)
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def next_cron_time(expr, after):
+    """Next datetime after `after` matching a 5-field cron expression (minute hour day month weekday)."""
+    minute, hour, day, month, weekday = expr.split()
+    minutes = _cron_field(minute, 0, 59)
+    hours = _cron_field(hour, 0, 23)
+    days = _cron_field(day, 1, 31)
+    months = _cron_field(month, 1, 12)
+    weekdays = {d % 7 for d in _cron_field(weekday, 0, 7)}   # 0 and 7 are both Sunday
+    # Like cron: when both day fields are restricted a day matches either of them
+    either_day = day != "*" and weekday != "*"
+
+    def day_matches(t):
+        in_days, in_weekdays = t.day in days, (t.weekday() + 1) % 7 in weekdays
+        return in_days or in_weekdays if either_day else in_days and in_weekdays
+
+    t = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+    limit = t + datetime.timedelta(days=366)
+    while t < limit:
+        if t.month in months and day_matches(t) and t.hour in hours and t.minute in minutes:
+            return t
+        if t.month not in months or not day_matches(t):
+            t = (t + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+        elif t.hour not in hours:
+            t = (t + datetime.timedelta(hours=1)).replace(minute=0)
+        else:
+            t += datetime.timedelta(minutes=1)
+    raise ValueError(f"Cron expression never fires: {expr}")
+
+
+def run_once(stage_names=None):
+    print(f"--- Starting Daily Retail Monitor ({datetime.datetime.now():%Y-%m-%d %H:%M}) ---")
+    status = run_dag(select_stages(stage_names))
+    print(f"--- Monitor Run Complete: {', '.join(f'{k}={v}' for k, v in status.items())} ---")
+    # One report per run, covering every step; reset so scheduled runs don't accumulate
+    metrics.write_report("monitor")
+    metrics.metrics.collect()
+    return status
+
+
+def run_scheduled(stage_names=None, every=None, cron=None):
+    """Runs forever; a run that overruns its slot delays the next one rather than overlapping it."""
+    while True:
+        now = datetime.datetime.now()
+        if cron:
+            next_run = next_cron_time(cron, now)
+        else:
+            next_run = now + datetime.timedelta(seconds=every)
+        print(f"Next run at {next_run:%Y-%m-%d %H:%M:%S}")
+        time.sleep(max(0.0, (next_run - datetime.datetime.now()).total_seconds()))
+        run_once(stage_names)
+
 
 def main():
-    print("--- Starting Daily Retail Monitor ---")
-    
-    # 1. Run Scraper
-    print("Step 1: Running Scraper...")
-    result = subprocess.run([sys.executable, "execution/scrape_retailers.py"], capture_output=True, text=True)
-    print(result.stdout)
-    if result.returncode != 0:
-        print(f"Scraper failed with error:\n{result.stderr}")
-        return
-
-    # 2. Run Emailer
-    print("Step 2: Sending Email...")
-    result = subprocess.run([sys.executable, "execution/send_email_alert.py"], capture_output=True, text=True)
-    print(result.stdout)
-    if result.returncode != 0:
-        print(f"Emailer failed with error:\n{result.stderr}")
-        return
-
-    print("--- Monitor Run Complete ---")
+    parser = argparse.ArgumentParser(description="Run the retail monitor pipeline.")
+    parser.add_argument("--stages", nargs="+", choices=[s.name for s in STAGES],
+                        help="Only these stages (and their dependencies)")
+    schedule = parser.add_mutually_exclusive_group()
+    schedule.add_argument("--every", type=parse_interval, help="Run repeatedly, e.g. 30m, 6h, 1d")
+    schedule.add_argument("--cron", help='Run on a cron schedule, e.g. "0 7 * * *"')
+    parser.add_argument("--now", action="store_true", help="In scheduler mode, also run immediately")
+    args = parser.parse_args()
+
+    if not (args.every or args.cron):
+        status = run_once(args.stages)
+        sys.exit(0 if all(v == "ok" for v in status.values()) else 1)
+
+    if args.now:
+        run_once(args.stages)
+    try:
+        run_scheduled(args.stages, args.every, args.cron)
+    except KeyboardInterrupt:
+        print("Monitor stopped.")
+
 
 if __name__ == "__main__":
     main()
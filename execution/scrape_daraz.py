@@ -1,46 +1,26 @@
 import json
-import time
 import datetime
-from selenium import webdriver
+import requests
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import re
 
+from change_detection import DARAZ_ID_RE
+from driver_pool import MOBILE_UA, create_driver
+from page_wait import WaitStats, wait_for_page
+from parse_html import DARAZ_BASE_URL, parse_daraz_embedded
+
 # Configuration
 # URL provided by user
 TARGET_URL = "https://pages.daraz.pk/wow/gcp/route/daraz/pk/upr/router?hybrid=1&data_prefetch=true&prefetch_replace=1&at_iframe=1&wh_pid=%2Flazada%2Fchannel%2Fpk%2Fflashsale%2F7cdarZ6wBa&hide_h5_title=true&lzd_navbar_hidden=true&disable_pull_refresh=true&skuIds=655652080%2C924783262%2C119034689%2C924421704%2C271814546%2C272976334%2C655652081&spm=a2a0e.tm80335142.FlashSale.d_shopMore"
 
 OUTPUT_FILE = "daraz_flash_sales.json"
 MIN_DISCOUNT = 40
+CARD_SELECTORS = [".top-module-fashion-item", ".flash-unit"]
+HTTP_HEADERS = {"User-Agent": MOBILE_UA, "Referer": "https://www.daraz.pk/"}
 
 def setup_driver():
-    options = Options()
-    # options.add_argument("--headless") 
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--window-size=375,812") # Mobile viewport
-    options.add_argument("--user-agent=Mozilla/5.0 (iPhone; CPU iPhone OS 13_2_3 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/13.0.3 Mobile/15E148 Safari/604.1")
-    
-    options.add_argument("--disable-blink-features=AutomationControlled") 
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    
-    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-        "source": """
-            Object.defineProperty(navigator, 'webdriver', {
-            get: () => undefined
-            })
-        """
-    })
-    return driver
+    return create_driver("mobile")
+
 
 def extract_from_mobile_card(card):
     try:
@@ -131,21 +111,58 @@ def extract_from_mobile_card(card):
         # print(f"Error: {e}")
         return None
 
+def scrape_embedded():
+    """
+    Plain-HTTP fast path: flash sale items from the page's embedded JSON state.
+    Returns None when the page doesn't carry it, so the caller falls back to Chrome.
+    """
+    try:
+        response = requests.get(TARGET_URL, headers=HTTP_HEADERS, timeout=15)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"HTTP fetch failed: {e}")
+        return None
+    products = parse_daraz_embedded(response.text, DARAZ_BASE_URL, MIN_DISCOUNT)
+    if products is None:
+        return None
+    records = []
+    for p in products:
+        ids = DARAZ_ID_RE.search(p["product_url"])
+        records.append({
+            "name": p["name"],
+            "flash_sale_price": p["sale_price"],
+            "original_price": p["original_price"],
+            "discount_percentage": p["discount_percentage"],
+            "product_url": p["product_url"],
+            "image_url": p["image_url"],
+            "item_id": ids.group(1) if ids else None,
+            "sku_id": ids.group(2) if ids else None,
+            "timestamp": p["timestamp"]
+        })
+    return records
+
+
 def scrape():
+    products = scrape_embedded()
+    if products is not None:
+        print(f"Extracted {len(products)} valid products from embedded JSON.")
+        with open(OUTPUT_FILE, 'w') as f:
+            json.dump(products, f, indent=4)
+        return
+
+    print("No embedded listings over HTTP, rendering in Chrome")
     driver = setup_driver()
     products = []
     
     try:
         print(f"Navigating to {TARGET_URL[:50]}...")
         driver.get(TARGET_URL)
-        time.sleep(10) # Heavy wait
-        
-        # Scroll a bit
-        driver.execute_script("window.scrollBy(0, 500);")
-        time.sleep(2)
+        stats = WaitStats("flash sale page")
+        wait_for_page(driver, CARD_SELECTORS, stats, cards_timeout=20)
+        print(stats.summary())
 
         # Primary mobile classes: .top-module-fashion-item or .flash-unit
-        potential_cards = driver.find_elements(By.CSS_SELECTOR, ".top-module-fashion-item, .flash-unit")
+        potential_cards = driver.find_elements(By.CSS_SELECTOR, ", ".join(CARD_SELECTORS))
         
         if not potential_cards:
              potential_cards = driver.find_elements(By.XPATH, "//*[contains(text(), 'Rs.')]/ancestor::div[contains(@class, 'unit') or contains(@class, 'item') or contains(@class, 'card')][1]")
@@ -1,247 +1,230 @@
 import json
-import time
-import re
-import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 
 import os
 
+from async_fetch import fetch_all
+from deal_summaries import DealSummary
+from driver_pool import MOBILE_UA, DriverPool, create_driver
+import metrics
+from page_wait import WaitStats, navigate, wait_for_page
+from parse_html import parse_daraz_card_fields, parse_daraz_embedded, parse_daraz_html
+from product_store import save_and_export
+
 # Configurations
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-BASE_URL = "https://www.daraz.pk/shop-electronics/"
+# DARAZ_BASE_URL overrides the listing URL, e.g. to point at replay_server.py
+BASE_URL = os.getenv("DARAZ_BASE_URL", "https://www.daraz.pk/shop-electronics/")
 OUTPUT_FILE = os.path.join(BASE_DIR, "daraz_electronics.json")
 MIN_DISCOUNT = 25
 PAGES_TO_SCRAPE = 3
 
 def setup_driver():
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--window-size=375,812") # Mobile viewport
-    options.add_argument("--user-agent=Mozilla/5.0 (iPhone; CPU iPhone OS 13_2_3 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/13.0.3 Mobile/15E148 Safari/604.1")
-    
-    # Anti-detection
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-    
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    
-    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-        "source": """
-            Object.defineProperty(navigator, 'webdriver', {
-            get: () => undefined
-            })
-        """
-    })
-    return driver
-
-def extract_price(text):
-    if not text: return 0.0
-    match = re.search(r'Rs\.\s?([\d,]+)', text)
-    if match:
-        return float(match.group(1).replace(',', ''))
-    return 0.0
+    return create_driver("mobile")
 
-def scrape_page(driver, page_num):
-    # Fix pagination URL
+
+# Card field selectors shared by the bulk (JS) and per-card (WebDriver) extraction paths
+NAME_SELECTOR = ".RfADt, .jfy-product-card-name, .title, .name"
+PRICE_SELECTOR = ".ooOxS, .jfy-product-card-price, .price"
+COINS_SELECTOR = ".WNoq3, .coins"
+
+# Product card selectors, in priority order
+CARD_SELECTORS = [
+    ".search-product-item",
+    ".product-jfy-item",
+    ".jfy-product-card-wrapper",
+    "[data-qa-locator='product-item']",
+    ".unit-content"
+]
+
+# Card extraction mode:
+#   "bulk_js"     - pull every card's raw fields in a single execute_script round trip
+#   "page_source" - dump page_source once and parse it offline with parse_html.py
+#   "per_card"    - one WebDriver call per field (slowest, most tolerant)
+EXTRACT_MODE = "bulk_js"
+
+# Fast path: fetch pages over plain HTTP and read the embedded JSON state (window.pageData /
+# __FIRST_SCREEN_DATA); Chrome is only started for pages that don't carry it.
+EMBEDDED_JSON = True
+HTTP_HEADERS = {
+    "User-Agent": MOBILE_UA,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Referer": "https://www.daraz.pk/",
+}
+BULK_EXTRACT_JS = """
+const [cardSel, nameSel, priceSel, coinsSel] = arguments;
+const innerText = (el) => (el && el.innerText) || "";
+const cards = Array.from(document.querySelectorAll(cardSel)).map((card) => {
+    const nameEl = card.querySelector(nameSel);
+    const priceEl = card.querySelector(priceSel);
+    const img = card.querySelector("img");
+    return {
+        text: innerText(card),
+        has_mall: card.outerHTML.toLowerCase().includes("mall"),
+        name: nameEl ? innerText(nameEl) : null,
+        links: Array.from(card.querySelectorAll("a")).map((a) => ({
+            href: a.href || a.getAttribute("href"),
+            title: a.getAttribute("title"),
+            text: innerText(a)
+        })),
+        price_text: priceEl ? innerText(priceEl) : null,
+        coins: Array.from(card.querySelectorAll(coinsSel)).map(innerText),
+        rating: card.getAttribute("data-rating"),
+        image: img ? (img.src || img.getAttribute("data-src")) : null
+    };
+});
+return JSON.stringify(cards);
+"""
+
+
+def extract_cards_bulk(driver, selector):
+    """Returns a list of raw card field dicts for `selector`, or None if the script fails."""
+    try:
+        raw = driver.execute_script(BULK_EXTRACT_JS, selector, NAME_SELECTOR, PRICE_SELECTOR, COINS_SELECTOR)
+        return json.loads(raw)
+    except Exception as e:
+        print(f"Bulk card extraction failed, using per-card fallback: {e}")
+        return None
+
+
+def card_fields_from_element(card):
+    """Per-card fallback: collects the same fields as BULK_EXTRACT_JS through WebDriver calls."""
+    name_sel = card.find_elements(By.CSS_SELECTOR, NAME_SELECTOR)
+    price_els = card.find_elements(By.CSS_SELECTOR, PRICE_SELECTOR)
+    img_el = card.find_elements(By.CSS_SELECTOR, "img")
+    return {
+        "text": card.text,
+        "has_mall": "mall" in (card.get_attribute("outerHTML") or "").lower(),
+        "name": name_sel[0].text if name_sel else None,
+        "links": [
+            {"href": link.get_attribute("href"), "title": link.get_attribute("title"), "text": link.text}
+            for link in card.find_elements(By.CSS_SELECTOR, "a")
+        ],
+        "price_text": price_els[0].text if price_els else None,
+        "coins": [c.text for c in card.find_elements(By.CSS_SELECTOR, COINS_SELECTOR)],
+        "rating": card.get_attribute("data-rating"),
+        "image": (img_el[0].get_attribute("src") or img_el[0].get_attribute("data-src")) if img_el else None,
+    }
+
+
+def _extract_products(driver, url, selector, cards):
+    if EXTRACT_MODE == "page_source":
+        products = parse_daraz_html(driver.page_source, url, MIN_DISCOUNT)
+        if products:
+            return products
+        print("page_source parse found no products, falling back to per-card extraction")
+
+    products = []
+    records = extract_cards_bulk(driver, selector) if EXTRACT_MODE == "bulk_js" else None
+    if records is None or len(records) != len(cards):
+        # Bulk mode unavailable or the DOM changed under us: read every card via WebDriver
+        records = [None] * len(cards)
+
+    for card, fields in zip(cards, records):
+        try:
+            if not fields or not fields.get("text"):
+                # Missing fields (not rendered yet, script error): fall back to per-card calls
+                fields = card_fields_from_element(card)
+            product = parse_daraz_card_fields(fields, MIN_DISCOUNT)
+            if product:
+                products.append(product)
+        except Exception as e:
+            metrics.card_dropped("daraz", "error")
+            continue
+            
+    return products
+
+def page_url(page_num):
     connector = "&" if "?" in BASE_URL else "?"
-    url = f"{BASE_URL}{connector}page={page_num}"
+    return f"{BASE_URL}{connector}page={page_num}"
+
+
+def scrape_pages_embedded(page_nums):
+    """
+    Fetches `page_nums` concurrently over one pooled HTTP session and parses their embedded
+    JSON. Returns {page: products}, with None for pages that need the browser.
+    """
+    urls = [page_url(p) for p in page_nums]
+    with metrics.timer("navigate", source="daraz", mode="http"):
+        fetched = fetch_all(urls, headers=HTTP_HEADERS)
+    results = {}
+    for page_num, res in zip(page_nums, fetched):
+        products = None
+        if res.ok:
+            with metrics.timer("extract", source="daraz", mode="embedded_json"):
+                products = parse_daraz_embedded(res.content.decode("utf-8", "replace"), res.url, MIN_DISCOUNT)
+        if products is None:
+            reason = res.error or "no embedded JSON"
+            print(f"Page {page_num}: no embedded listings over HTTP ({reason}), needs the browser")
+        else:
+            print(f"Page {page_num}: {len(products)} products from embedded JSON ({res.elapsed:.2f}s)")
+            metrics.count("cards_kept", len(products), source="daraz")
+        metrics.count("fetch_mode", source="daraz", mode="browser" if products is None else "embedded_json")
+        results[page_num] = products
+    return results
+
+
+def scrape_page(driver, page_num):
+    url = page_url(page_num)
     print(f"Scraping Page {page_num}: {url}")
-    driver.get(url)
-    time.sleep(5)  # Let it load
+    navigate(driver, url, "daraz")
+    stats = WaitStats(f"page {page_num}", source="daraz")
     
-    # Scroll slowly to load images and dynamic content
-    total_height = int(driver.execute_script("return document.body.scrollHeight"))
-    for i in range(1, total_height, 400):
-        driver.execute_script(f"window.scrollTo(0, {i});")
-        time.sleep(0.1)
-    
-    # Wait for products using multiple possible selectors
-    card_selectors = [
-        ".search-product-item",
-        ".product-jfy-item",
-        ".jfy-product-card-wrapper",
-        "[data-qa-locator='product-item']",
-        ".unit-content"
-    ]
+    # Wait for products using multiple possible selectors (polled together, first match wins),
+    # then scroll until no new cards load so images and dynamic content are present
+    selector = wait_for_page(driver, CARD_SELECTORS, stats)
+    print(stats.summary())
     
     cards = []
-    for selector in card_selectors:
-        try:
-            WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-            cards = driver.find_elements(By.CSS_SELECTOR, selector)
-            if cards:
-                print(f"Found {len(cards)} products using selector: {selector}")
-                break
-        except:
-            continue
+    if selector:
+        cards = driver.find_elements(By.CSS_SELECTOR, selector)
+        if cards:
+            print(f"Found {len(cards)} products using selector: {selector}")
             
     if not cards:
         print(f"No products found on page {page_num}")
         return []
 
-    products = []
-    for card in cards:
-        try:
-            # Get text and HTML early for extraction
-            text = card.text
-            html = card.get_attribute("outerHTML")
-            
-            # Basic info
-            name = ""
-            product_url = ""
-            
-            # Try to find name and link
-            name_sel = card.find_elements(By.CSS_SELECTOR, ".RfADt, .jfy-product-card-name, .title, .name")
-            if name_sel:
-                name = name_sel[0].text.strip()
-            
-            # Find product URL
-            links = card.find_elements(By.CSS_SELECTOR, "a")
-            for link in links:
-                href = link.get_attribute("href")
-                if href and "/products/" in href:
-                    product_url = href
-                    # If we don't have a name yet, try this link's title/text
-                    if not name:
-                        t = (link.get_attribute("title") or link.text).strip()
-                        if len(t) > 10 and not t.startswith("http") and not re.search(r'\.(jpg|png|webp)', t, re.I):
-                            name = t
-                    if product_url and name: break
-            
-            if not name: 
-                # Last resort: take the longest text block that's not a price
-                text_blocks = [t.strip() for t in text.split('\n') if len(t.strip()) > 15]
-                for b in text_blocks:
-                    if "Rs." not in b and "-" not in b:
-                        name = b
-                        break
-
-            if not name: continue
-            if product_url.startswith("//"): product_url = "https:" + product_url
-            
-            # Sale Price
-            sale_price = 0.0
-            sale_price_els = card.find_elements(By.CSS_SELECTOR, ".ooOxS, .jfy-product-card-price, .price")
-            if sale_price_els:
-                sale_price = extract_price(sale_price_els[0].text)
-            else:
-                rs_matches = re.findall(r'Rs\.\s?([\d,]+)', text)
-                if rs_matches: sale_price = float(rs_matches[0].replace(',', ''))
-            
-            if sale_price == 0.0: continue
-            
-            # Original Price & Discount
-            orig_price = sale_price
-            discount = 0
-            
-            # Remove coins section
-            clean_text = text
-            coins_els = card.find_elements(By.CSS_SELECTOR, ".WNoq3, .coins")
-            for c in coins_els: clean_text = clean_text.replace(c.text, "")
-            
-            disc_match = re.search(r'-(\d+)%', clean_text)
-            if disc_match:
-                discount = int(disc_match.group(1))
-            
-            # Look for another price (original)
-            all_prices = re.findall(r'Rs\.\s?([\d,]+)', clean_text)
-            price_vals = [float(p.replace(',', '')) for p in all_prices]
-            if len(price_vals) > 1:
-                others = [p for p in price_vals if abs(p - sale_price) > 5]
-                if others:
-                    orig_price = max(others)
-                    if orig_price > sale_price:
-                        calc_disc = int(((orig_price - sale_price) / orig_price) * 100)
-                        discount = max(discount, calc_disc)
-            
-            if discount > 0 and orig_price == sale_price:
-                orig_price = round(sale_price / (1 - (discount / 100)), 2)
-            
-            # Filter by discount
-            if discount < MIN_DISCOUNT:
-                continue
-
-            # Rating & Reviews
-            rating = 0.0
-            reviews = 0
-            review_match = re.search(r'\((\d+)\)', clean_text)
-            if review_match: reviews = int(review_match.group(1))
-            
-            rating_attr = card.get_attribute("data-rating")
-            if rating_attr: rating = float(rating_attr)
-
-            # Image
-            img_el = card.find_elements(By.CSS_SELECTOR, "img")
-            image_url = ""
-            if img_el:
-                image_url = img_el[0].get_attribute("src") or img_el[0].get_attribute("data-src")
-            
-            # Badges
-            badges = []
-            if "Free Shipping" in clean_text: badges.append("Free Shipping")
-            if "COD" in clean_text: badges.append("COD")
-            html_content = card.get_attribute("outerHTML")
-            if "mall" in html_content.lower(): badges.append("Daraz Mall")
-            
-            # Simple Categorization
-            category = "Electronics"
-            lower_name = name.lower()
-            if any(kw in lower_name for kw in ['phone', 'mobile', 'smartphone', 'iphone', 'samsung galaxy', 'redmi', 'infinix', 'tecno', 'realme', 'vivo', 'oppo']):
-                category = "Mobile"
-            elif any(kw in lower_name for kw in ['earbud', 'headphone', 'airpod', 'tws', 'bluetooth']):
-                category = "Wireless Earbuds"
-            elif any(kw in lower_name for kw in ['watch', 'smartwatch', 'band']):
-                category = "Smart Watches"
-
-            products.append({
-                "name": name,
-                "category": category,
-                "brand": "Unknown",
-                "sale_price": sale_price,
-                "original_price": orig_price,
-                "discount_percentage": discount,
-                "image_url": image_url,
-                "product_url": product_url,
-                "rating": rating,
-                "reviews": reviews,
-                "badges": badges,
-                "timestamp": datetime.datetime.now().isoformat()
-            })
-        except Exception as e:
-            continue
-            
+    metrics.count("cards_seen", len(cards), source="daraz")
+    with metrics.timer("extract", source="daraz"):
+        products = _extract_products(driver, url, selector, cards)
+    metrics.count("cards_kept", len(products), source="daraz")
     return products
 
-def main():
-    driver = setup_driver()
+def main(pool=None):
+    """Scrapes PAGES_TO_SCRAPE pages. Pass a shared DriverPool to reuse a warm browser."""
+    own_pool = pool is None
+    if own_pool:
+        pool = DriverPool(size=1, profile="mobile")
+    pages = list(range(1, PAGES_TO_SCRAPE + 1))
+    by_page = scrape_pages_embedded(pages) if EMBEDDED_JSON else dict.fromkeys(pages)
     all_products = []
     try:
-        for p in range(1, PAGES_TO_SCRAPE + 1):
-            page_products = scrape_page(driver, p)
-            all_products.extend(page_products)
-            print(f"Current total valid products: {len(all_products)}")
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_products, f, indent=4)
+        browser_pages = [p for p in pages if by_page[p] is None]
+        if browser_pages:
+            # Only pages without embedded JSON pay for a browser
+            with pool.acquire() as driver:
+                for p in browser_pages:
+                    by_page[p] = scrape_page(driver, p)
+        for p in pages:
+            all_products.extend(by_page[p])
+        print(f"Current total valid products: {len(all_products)}")
+        save_and_export("daraz", all_products, OUTPUT_FILE)
         if all_products:
-            avg_discount = sum(p['discount_percentage'] for p in all_products) / len(all_products)
+            summary = DealSummary(k=3)
+            for p in all_products:
+                summary.add(p['discount_percentage'], p.get('sale_price'), p['name'])
+            stats = summary.to_dict()
             print("\nSCRAPING SUMMARY")
-            print(f"Total Products: {len(all_products)}")
-            print(f"Average Discount: {avg_discount:.2f}%")
+            print(f"Total Products: {stats['count']}")
+            print(f"Average Discount: {stats['avg_discount']:.2f}% (median {stats['median_discount']}%)")
+            print(f"Top Deals: {'; '.join(stats['top'])}")
         else:
             print("No valid products matching criteria found across first 3 pages.")
     finally:
-        driver.quit()
+        if own_pool:
+            pool.close()
 
 if __name__ == "__main__":
     main()
+    metrics.write_report("daraz")
@@ -0,0 +1,298 @@
+import argparse
+import datetime
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+from atomic_files import write_json_atomic
+
+# Background scrape job queue used by /api/scrape. A request enqueues a job and returns
+# at once; a single detached runner process drains the queue, running the HTTP-only brand
+# scraper alongside one bounded browser fleet (scrape_scheduler) for Daraz and PriceOye.
+# Job state lives in .tmp/scrape_jobs/<id>.json so the web app can poll it.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+JOBS_DIR = os.path.join(PROJECT_ROOT, ".tmp", "scrape_jobs")
+LOCK_FILE = os.path.join(JOBS_DIR, "queue.lock")
+RUNNER_FILE = os.path.join(JOBS_DIR, "runner.json")
+
+SOURCES = ["retail", "daraz", "priceoye"]
+LOCK_STALE_AFTER = 30       # Seconds before an abandoned queue lock is broken
+RUNNER_STALE_AFTER = 60     # Seconds without a heartbeat before the runner is presumed dead
+HEARTBEAT_INTERVAL = 2
+KEEP_FINISHED_JOBS = 20
+
+SCHEDULER_PROGRESS_RE = re.compile(r"^Job\(.*\) (done|failed):", re.M)
+SCHEDULER_TOTAL_RE = re.compile(r"^Scheduling (\d+) jobs", re.M)
+
+
+def _now():
+    return datetime.datetime.now().isoformat()
+
+
+def _job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    write_json_atomic(path, data, indent=2)
+
+
+@contextmanager
+def _queue_lock(timeout=LOCK_STALE_AFTER):
+    """Cross-process mutex around queue state (O_EXCL lock file, portable to Windows)."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(LOCK_FILE) > LOCK_STALE_AFTER:
+                    os.remove(LOCK_FILE)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Could not acquire {LOCK_FILE}")
+            time.sleep(0.05)
+    try:
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(LOCK_FILE)
+        except OSError:
+            pass
+
+
+def list_jobs():
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    jobs = []
+    for name in os.listdir(JOBS_DIR):
+        if name.endswith(".json") and name != os.path.basename(RUNNER_FILE):
+            job = _read_json(os.path.join(JOBS_DIR, name))
+            if job:
+                jobs.append(job)
+    return sorted(jobs, key=lambda j: j["created_at"])
+
+
+def get_job(job_id=None):
+    """The job with `job_id`, or the most recently created job."""
+    if job_id:
+        return _read_json(_job_path(job_id))
+    jobs = list_jobs()
+    return jobs[-1] if jobs else None
+
+
+def _stages_for(sources):
+    stages = {}
+    if "retail" in sources:
+        stages["retail"] = {"status": "pending", "sources": ["retail"]}
+    browser_sources = [s for s in SOURCES if s in sources and s != "retail"]
+    if browser_sources:
+        stages["electronics"] = {"status": "pending", "sources": browser_sources}
+    return stages
+
+
+def _runner_alive():
+    runner = _read_json(RUNNER_FILE)
+    return bool(runner) and time.time() - runner.get("heartbeat", 0) < RUNNER_STALE_AFTER
+
+
+def _spawn_runner():
+    kwargs = {"cwd": PROJECT_ROOT, "stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL,
+              "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), "run"], **kwargs)
+
+
+def enqueue(sources=None, spawn=True):
+    """
+    Queues a scrape of `sources` and returns the job dict, coalescing with work already
+    pending: a queued job absorbs the request, and a running job that already covers
+    every requested source is returned as-is. Starts the runner if none is alive.
+    """
+    sources = [s for s in SOURCES if s in (sources or SOURCES)]
+    with _queue_lock():
+        active = [j for j in list_jobs() if j["status"] in ("queued", "running")]
+        queued = next((j for j in active if j["status"] == "queued"), None)
+        running = next((j for j in active if j["status"] == "running"), None)
+
+        if queued:
+            job = queued
+            job["sources"] = [s for s in SOURCES if s in set(job["sources"]) | set(sources)]
+            job["stages"] = _stages_for(job["sources"])
+            job["requests"] += 1
+        elif running and set(sources) <= set(running["sources"]):
+            job = running
+            job["requests"] += 1
+        else:
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "status": "queued",
+                "sources": sources,
+                "stages": _stages_for(sources),
+                "requests": 1,
+                "created_at": _now(),
+                "started_at": None,
+                "finished_at": None,
+            }
+        _write_json(_job_path(job["id"]), job)
+
+        if spawn and not _runner_alive():
+            # Claim the runner slot before spawning so concurrent requests don't start a second one
+            _write_json(RUNNER_FILE, {"pid": None, "heartbeat": time.time()})
+            _spawn_runner()
+    return job
+
+
+def _stage_command(name, stage):
+    if name == "retail":
+        return [sys.executable, os.path.join(BASE_DIR, "scrape_retailers.py")]
+    browser_sources = stage["sources"]
+    source = browser_sources[0] if len(browser_sources) == 1 else "all"
+    return [sys.executable, os.path.join(BASE_DIR, "scrape_scheduler.py"), "--source", source]
+
+
+def _stage_progress(name, log_path):
+    """(done, total) pages for the browser stage, read from the scheduler's log lines."""
+    if name == "retail":
+        return None
+    try:
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            log = f.read()
+    except OSError:
+        return None
+    total = SCHEDULER_TOTAL_RE.search(log)
+    return {"done": len(SCHEDULER_PROGRESS_RE.findall(log)), "total": int(total.group(1)) if total else None}
+
+
+def _update_job(job):
+    with _queue_lock():
+        stored = _read_json(_job_path(job["id"])) or job
+        # Requests coalesced into the running job are counted by enqueue()
+        job["requests"] = stored.get("requests", job["requests"])
+        _write_json(_job_path(job["id"]), job)
+
+
+def _heartbeat():
+    _write_json(RUNNER_FILE, {"pid": os.getpid(), "heartbeat": time.time()})
+
+
+def run_job(job):
+    """Runs a job's stages concurrently (one browser stack at most) and records their outcome."""
+    job["status"] = "running"
+    job["started_at"] = _now()
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+
+    procs = {}
+    for name, stage in job["stages"].items():
+        log_path = os.path.join(JOBS_DIR, f"{job['id']}.{name}.log")
+        log = open(log_path, "w", encoding="utf-8")
+        procs[name] = (subprocess.Popen(_stage_command(name, stage), cwd=PROJECT_ROOT, env=env,
+                                        stdout=log, stderr=subprocess.STDOUT), log)
+        stage.update(status="running", started_at=_now(), log=log_path)
+    _update_job(job)
+
+    while procs:
+        time.sleep(HEARTBEAT_INTERVAL)
+        _heartbeat()
+        for name, (proc, log) in list(procs.items()):
+            stage = job["stages"][name]
+            stage["progress"] = _stage_progress(name, stage["log"])
+            if proc.poll() is None:
+                continue
+            log.close()
+            del procs[name]
+            stage.update(status="succeeded" if proc.returncode == 0 else "failed",
+                         returncode=proc.returncode, finished_at=_now())
+            print(f"Job {job['id']}: stage {name} {stage['status']} (exit {proc.returncode})")
+        _update_job(job)
+
+    # Each stage publishes as it finishes; publish once more after all of them so the
+    # artifact is built from every stage's output whatever order they finished in
+    if len(job["stages"]) > 1 and any(s["status"] == "succeeded" for s in job["stages"].values()):
+        from publish_sales import publish
+        try:
+            publish()
+        except Exception as e:
+            print(f"Job {job['id']}: final publish failed: {e}")
+
+    failed = [n for n, s in job["stages"].items() if s["status"] == "failed"]
+    job["status"] = "failed" if failed else "succeeded"
+    job["finished_at"] = _now()
+    _update_job(job)
+    return job
+
+
+def _prune_finished():
+    finished = [j for j in list_jobs() if j["status"] in ("succeeded", "failed")]
+    for job in finished[:-KEEP_FINISHED_JOBS]:
+        for name in [f"{job['id']}.json"] + [f"{job['id']}.{stage}.log" for stage in job["stages"]]:
+            try:
+                os.remove(os.path.join(JOBS_DIR, name))
+            except OSError:
+                pass
+
+
+def run_queue():
+    """Runner loop: takes queued jobs oldest-first until the queue is empty, then exits."""
+    _heartbeat()
+    while True:
+        with _queue_lock():
+            job = next((j for j in list_jobs() if j["status"] == "queued"), None)
+            if job is None:
+                _prune_finished()
+                try:
+                    os.remove(RUNNER_FILE)
+                except OSError:
+                    pass
+                return
+            job["status"] = "running"
+            job["started_at"] = _now()
+            _write_json(_job_path(job["id"]), job)
+        print(f"Running job {job['id']} ({', '.join(job['sources'])})")
+        run_job(job)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue and run background scrape jobs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enq = sub.add_parser("enqueue", help="Queue a scrape (coalesced with pending work) and print the job")
+    enq.add_argument("--source", choices=SOURCES, action="append")
+    enq.add_argument("--no-spawn", action="store_true", help="Don't start a runner process")
+    status = sub.add_parser("status", help="Print a job (default: the latest)")
+    status.add_argument("job_id", nargs="?")
+    sub.add_parser("run", help="Drain the queue in this process")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        print(json.dumps(enqueue(args.source, spawn=not args.no_spawn)))
+    elif args.command == "status":
+        print(json.dumps(get_job(args.job_id)))
+    else:
+        run_queue()
+
+
+if __name__ == "__main__":
+    main()
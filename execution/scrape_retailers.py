@@ -1,10 +1,19 @@
 import csv
+import json
 import random
 import os
 import requests
 from bs4 import BeautifulSoup
 import time
-import re
+from urllib.parse import urljoin, urlparse
+
+import metrics
+from async_fetch import DEFAULT_HEADERS as HEADERS, MAX_CONCURRENCY, MAX_PER_HOST, REQUEST_TIMEOUT, fetch_all
+from atomic_files import write_atomic
+from brand_page_stream import extract_brand_signals
+from http_cache import HttpCache
+from publish_sales import CSV_FILE, publish
+from normalize import DISCOUNT_CLASS_RE, PERCENT_2DIGIT_RE, banner_alt_re
 
 # Constants
 TARGET_BRANDS = {
@@ -35,6 +44,9 @@ TARGET_BRANDS = {
     "Borjan": {"url": "https://www.borjan.com.pk/", "category": "Shoes"},
     "ECS": {"url": "https://shopecs.com/", "category": "Shoes"}
 }
+# TARGET_BRANDS (JSON, same shape) replaces the list, e.g. to point at replay_server.py
+if os.getenv("TARGET_BRANDS"):
+    TARGET_BRANDS = json.loads(os.environ["TARGET_BRANDS"])
 
 # Remaining brands to mock
 ALL_CLOTHING = [
@@ -51,7 +63,7 @@ ALL_SHOES = [
     "Regal Shoes", "Footlib", "Urban Sole", "Crocs Pakistan", "1st Step", "Calza"
 ]
 
-OUTPUT_FILE = ".tmp/live_retail_sales.csv"
+OUTPUT_FILE = CSV_FILE   # Where publish_sales reads it, whatever the working directory
 
 def extract_max_discount(text):
     """
@@ -61,7 +73,7 @@ def extract_max_discount(text):
         return 0
     
     # Look for [number]% pattern
-    matches = re.findall(r'(\d{1,2})%', text)
+    matches = PERCENT_2DIGIT_RE.findall(text)
     if not matches:
         return 0
     
@@ -70,77 +82,158 @@ def extract_max_discount(text):
     return max(values) if values else 0
 
 
+def extract_brand_signals_soup(content, url, category):
+    """
+    Reference BeautifulSoup implementation of brand_page_stream.extract_brand_signals():
+    returns (max discount, image url). Kept for validation against saved pages.
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # Try to find discounts in specific product labels/badges first (common in Shopify/Magento)
+    # These are common classes for discount badges in Pakistani retail sites
+    potential_labels = soup.find_all(['span', 'div', 'p'], class_=DISCOUNT_CLASS_RE)
+    
+    discounts = []
+    for label in potential_labels:
+        d = extract_max_discount(label.get_text())
+        if d > 0:
+            discounts.append(d)
+    
+    if discounts:
+        discount = max(discounts)
+    else:
+        # Fallback: remove common noisy elements and check remaining text
+        for noisy in soup.find_all(['header', 'footer', 'nav', 'script', 'style']):
+            noisy.decompose()
+        text_content = soup.get_text()
+        discount = extract_max_discount(text_content)
+    
+    # Try to find a representative image (OG Image is best)
+    image_url = ""
+    og_image = soup.find('meta', property='og:image')
+    if og_image and og_image.get('content'):
+        image_url = og_image.get('content')
+        
+    # Refinement: If OG image looks like a logo or is empty, try to find a category-specific banner
+    if not image_url or "logo" in image_url.lower():
+        # Look for large images with relevant alt text
+        prio_images = soup.find_all('img', alt=banner_alt_re(category))
+        for img in prio_images:
+            src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
+            if src and src.startswith('http'):
+                image_url = src
+                break
+    
+    # Ensure relative URLs are made absolute
+    if image_url and not image_url.startswith('http'):
+        image_url = urljoin(url, image_url)
+    
+    return discount, image_url
+
+
+def parse_brand_page(brand_name, url, category, content):
+    """
+    Extracts the max discount and a representative image from a fetched brand page.
+    Returns the CSV row dict, or None when no discount pattern is found.
+    """
+    with metrics.timer("extract", source="retail"):
+        discount, image_url = extract_brand_signals(content, url, category)
+    
+    if discount > 0:
+        return {
+            "Brand Name": brand_name,
+            "Category": category,
+            "Discount Percentage": f"{discount}%",
+            "Discount Value": discount,
+            "Source": "Scraped (Real)",
+            "URL": url,
+            "ImageURL": image_url
+        }
+    else:
+        print(f"  - No discount pattern found for {brand_name}")
+        metrics.count("brands_dropped", source="retail", reason="no_discount")
+        return None
+
+
 def scrape_brand(brand_name, url, category):
     print(f"Scraping {brand_name} ({category}) at {url}...")
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=15)
+        with metrics.timer("navigate", source="retail"):
+            response = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+        metrics.observe("http_fetch_seconds", response.elapsed.total_seconds(), host=urlparse(url).netloc)
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Try to find discounts in specific product labels/badges first (common in Shopify/Magento)
-        # These are common classes for discount badges in Pakistani retail sites
-        potential_labels = soup.find_all(['span', 'div', 'p'], class_=re.compile(r'badge|label|discount|sale|price-tag|reduction', re.I))
-        
-        discounts = []
-        for label in potential_labels:
-            d = extract_max_discount(label.get_text())
-            if d > 0:
-                discounts.append(d)
-        
-        if discounts:
-            discount = max(discounts)
-        else:
-            # Fallback: remove common noisy elements and check remaining text
-            for noisy in soup.find_all(['header', 'footer', 'nav', 'script', 'style']):
-                noisy.decompose()
-            text_content = soup.get_text()
-            discount = extract_max_discount(text_content)
-        
-        # Try to find a representative image (OG Image is best)
-        image_url = ""
-        og_image = soup.find('meta', property='og:image')
-        if og_image and og_image.get('content'):
-            image_url = og_image.get('content')
-            
-        # Refinement: If OG image looks like a logo or is empty, try to find a category-specific banner
-        if not image_url or "logo" in image_url.lower():
-            # Look for large images with relevant alt text
-            patterns = [category.lower(), "banner", "sale", "hero"]
-            prio_images = soup.find_all('img', alt=re.compile('|'.join(patterns), re.I))
-            for img in prio_images:
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
-                if src and src.startswith('http'):
-                    image_url = src
-                    break
-        
-        # Ensure relative URLs are made absolute
-        if image_url and not image_url.startswith('http'):
-            from urllib.parse import urljoin
-            image_url = urljoin(url, image_url)
-        
-        if discount > 0:
-            return {
-                "Brand Name": brand_name,
-                "Category": category,
-                "Discount Percentage": f"{discount}%",
-                "Discount Value": discount,
-                "Source": "Scraped (Real)",
-                "URL": url,
-                "ImageURL": image_url
-            }
-        else:
-            print(f"  - No discount pattern found for {brand_name}")
-            return None
+        return parse_brand_page(brand_name, url, category, response.content)
 
     except Exception as e:
         print(f"  - Failed to scrape {brand_name}: {e}")
         return None
 
 
+def _reuse_cached(cache, brand_name, url, category):
+    """Result for a 304: the cached parse if it was for this brand, else a re-parse of the cached body."""
+    entry = cache.get(url)
+    if entry is None:
+        return None, False
+    parsed = entry.get("parsed")
+    if entry.get("brand") == brand_name and entry.get("category") == category:
+        if parsed is None:
+            print(f"  - No discount pattern found for {brand_name} (unchanged)")
+        return parsed, True
+    content = cache.body(url)
+    if content is None:
+        return None, False
+    parsed = parse_brand_page(brand_name, url, category, content)
+    cache.update_parsed(url, parsed, brand=brand_name, category=category)
+    return parsed, True
+
+
+def scrape_brands_concurrently(targets, use_cache=True):
+    """
+    Fetches all brand pages concurrently (pooled session, global and per-host limits)
+    and parses them. `targets` is a list of (brand_name, url, category); results are
+    returned in the same order, with None for failed or discount-less brands.
+    With `use_cache`, requests are conditional and a 304 reuses the cached parse.
+    """
+    cache = HttpCache() if use_cache else None
+    urls = [url for _, url, _ in targets]
+    headers = [cache.conditional_headers(url, HEADERS) for url in urls] if cache else HEADERS
+    print(f"Fetching {len(urls)} brand pages concurrently (max {MAX_CONCURRENCY}, {MAX_PER_HOST}/host)...")
+    with metrics.timer("navigate", source="retail"):
+        fetched = fetch_all(urls, headers=headers, max_concurrency=MAX_CONCURRENCY,
+                            max_per_host=MAX_PER_HOST, timeout=REQUEST_TIMEOUT)
+
+    results = []
+    for (brand_name, url, category), res in zip(targets, fetched):
+        print(f"Scraping {brand_name} ({category}) at {url}... ({res.elapsed:.2f}s, HTTP {res.status})")
+        if not res.ok:
+            print(f"  - Failed to scrape {brand_name}: {res.error}")
+            metrics.count("brands_dropped", source="retail", reason="fetch_failed")
+            results.append(None)
+            continue
+        try:
+            if res.status == 304 and cache:
+                parsed, hit = _reuse_cached(cache, brand_name, url, category)
+                metrics.count("http_cache", result="hit" if hit else "miss")
+                if hit:
+                    results.append(parsed)
+                    continue
+                # Cache lost the body: nothing to reuse, treat as a failed fetch this run
+                print(f"  - Got 304 for {brand_name} but no cached copy")
+                results.append(None)
+                continue
+            parsed = parse_brand_page(brand_name, url, category, res.content)
+            if cache:
+                cache.store(url, res.headers, res.content, parsed, brand=brand_name, category=category)
+            results.append(parsed)
+        except Exception as e:
+            print(f"  - Failed to parse {brand_name}: {e}")
+            results.append(None)
+
+    if cache:
+        cache.save()
+    return results
+
+
 def generate_mock_data(brand, category):
     discount = random.randint(10, 70)
     # Default URL to Google Search for the brand if no specific URL known
@@ -159,10 +252,14 @@ def main():
     
     # 1. Scrape Target Brands
     processed_brands = set()
+    targets = [(brand, info["url"], info["category"]) for brand, info in TARGET_BRANDS.items()]
+    scraped = scrape_brands_concurrently(targets)
+    metrics.count("cards_seen", len(targets), source="retail")
+    metrics.count("cards_kept", sum(1 for data in scraped if data), source="retail")
     
-    for brand, info in TARGET_BRANDS.items():
+    for (brand, _, _), data in zip(targets, scraped):
+        info = TARGET_BRANDS[brand]
         processed_brands.add(brand)
-        data = scrape_brand(brand, info["url"], info["category"])
         if data:
             all_data.append(data)
         else:
@@ -191,16 +288,22 @@ def main():
     ))
 
     # 5. Write
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, mode='w', newline='', encoding='utf-8') as file:
+    write_start = time.perf_counter()
+    def write_csv(file):
         writer = csv.DictWriter(file, fieldnames=["Brand Name", "Category", "Discount Percentage", "Source", "URL", "ImageURL"])
         writer.writeheader()
         for item in all_data:
             row = item.copy()
             del row["Discount Value"]
             writer.writerow(row)
+
+    # The electronics stage may be publishing from this file in parallel: swap it in whole
+    write_atomic(OUTPUT_FILE, write_csv, newline='')
     
     print(f"Completed. Data saved to {OUTPUT_FILE} ({len(all_data)} items)")
+    publish()
+    metrics.add_time("write", time.perf_counter() - write_start, source="retail")
 
 if __name__ == "__main__":
     main()
+    metrics.write_report("retail")
@@ -0,0 +1,193 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from multiprocessing import util as mp_util
+from urllib.parse import urlparse
+
+import metrics
+import scrape_daraz_electronics
+import scrape_priceoye_electronics
+from driver_pool import create_driver
+from product_store import save_and_export
+
+# Spreads (source, category, page) jobs over worker processes, one browser per worker.
+# Results are merged in job order, so output matches a sequential run of the same jobs.
+
+DEFAULT_WORKERS = 3
+MAX_PER_HOST = int(os.getenv("SCRAPE_MAX_PER_HOST", "2"))                   # Concurrent page loads against one host, across all workers
+MIN_HOST_INTERVAL = float(os.getenv("SCRAPE_MIN_HOST_INTERVAL", "1.0"))   # Seconds between successive page loads on one host
+
+SOURCE_PROFILES = {
+    "daraz": "mobile",
+    "priceoye": "desktop",
+}
+
+# Per-worker state, set up by _init_worker()
+_drivers = {}
+_host_limits = {}
+
+
+class Job:
+    def __init__(self, source, category, page, url):
+        self.source = source
+        self.category = category
+        self.page = page
+        self.url = url
+
+    @property
+    def host(self):
+        return urlparse(self.url).netloc
+
+    def __repr__(self):
+        return f"Job({self.source}, {self.category}, page {self.page})"
+
+
+def daraz_jobs(pages=scrape_daraz_electronics.PAGES_TO_SCRAPE):
+    base = scrape_daraz_electronics.BASE_URL
+    return [Job("daraz", "Electronics", p, base) for p in range(1, pages + 1)]
+
+
+def priceoye_jobs(pages=scrape_priceoye_electronics.PAGES_PER_CATEGORY):
+    return [
+        Job("priceoye", cat, p, url)
+        for cat, url in scrape_priceoye_electronics.CATEGORIES.items()
+        for p in range(1, pages + 1)
+    ]
+
+
+def _quit_drivers():
+    for driver in _drivers.values():
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    _drivers.clear()
+
+
+def _init_worker(host_limits):
+    _host_limits.update(host_limits)
+    # multiprocessing skips atexit in workers; Finalize runs on normal worker exit
+    mp_util.Finalize(None, _quit_drivers, exitpriority=10)
+
+
+def _get_driver(source):
+    profile = SOURCE_PROFILES[source]
+    if profile not in _drivers:
+        _drivers[profile] = create_driver(profile)
+    return _drivers[profile]
+
+
+@contextmanager
+def _host_slot(host):
+    """Holds one of the host's MAX_PER_HOST slots and spaces page loads by MIN_HOST_INTERVAL."""
+    limits = _host_limits.get(host)
+    if limits is None:
+        yield
+        return
+    semaphore, lock, last_start = limits
+    with semaphore:
+        with lock:
+            wait = last_start.value + MIN_HOST_INTERVAL - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            last_start.value = time.time()
+        yield
+
+
+def _run_job(index, job):
+    try:
+        if job.source == "daraz" and scrape_daraz_electronics.EMBEDDED_JSON:
+            # Plain-HTTP fast path; the worker's browser is only started if this page needs it
+            with _host_slot(job.host):
+                products = scrape_daraz_electronics.scrape_pages_embedded([job.page])[job.page]
+            if products is not None:
+                return index, products, None, metrics.metrics.collect()
+        driver = _get_driver(job.source)
+        with _host_slot(job.host):
+            if job.source == "daraz":
+                products = scrape_daraz_electronics.scrape_page(driver, job.page)
+            else:
+                products = scrape_priceoye_electronics.scrape_category_page(driver, job.category, job.url, job.page)
+        return index, products, None, metrics.metrics.collect()
+    except Exception as e:
+        # A dead browser should not poison the rest of this worker's jobs
+        _quit_drivers()
+        return index, [], str(e), metrics.metrics.collect()
+
+
+def run_jobs(jobs, workers=DEFAULT_WORKERS):
+    """Runs `jobs` across `workers` processes and returns one product list per job, in job order."""
+    if not jobs:
+        return []
+
+    ctx = multiprocessing.get_context("spawn")
+    host_limits = {
+        host: (ctx.Semaphore(MAX_PER_HOST), ctx.Lock(), ctx.Value("d", 0.0))
+        for host in {job.host for job in jobs}
+    }
+
+    results = [None] * len(jobs)
+    workers = max(1, min(workers, len(jobs)))
+    print(f"Scheduling {len(jobs)} jobs across {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(host_limits,)) as executor:
+        futures = [executor.submit(_run_job, i, job) for i, job in enumerate(jobs)]
+        for future in as_completed(futures):
+            index, products, error, worker_metrics = future.result()
+            # Stage timings and card counts recorded in the worker process
+            metrics.metrics.merge(worker_metrics)
+            results[index] = products
+            if error:
+                print(f"{jobs[index]} failed: {error}")
+            else:
+                print(f"{jobs[index]} done: {len(products)} products")
+    return results
+
+
+def merge_by_source(jobs, results):
+    merged = {}
+    for job, products in zip(jobs, results):
+        merged.setdefault(job.source, []).extend(products)
+    return merged
+
+
+def scrape_sources(source="all", workers=DEFAULT_WORKERS,
+                   daraz_pages=scrape_daraz_electronics.PAGES_TO_SCRAPE,
+                   priceoye_pages=scrape_priceoye_electronics.PAGES_PER_CATEGORY):
+    """Scrapes and stores `source` ("all", "daraz" or "priceoye"); returns {source: product count}."""
+    jobs = []
+    if source in ("all", "daraz"):
+        jobs += daraz_jobs(daraz_pages)
+    if source in ("all", "priceoye"):
+        jobs += priceoye_jobs(priceoye_pages)
+
+    start = time.perf_counter()
+    merged = merge_by_source(jobs, run_jobs(jobs, workers))
+    print(f"\nScraped {len(jobs)} pages in {time.perf_counter() - start:.1f}s")
+
+    outputs = {
+        "daraz": scrape_daraz_electronics.OUTPUT_FILE,
+        "priceoye": scrape_priceoye_electronics.OUTPUT_FILE,
+    }
+    for name, products in merged.items():
+        save_and_export(name, products, outputs[name])
+        print(f"Saved {len(products)} {name} products to {outputs[name]}")
+    return {name: len(products) for name, products in merged.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape Daraz and PriceOye pages in parallel.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--daraz-pages", type=int, default=scrape_daraz_electronics.PAGES_TO_SCRAPE)
+    parser.add_argument("--priceoye-pages", type=int, default=scrape_priceoye_electronics.PAGES_PER_CATEGORY)
+    parser.add_argument("--source", choices=["all", "daraz", "priceoye"], default="all")
+    args = parser.parse_args()
+
+    scrape_sources(args.source, args.workers, args.daraz_pages, args.priceoye_pages)
+    metrics.write_report("electronics")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import csv
 import os
 import json
-import smtplib
 import argparse
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import heapq
+import itertools
 from dotenv import load_dotenv
 
+from alert_matching import AlertIndex, changed_products, run_products
+from email_templates import RowCache, render_confirmation, render_deals
+import metrics
+from deal_summaries import discount_value, top_deals
+from mail_dispatch import SmtpPool, dispatch
+from product_matching import cheapest_offers
+from publish_sales import SOURCE_LABELS, load_artifact
+
 # Base directory setup
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Loading from project root if possible
@@ -15,136 +22,153 @@ load_dotenv(os.path.join(BASE_DIR, "..", ".env"))
 DARAZ_FILE = os.path.join(BASE_DIR, "daraz_electronics.json")
 PRICEOYE_FILE = os.path.join(BASE_DIR, "priceoye_electronics.json")
 
-def load_deals():
-    deals = []
+def _deal_rows(items, source, default_category):
+    return [{
+        "Brand Name": item.get('name', 'N/A'),
+        "Category": item.get('category', default_category),
+        "Discount": f"{item.get('discount_percentage', 0)}%",
+        "Source": source
+    } for item in items]
+
+DEFAULT_CATEGORIES = {"Daraz": "Electronics", "PriceOye": "Mobile"}
+SOURCE_NAMES = {"daraz": "Daraz", "priceoye": "PriceOye"}
+TOP_DEALS = 10
+
+def summary_deals(limit=TOP_DEALS):
+    """Top electronics deals straight from the published summaries; None if there are none yet."""
+    artifact = load_artifact()
+    summaries = (artifact or {}).get("summaries")
+    if not summaries:
+        return None
+    # Each source's top list is already sorted by discount; merge them instead of re-sorting every deal
+    tops = []
+    for source, label in SOURCE_LABELS.items():
+        rows = [artifact["rows"][i] for i in summaries["sources"].get(label, {}).get("top", [])]
+        tops.append([{
+            "Brand Name": row.get("FullTitle") or row["Brand Name"],
+            "Category": row.get("Category"),
+            "Discount": row["Discount Percentage"].lstrip("-"),
+            "Source": SOURCE_NAMES[source],
+        } for row in rows])
+    merged = heapq.merge(*tops, key=lambda deal: discount_value(deal["Discount"]), reverse=True)
+    return list(itertools.islice(merged, limit))
+
+def load_deals(changes_only=False):
+    if not changes_only:
+        deals = summary_deals()
+        if deals is not None:
+            return deals
+
+    listings = []
     
-    # Load Daraz
-    if os.path.exists(DARAZ_FILE):
-        try:
-            with open(DARAZ_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data:
-                    deals.append({
-                        "Brand Name": item.get('name', 'N/A'),
-                        "Category": item.get('category', 'Electronics'),
-                        "Discount": f"{item.get('discount_percentage', 0)}%",
-                        "Source": "Daraz"
-                    })
-        except Exception as e:
-            print(f"Error loading Daraz data: {e}")
-
-    # Load PriceOye
-    if os.path.exists(PRICEOYE_FILE):
-        try:
-            with open(PRICEOYE_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data:
-                    deals.append({
-                        "Brand Name": item.get('name', 'N/A'),
-                        "Category": item.get('category', 'Mobile'),
-                        "Discount": f"{item.get('discount_percentage', 0)}%",
-                        "Source": "PriceOye"
-                    })
-        except Exception as e:
-            print(f"Error loading PriceOye data: {e}")
+    if changes_only:
+        listings.extend(("Daraz", p) for p in changed_products("daraz"))
+        listings.extend(("PriceOye", p) for p in changed_products("priceoye"))
+    else:
+        # Load Daraz
+        if os.path.exists(DARAZ_FILE):
+            try:
+                with open(DARAZ_FILE, 'r', encoding='utf-8') as f:
+                    listings.extend(("Daraz", p) for p in json.load(f))
+            except Exception as e:
+                print(f"Error loading Daraz data: {e}")
+
+        # Load PriceOye
+        if os.path.exists(PRICEOYE_FILE):
+            try:
+                with open(PRICEOYE_FILE, 'r', encoding='utf-8') as f:
+                    listings.extend(("PriceOye", p) for p in json.load(f))
+            except Exception as e:
+                print(f"Error loading PriceOye data: {e}")
+
+    # A phone listed on both sites (or twice on one) is emailed once, at its cheapest offer
+    deals = []
+    for source, item in cheapest_offers(listings):
+        deals.extend(_deal_rows([item], source, DEFAULT_CATEGORIES[source]))
     
-    # Sort by discount (simple string parse for sorting)
-    try:
-        deals.sort(key=lambda x: int(x['Discount'].replace('%','')), reverse=True)
-    except:
-        pass
-        
-    return deals[:10]
-
-def send_email(to_email=None, is_confirmation=False):
-    smtp_host = os.getenv("SMTP_HOST")
-    smtp_port = os.getenv("SMTP_PORT")
-    smtp_user = os.getenv("SMTP_USER")
-    smtp_pass = os.getenv("SMTP_PASS")
+    return top_deals(deals, TOP_DEALS, discount=lambda deal: deal['Discount'])
+
+CONFIRMATION_SUBJECT = "Welcome to Retail Monitor Pakistan Alerts!"
+
+def render_template(name, item):
+    """(subject, html) for messages spooled by name (see mail_dispatch.enqueue_email)."""
+    if name == "confirmation":
+        return CONFIRMATION_SUBJECT, render_confirmation()
+    raise ValueError(f"Unknown email template: {name}")
+
+def send_email(to_email=None, is_confirmation=False, changes_only=False, pool=None):
+    own_pool = pool is None
+    pool = pool or SmtpPool()
     default_to = os.getenv("ALERT_EMAIL_TO")
 
     target_email = to_email if to_email else default_to
 
-    if not all([smtp_host, smtp_port, smtp_user, smtp_pass, target_email]):
+    if not (pool.configured and target_email):
         print(f"Error: Missing SMTP configuration in .env for {target_email}")
         return
 
     if is_confirmation:
-        subject = "Welcome to Retail Monitor Pakistan Alerts!"
-        html_content = f"""
-        <html>
-        <body style="font-family: sans-serif; color: #333;">
-            <h2 style="color: #4f46e5;">Subscription Confirmed!</h2>
-            <p>Hello,</p>
-            <p>You have successfully subscribed to price alerts on <b>Retail Monitor Pakistan</b>. We will notify you whenever we find massive price drops in your selected categories.</p>
-            <p>Happy Shopping!</p>
-            <hr>
-            <p style="font-size: 12px; color: #666;">This is an automated message from Retail Monitor.</p>
-        </body>
-        </html>
-        """
+        subject, html_content = render_template("confirmation", {})
     else:
-        deals = load_deals()
+        deals = load_deals(changes_only)
         if not deals:
             print("No deals found to send.")
             return
 
         subject = "Daily Retail Sales Alert - Top Discounts Today"
-        html_content = """
-        <html>
-        <body style="font-family: sans-serif; color: #333;">
-            <h2 style="color: #0d9488;">Top 10 Tech Deals Today</h2>
-            <table border="0" cellpadding="10" cellspacing="1" style="background-color: #e5e7eb; width: 100%;">
-                <tr style="background-color: #1f2937; color: white;">
-                    <th>Brand/Product</th>
-                    <th>Category</th>
-                    <th>Discount</th>
-                    <th>Source</th>
-                </tr>
-        """
-        
-        for deal in deals:
-            html_content += f"""
-                <tr style="background-color: white;">
-                    <td>{deal['Brand Name']}</td>
-                    <td>{deal['Category']}</td>
-                    <td style="color: #0d9488; font-weight: bold;">{deal['Discount']}</td>
-                    <td>{deal['Source']}</td>
-                </tr>
-            """
-        
-        html_content += """
-            </table>
-            <p>Visit <a href="http://localhost:3000">Retail Monitor Pakistan</a> to see all live deals!</p>
-            <hr>
-            <p style="font-size: 12px; color: #666;">Generated by Agentic Retail Monitor</p>
-        </body>
-        </html>
-        """
-
-    msg = MIMEMultipart()
-    msg['From'] = smtp_user
-    msg['To'] = target_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(html_content, 'html'))
-
-    try:
-        print(f"Connecting to {smtp_host}:{smtp_port} for {target_email}...")
-        server = smtplib.SMTP(smtp_host, int(smtp_port))
-        server.starttls()
-        server.login(smtp_user, smtp_pass)
-        server.send_message(msg)
-        server.quit()
-        print(f"Email sent successfully to {target_email}")
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+        with metrics.timer("render", source="email"):
+            html_content = render_deals(deals, "Top 10 Tech Deals Today")
+
+    with metrics.timer("send", source="email"):
+        dispatch([(target_email, subject, html_content)], pool)
+    if own_pool:
+        pool.close()
+
+def send_digests(pool=None):
+    """One email per subscriber with the new listings / price drops matching their alerts."""
+    own_pool = pool is None
+    pool = pool or SmtpPool()
+    if not pool.configured:
+        print("Error: Missing SMTP configuration in .env")
+        return
+
+    with metrics.timer("match", source="digests"):
+        products = [p for _, p in cheapest_offers((p["source"], p) for p in run_products())]
+        digests = AlertIndex.load().digests(products)
+    if not digests:
+        print("No subscriber matches in this run.")
+        return
+
+    # Each deal's table row is rendered once and shared by every digest that includes it
+    rows = RowCache()
+    messages = []
+    with metrics.timer("render", source="digests"):
+        for email, products in digests.items():
+            deals = []
+            for product in products:
+                deals.extend(_deal_rows([product], product["source"], "Electronics"))
+            heading = f"{len(deals)} New Deals Matching Your Alerts"
+            messages.append((email, "Retail Monitor - Deals Matching Your Alerts", render_deals(deals, heading, rows)))
+
+    # All digests share the pool's connections instead of one SMTP session each
+    with metrics.timer("send", source="digests"):
+        sent = dispatch(messages, pool)
+    if own_pool:
+        pool.close()
+    print(f"Sent {sent}/{len(digests)} alert digests")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Send email alerts.")
     parser.add_argument("--confirm", type=str, help="Email address to send confirmation to")
+    parser.add_argument("--changes-only", action="store_true", help="Only alert on new listings and price drops since the last run")
+    parser.add_argument("--digests", action="store_true", help="Send each subscriber in alerts.json the changes matching their alert")
     args = parser.parse_args()
 
     if args.confirm:
         send_email(to_email=args.confirm, is_confirmation=True)
+    elif args.digests:
+        send_digests()
+        metrics.write_report("digests")
     else:
-        send_email()
+        send_email(changes_only=args.changes_only)
+        metrics.write_report("email")
@@ -1,11 +1,41 @@
 import { NextResponse } from 'next/server';
 import fs from 'fs';
 import path from 'path';
-import { exec } from 'child_process';
+import { spawn } from 'child_process';
 
 const projectRoot = path.resolve(process.cwd(), '..');
 const ALERTS_FILE = path.join(projectRoot, 'execution/alerts.json');
-const EMAIL_SCRIPT = path.join(projectRoot, 'execution/send_email_alert.py');
+const MAIL_SCRIPT = path.join(projectRoot, 'execution/mail_dispatch.py');
+const MAIL_SPOOL = path.join(projectRoot, '.tmp/mail_queue');
+const WORKER_FILE = path.join(MAIL_SPOOL, 'worker.json');
+const WORKER_STALE_MS = 30_000;
+const WORKER_IDLE_EXIT_SECONDS = 300;
+
+// Spools a message for execution/mail_dispatch.py (same format as its enqueue_email()) and
+// makes sure a mail worker is running, instead of starting a Python process per email.
+const queueEmail = (to: string, template: string) => {
+    fs.mkdirSync(MAIL_SPOOL, { recursive: true });
+    const name = `${process.hrtime.bigint()}-${Math.random().toString(16).slice(2, 10)}.json`;
+    const item = { to, subject: null, html: null, template, queued_at: Date.now() / 1000, attempts: 0 };
+    fs.writeFileSync(path.join(MAIL_SPOOL, `${name}.tmp`), JSON.stringify(item));
+    fs.renameSync(path.join(MAIL_SPOOL, `${name}.tmp`), path.join(MAIL_SPOOL, name));
+
+    let workerAlive = false;
+    try {
+        workerAlive = Date.now() - fs.statSync(WORKER_FILE).mtimeMs < WORKER_STALE_MS;
+    } catch {
+        // No worker yet
+    }
+    if (!workerAlive) {
+        const worker = spawn('python', [MAIL_SCRIPT, 'worker', '--idle-exit', String(WORKER_IDLE_EXIT_SECONDS)], {
+            cwd: projectRoot,
+            detached: true,
+            stdio: 'ignore'
+        });
+        worker.on('error', (error) => console.error(`Mail worker error: ${error.message}`));
+        worker.unref();
+    }
+};
 
 export async function POST(request: Request) {
     try {
@@ -34,14 +64,12 @@ export async function POST(request: Request) {
         alerts.push(newAlert);
         fs.writeFileSync(ALERTS_FILE, JSON.stringify(alerts, null, 2));
 
-        // Trigger confirmation email
-        exec(`python "${EMAIL_SCRIPT}" --confirm "${email}"`, (error, stdout, stderr) => {
-            if (error) {
-                console.error(`Email Trigger Error: ${error.message}`);
-                return;
-            }
-            console.log(`Email Trigger Success: ${stdout}`);
-        });
+        // Queue confirmation email
+        try {
+            queueEmail(email, 'confirmation');
+        } catch (mailError) {
+            console.error('Error queueing confirmation email:', mailError);
+        }
 
         return NextResponse.json({ message: 'Subscription successful', alert: newAlert });
     } catch (error) {
@@ -0,0 +1,33 @@
+import { NextResponse } from 'next/server';
+import fs from 'fs';
+import path from 'path';
+
+// Thumbnails cached by execution/image_cache.py. Files are named by the hash of their
+// content, so a response never changes and can be cached by the browser indefinitely.
+const imagesDir = path.resolve(process.cwd(), '../.tmp/images');
+
+const CONTENT_TYPES: Record<string, string> = {
+    webp: 'image/webp',
+    jpg: 'image/jpeg',
+    png: 'image/png',
+    gif: 'image/gif',
+};
+
+export async function GET(_request: Request, { params }: { params: Promise<{ file: string }> }) {
+    const { file } = await params;
+    const match = /^[0-9a-f]{32}\.(webp|jpg|png|gif)$/.exec(file);
+    if (!match) {
+        return NextResponse.json({ error: 'Invalid image name' }, { status: 400 });
+    }
+    try {
+        const body = fs.readFileSync(path.join(imagesDir, file));
+        return new NextResponse(body, {
+            headers: {
+                'Content-Type': CONTENT_TYPES[match[1]],
+                'Cache-Control': 'public, max-age=31536000, immutable',
+            },
+        });
+    } catch {
+        return NextResponse.json({ error: 'Image not found' }, { status: 404 });
+    }
+}
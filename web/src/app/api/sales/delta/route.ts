@@ -0,0 +1,25 @@
+import { NextResponse } from 'next/server';
+import fs from 'fs';
+import path from 'path';
+
+// Returns only what changed in the last scrape of each source (new, removed and
+// price-changed listings), as written by execution/change_detection.py.
+export async function GET() {
+    try {
+        const projectRoot = path.resolve(process.cwd(), '..');
+        const sources = ['daraz', 'priceoye'];
+        const deltas: Record<string, any> = {};
+
+        for (const source of sources) {
+            const deltaPath = path.join(projectRoot, `.tmp/${source}_delta.json`);
+            if (fs.existsSync(deltaPath)) {
+                deltas[source] = JSON.parse(fs.readFileSync(deltaPath, 'utf-8'));
+            }
+        }
+
+        return NextResponse.json(deltas);
+    } catch (e: any) {
+        console.error("Error reading sales delta:", e);
+        return NextResponse.json({ error: String(e) }, { status: 500 });
+    }
+}
@@ -2,128 +2,258 @@ import { NextResponse } from 'next/server';
 import fs from 'fs';
 import path from 'path';
 
-export async function GET() {
+const projectRoot = path.resolve(process.cwd(), '..');
+// Precomputed by execution/publish_sales.py after every scrape
+const servingPath = path.join(projectRoot, '.tmp/sales_serving.json');
+const csvPath = path.join(projectRoot, '.tmp/live_retail_sales.csv');
+const darazPath = path.join(projectRoot, 'execution/daraz_electronics.json');
+const priceoyePath = path.join(projectRoot, 'execution/priceoye_electronics.json');
+
+type Indexes = { category: Record<string, number[]>; source: Record<string, number[]> };
+// Precomputed per category/source by execution/deal_summaries.py; `top` holds row indexes
+type Summary = { count: number; avg_discount: number; median_discount: number; price_buckets: Record<string, number>; top: any[] };
+type Summaries = { top_k: number; sections: Record<string, Record<string, Summary>>; sources: Record<string, Summary>; categories: Record<string, Summary> };
+type SalesCache = { stamp: string; version: string; rows: any[]; indexes: Indexes; summaries: Summaries | null };
+
+// Kept in memory across requests; reloaded only when the source files change on disk
+let cache: SalesCache | null = null;
+
+const mtimeOf = (file: string): number => {
     try {
-        const projectRoot = path.resolve(process.cwd(), '..');
-        const csvPath = path.join(projectRoot, '.tmp/live_retail_sales.csv');
-        const darazPath = path.join(projectRoot, 'execution/daraz_electronics.json');
-        const priceoyePath = path.join(projectRoot, 'execution/priceoye_electronics.json');
-
-        let allData: any[] = [];
-
-        const darazAffId = process.env.DARAZ_AFFILIATE_ID || "";
-        const priceoyeAffId = process.env.PRICEOYE_AFFILIATE_ID || "";
-
-        // 1. Process CSV Data (clothing and shoes)
-        if (fs.existsSync(csvPath)) {
-            try {
-                const fileContent = fs.readFileSync(csvPath, 'utf-8');
-                const lines = fileContent.trim().split('\n');
-                if (lines.length >= 2) {
-                    // Parse CSV properly handling quoted fields
-                    const parseCSVLine = (line: string): string[] => {
-                        const result: string[] = [];
-                        let current = '';
-                        let inQuotes = false;
-                        
-                        for (let i = 0; i < line.length; i++) {
-                            const char = line[i];
-                            if (char === '"') {
-                                inQuotes = !inQuotes;
-                            } else if (char === ',' && !inQuotes) {
-                                result.push(current.trim());
-                                current = '';
-                            } else {
-                                current += char;
-                            }
+        return fs.statSync(file).mtimeMs;
+    } catch {
+        return 0;
+    }
+};
+
+const withAffiliateIds = (rows: any[]): any[] => {
+    const darazAffId = process.env.DARAZ_AFFILIATE_ID || "";
+    const priceoyeAffId = process.env.PRICEOYE_AFFILIATE_ID || "";
+    if (!darazAffId && !priceoyeAffId) return rows;
+
+    const affiliateUrl = (url: string, source: string): string => {
+        if (!url) return url;
+        const separator = url.includes('?') ? '&' : '?';
+        if (source === "Daraz Real-time" && darazAffId && !url.includes('aff_id')) {
+            return `${url}${separator}aff_id=${darazAffId}`;
+        }
+        if (source === "PriceOye Real-time" && priceoyeAffId) {
+            return `${url}${separator}utm_source=aff_retail_monitor&utm_medium=affiliate&aff_id=${priceoyeAffId}`;
+        }
+        return url;
+    };
+
+    return rows.map((row) => {
+        const url = affiliateUrl(row.URL, row.Source);
+        // Other stores' prices for the same product (see execution/product_matching.py)
+        const offers = row.Offers?.map((offer: any) => ({ ...offer, URL: affiliateUrl(offer.URL, offer.Source) }));
+        if (url === row.URL && !offers) return row;
+        return offers ? { ...row, URL: url, Offers: offers } : { ...row, URL: url };
+    });
+};
+
+// Swaps each summary's top-K row indexes for the rows themselves, once per artifact load
+const resolveSummaries = (summaries: Summaries | undefined, rows: any[]): Summaries | null => {
+    if (!summaries) return null;
+    const resolve = (groups: Record<string, Summary>) => Object.fromEntries(
+        Object.entries(groups).map(([name, s]) => [name, { ...s, top: s.top.map((i: number) => rows[i]) }])
+    );
+    return {
+        top_k: summaries.top_k,
+        sections: Object.fromEntries(Object.entries(summaries.sections).map(([name, groups]) => [name, resolve(groups)])),
+        sources: resolve(summaries.sources),
+        categories: resolve(summaries.categories),
+    };
+};
+
+const buildIndexes = (rows: any[]): Indexes => {
+    const indexes: Indexes = { category: {}, source: {} };
+    rows.forEach((row, i) => {
+        const category = (row.Category || '').trim();
+        (indexes.category[category] ||= []).push(i);
+        (indexes.source[row.Source || ''] ||= []).push(i);
+    });
+    return indexes;
+};
+
+// Fallback for when the serving artifact has not been published yet
+const loadLegacyRows = (): any[] => {
+    let allData: any[] = [];
+
+    // 1. Process CSV Data (clothing and shoes)
+    if (fs.existsSync(csvPath)) {
+        try {
+            const fileContent = fs.readFileSync(csvPath, 'utf-8');
+            const lines = fileContent.trim().split('\n');
+            if (lines.length >= 2) {
+                // Parse CSV properly handling quoted fields
+                const parseCSVLine = (line: string): string[] => {
+                    const result: string[] = [];
+                    let current = '';
+                    let inQuotes = false;
+
+                    for (let i = 0; i < line.length; i++) {
+                        const char = line[i];
+                        if (char === '"') {
+                            inQuotes = !inQuotes;
+                        } else if (char === ',' && !inQuotes) {
+                            result.push(current.trim());
+                            current = '';
+                        } else {
+                            current += char;
                         }
-                        result.push(current.trim());
-                        return result;
-                    };
-                    
-                    const headers = parseCSVLine(lines[0]);
-                    const csvData = lines.slice(1)
-                        .filter(line => line.trim().length > 0)
-                        .map(line => {
-                            const values = parseCSVLine(line);
-                            const entry: any = {};
-                            headers.forEach((header, index) => {
-                                let val = values[index] ? values[index].replace(/^"|"$/g, '').trim() : '';
-                                entry[header] = val;
-                            });
-                            // Normalize discount percentage format to match electronics data (add - prefix if missing)
-                            if (entry["Discount Percentage"] && !entry["Discount Percentage"].startsWith('-')) {
-                                entry["Discount Percentage"] = `-${entry["Discount Percentage"]}`;
-                            }
-                            return entry;
+                    }
+                    result.push(current.trim());
+                    return result;
+                };
+
+                const headers = parseCSVLine(lines[0]);
+                const csvData = lines.slice(1)
+                    .filter(line => line.trim().length > 0)
+                    .map(line => {
+                        const values = parseCSVLine(line);
+                        const entry: any = {};
+                        headers.forEach((header, index) => {
+                            entry[header] = values[index] ? values[index].replace(/^"|"$/g, '').trim() : '';
                         });
-                    allData = [...csvData];
-                    console.log(`Loaded ${csvData.length} items from CSV (clothing/shoes)`);
-                }
-            } catch (csvError) {
-                console.error("Error parsing CSV:", csvError);
+                        // Normalize discount percentage format to match electronics data (add - prefix if missing)
+                        if (entry["Discount Percentage"] && !entry["Discount Percentage"].startsWith('-')) {
+                            entry["Discount Percentage"] = `-${entry["Discount Percentage"]}`;
+                        }
+                        return entry;
+                    });
+                allData = [...csvData];
             }
-        } else {
-            console.log(`CSV file not found at ${csvPath}. Run scraper to generate clothing/shoes data.`);
+        } catch (csvError) {
+            console.error("Error parsing CSV:", csvError);
         }
+    } else {
+        console.log(`CSV file not found at ${csvPath}. Run scraper to generate clothing/shoes data.`);
+    }
 
-        // 2. Process Daraz JSON Data
-        if (fs.existsSync(darazPath)) {
-            const darazRaw = fs.readFileSync(darazPath, 'utf-8');
-            const darazJson = JSON.parse(darazRaw);
-
-            const darazItems = darazJson.map((item: any) => {
-                let url = item.product_url;
-                if (darazAffId && !url.includes('aff_id')) {
-                    const separator = url.includes('?') ? '&' : '?';
-                    url += `${separator}aff_id=${darazAffId}`;
-                }
-
-                return {
-                    "Brand Name": item.name.length > 30 ? item.name.substring(0, 30) + "..." : item.name,
-                    "Category": item.category === "Mobiles" ? "Mobile" : (item.category || "Electronics"),
-                    "Discount Percentage": `-${item.discount_percentage}%`,
-                    "Source": "Daraz Real-time",
-                    "URL": url,
-                    "ImageURL": item.image_url,
-                    "FullTitle": item.name,
-                    "Rating": item.rating,
-                    "Reviews": item.reviews,
-                    "Price": item.sale_price,
-                    "OriginalPrice": item.original_price
-                };
-            });
-            allData = [...allData, ...darazItems];
+    // 2. Process Daraz JSON Data
+    if (fs.existsSync(darazPath)) {
+        const darazJson = JSON.parse(fs.readFileSync(darazPath, 'utf-8'));
+        allData = [...allData, ...darazJson.map((item: any) => ({
+            "Brand Name": item.name.length > 30 ? item.name.substring(0, 30) + "..." : item.name,
+            "Category": item.category === "Mobiles" ? "Mobile" : (item.category || "Electronics"),
+            "Discount Percentage": `-${item.discount_percentage}%`,
+            "Source": "Daraz Real-time",
+            "URL": item.product_url,
+            "ImageURL": item.image_url,
+            "FullTitle": item.name,
+            "Rating": item.rating,
+            "Reviews": item.reviews,
+            "Price": item.sale_price,
+            "OriginalPrice": item.original_price
+        }))];
+    }
+
+    // 3. Process PriceOye JSON Data
+    if (fs.existsSync(priceoyePath)) {
+        const priceoyeJson = JSON.parse(fs.readFileSync(priceoyePath, 'utf-8'));
+        allData = [...allData, ...priceoyeJson.map((item: any) => ({
+            "Brand Name": item.name.length > 30 ? item.name.substring(0, 30) + "..." : item.name,
+            "Category": (item.category === "Mobiles" || item.category === "Smart Phones" || item.category === "Mobile") ? "Mobile" : item.category,
+            "Discount Percentage": `-${item.discount_percentage}%`,
+            "Source": "PriceOye Real-time",
+            "URL": item.product_url,
+            "ImageURL": item.image_url,
+            "FullTitle": item.name,
+            "Price": item.sale_price,
+            "OriginalPrice": item.original_price
+        }))];
+    }
+
+    return allData;
+};
+
+const loadSales = (): SalesCache => {
+    const servingMtime = mtimeOf(servingPath);
+    const sourceMtimes = [mtimeOf(csvPath), mtimeOf(darazPath), mtimeOf(priceoyePath)];
+    // A source written since the last publish (e.g. a scraper run on its own) isn't in the
+    // artifact yet: serve the sources directly until it is republished
+    if (servingMtime && sourceMtimes.every(m => m <= servingMtime)) {
+        const stamp = `serving:${servingMtime}:${sourceMtimes.join(':')}`;
+        if (cache?.stamp !== stamp) {
+            const artifact = JSON.parse(fs.readFileSync(servingPath, 'utf-8'));
+            const rows = withAffiliateIds(artifact.rows);
+            cache = {
+                stamp,
+                version: artifact.version,
+                rows,
+                indexes: artifact.indexes,
+                summaries: resolveSummaries(artifact.summaries, rows)
+            };
         }
+        return cache!;
+    }
 
-        // 3. Process PriceOye JSON Data
-        if (fs.existsSync(priceoyePath)) {
-            const priceoyeRaw = fs.readFileSync(priceoyePath, 'utf-8');
-            const priceoyeJson = JSON.parse(priceoyeRaw);
-
-            const priceoyeItems = priceoyeJson.map((item: any) => {
-                let url = item.product_url;
-                if (priceoyeAffId) {
-                    const separator = url.includes('?') ? '&' : '?';
-                    url += `${separator}utm_source=aff_retail_monitor&utm_medium=affiliate&aff_id=${priceoyeAffId}`;
-                }
-
-                return {
-                    "Brand Name": item.name.length > 30 ? item.name.substring(0, 30) + "..." : item.name,
-                    "Category": (item.category === "Mobiles" || item.category === "Smart Phones" || item.category === "Mobile") ? "Mobile" : item.category,
-                    "Discount Percentage": `-${item.discount_percentage}%`,
-                    "Source": "PriceOye Real-time",
-                    "URL": url,
-                    "ImageURL": item.image_url,
-                    "FullTitle": item.name,
-                    "Price": item.sale_price,
-                    "OriginalPrice": item.original_price
-                };
-            });
-            allData = [...allData, ...priceoyeItems];
+    const stamp = `legacy:${sourceMtimes.join(':')}`;
+    if (cache?.stamp !== stamp) {
+        const rows = withAffiliateIds(loadLegacyRows());
+        cache = { stamp, version: stamp, rows, indexes: buildIndexes(rows), summaries: null };
+    }
+    return cache!;
+};
+
+const intersect = (a: number[], b: number[]): number[] => {
+    const set = new Set(b);
+    return a.filter(i => set.has(i));
+};
+
+export async function GET(request: Request) {
+    try {
+        const { searchParams } = new URL(request.url);
+        const category = searchParams.get('category');
+        const source = searchParams.get('source');
+        const pageParam = searchParams.get('page');
+        const limitParam = searchParams.get('limit');
+
+        const sales = loadSales();
+
+        const etag = `W/"${sales.version}:${searchParams.toString()}"`;
+        if (request.headers.get('if-none-match') === etag) {
+            return new NextResponse(null, { status: 304, headers: { ETag: etag } });
+        }
+
+        const headers = { ETag: etag, 'Cache-Control': 'no-cache' };
+
+        // ?summary=1: top deals, counts, discount stats and price buckets per category/source,
+        // as materialized at publish time (null until the first publish)
+        if (searchParams.has('summary')) {
+            return NextResponse.json(sales.summaries, { headers });
+        }
+
+        // Filters resolve through the precomputed indexes instead of scanning every row.
+        // `source` matches index keys containing it, so "Real" selects every live source.
+        let ids: number[] | null = null;
+        if (category && category !== 'All') {
+            ids = sales.indexes.category[category] || [];
+        }
+        if (source) {
+            const sourceIds = Object.entries(sales.indexes.source)
+                .filter(([key]) => key.includes(source))
+                .flatMap(([, idx]) => idx)
+                .sort((x, y) => x - y);
+            ids = ids ? intersect(ids, sourceIds) : sourceIds;
+        }
+        const rows = ids ? ids.map(i => sales.rows[i]) : sales.rows;
+
+        // Without paging parameters keep the original response shape: the full array
+        if (!pageParam && !limitParam) {
+            return NextResponse.json(rows, { headers });
         }
 
-        return NextResponse.json(allData);
+        const limit = Math.min(Math.max(parseInt(limitParam || '50', 10) || 50, 1), 500);
+        const page = Math.max(parseInt(pageParam || '1', 10) || 1, 1);
+        const start = (page - 1) * limit;
+        return NextResponse.json({
+            total: rows.length,
+            page,
+            limit,
+            items: rows.slice(start, start + limit)
+        }, { headers });
     } catch (e: any) {
         console.error("Error reading sales data:", e);
         return NextResponse.json({ error: String(e) }, { status: 500 });
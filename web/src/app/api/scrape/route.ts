@@ -1,46 +1,37 @@
 import { NextResponse } from 'next/server';
-import { exec } from 'child_process';
+import { execFile } from 'child_process';
 import path from 'path';
 
-export async function POST(): Promise<NextResponse> {
+const SOURCES = ['retail', 'daraz', 'priceoye'];
+
+// Queues a background scrape via execution/scrape_jobs.py and returns immediately.
+// Duplicate refresh requests coalesce into the pending job; poll /api/scrape/status?id=<job id>.
+export async function POST(request: Request): Promise<NextResponse> {
     try {
-        // Path to the python script relative to web/ root
-        const scriptPath = path.resolve(process.cwd(), '../execution/scrape_retailers.py');
         const projectRoot = path.resolve(process.cwd(), '..');
+        const scriptPath = path.resolve(process.cwd(), '../execution/scrape_jobs.py');
 
-        console.log(`Running scraper at: ${scriptPath}`);
-
-        return new Promise<NextResponse>((resolve) => {
-            const darazScript = path.resolve(process.cwd(), '../execution/scrape_daraz_electronics.py');
+        let sources: string[] = [];
+        try {
+            const body = await request.json();
+            if (Array.isArray(body?.sources)) {
+                sources = body.sources.filter((s: string) => SOURCES.includes(s));
+            }
+        } catch {
+            // No body: scrape everything
+        }
 
-            console.log(`Running main scraper: ${scriptPath}`);
+        const args = [scriptPath, 'enqueue', ...sources.flatMap(s => ['--source', s])];
 
-            exec(`python "${scriptPath}"`, { cwd: projectRoot }, (error, stdout, stderr) => {
+        return new Promise<NextResponse>((resolve) => {
+            execFile('python', args, { cwd: projectRoot }, (error, stdout, stderr) => {
                 if (error) {
-                    console.error(`Retail Scraper Error: ${error}`);
+                    console.error(`Scrape enqueue error: ${error}\n${stderr}`);
+                    resolve(NextResponse.json({ success: false, error: String(error) }, { status: 500 }));
+                    return;
                 }
-
-                console.log(`Running Daraz scraper: ${darazScript}`);
-                exec(`python "${darazScript}"`, { cwd: projectRoot }, (dError, dStdout, dStderr) => {
-                    if (dError) {
-                        console.error(`Daraz Scraper Error: ${dError}`);
-                    }
-
-                    const priceoyeScript = path.resolve(process.cwd(), '../execution/scrape_priceoye_electronics.py');
-                    console.log(`Running PriceOye scraper: ${priceoyeScript}`);
-                    exec(`python "${priceoyeScript}"`, { cwd: projectRoot }, (pError, pStdout, pStderr) => {
-                        if (pError) {
-                            console.error(`PriceOye Scraper Error: ${pError}`);
-                        }
-
-                        resolve(NextResponse.json({
-                            success: true,
-                            log: stdout + "\n" + dStdout + "\n" + pStdout,
-                            darazLog: dStdout,
-                            priceoyeLog: pStdout
-                        }));
-                    });
-                });
+                const job = JSON.parse(stdout);
+                resolve(NextResponse.json({ success: true, job }, { status: 202 }));
             });
         });
     } catch (e: any) {
@@ -0,0 +1,50 @@
+import { NextResponse } from 'next/server';
+import fs from 'fs';
+import path from 'path';
+
+const LOG_TAIL_LINES = 20;
+
+const tail = (file: string): string => {
+    try {
+        const lines = fs.readFileSync(file, 'utf-8').trimEnd().split('\n');
+        return lines.slice(-LOG_TAIL_LINES).join('\n');
+    } catch {
+        return '';
+    }
+};
+
+// Status of a scrape job written by execution/scrape_jobs.py (the latest job if no id is given)
+export async function GET(request: Request) {
+    try {
+        const jobsDir = path.resolve(process.cwd(), '../.tmp/scrape_jobs');
+        const id = new URL(request.url).searchParams.get('id');
+
+        let jobPath: string | null = null;
+        if (id) {
+            if (!/^[0-9a-f]+$/.test(id)) {
+                return NextResponse.json({ error: 'Invalid job id' }, { status: 400 });
+            }
+            jobPath = path.join(jobsDir, `${id}.json`);
+        } else if (fs.existsSync(jobsDir)) {
+            const jobs = fs.readdirSync(jobsDir)
+                .filter(name => name.endsWith('.json') && name !== 'runner.json')
+                .map(name => JSON.parse(fs.readFileSync(path.join(jobsDir, name), 'utf-8')))
+                .sort((a, b) => a.created_at.localeCompare(b.created_at));
+            if (jobs.length) jobPath = path.join(jobsDir, `${jobs[jobs.length - 1].id}.json`);
+        }
+
+        if (!jobPath || !fs.existsSync(jobPath)) {
+            return NextResponse.json({ error: 'Job not found' }, { status: 404 });
+        }
+
+        const job = JSON.parse(fs.readFileSync(jobPath, 'utf-8'));
+        for (const stage of Object.values<any>(job.stages || {})) {
+            if (stage.log) stage.logTail = tail(stage.log);
+            delete stage.log;
+        }
+        return NextResponse.json(job, { headers: { 'Cache-Control': 'no-store' } });
+    } catch (e: any) {
+        console.error("Error reading scrape job:", e);
+        return NextResponse.json({ error: String(e) }, { status: 500 });
+    }
+}
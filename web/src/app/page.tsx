@@ -1,6 +1,6 @@
 'use client';
 
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { Zap, Smartphone, ShoppingBag, Tag, RefreshCw, AlertCircle, Bell, X, Mail, ExternalLink, AlertTriangle, Briefcase, MessageSquare } from 'lucide-react';
 
 interface SaleItem {
@@ -11,6 +11,7 @@ interface SaleItem {
   "URL": string;
   // Merged fields
   "ImageURL"?: string;
+  "Thumb"?: string;    // Local thumbnail (/api/images/...) once execution/image_cache.py has cached it
   "FullTitle"?: string;
   "Rating"?: number;
   "Reviews"?: number;
@@ -18,8 +19,20 @@ interface SaleItem {
   "OriginalPrice"?: number;
 }
 
+// Per-section/category stats precomputed at publish time (/api/sales?summary=1)
+interface SectionSummary {
+  count: number;
+  avg_discount: number;
+  median_discount: number;
+}
+
+interface Summaries {
+  sections: Record<string, Record<string, SectionSummary>>;
+}
+
 export default function Home() {
   const [data, setData] = useState<SaleItem[]>([]);
+  const [summaries, setSummaries] = useState<Summaries | null>(null);
   const [loading, setLoading] = useState(false);
   const [scraping, setScraping] = useState(false);
   const [lastUpdated, setLastUpdated] = useState<string | null>(null);
@@ -55,7 +68,10 @@ export default function Home() {
   const fetchData = async () => {
     setLoading(true);
     try {
-      const res = await fetch('/api/sales');
+      const [res, summaryRes] = await Promise.all([fetch('/api/sales'), fetch('/api/sales?summary=1')]);
+      if (summaryRes.ok) {
+        setSummaries(await summaryRes.json());
+      }
       if (res.ok) {
         const json = await res.json();
         // Check if json is array
@@ -78,10 +94,22 @@ export default function Home() {
       const result = await res.json();
       if (!result.success) {
         alert("Scraping failed: " + result.error);
-      } else {
-        // Refresh data after successful scrape
-        await fetchData();
+        return;
+      }
+      // The scrape runs in the background; poll until the job finishes
+      let job = result.job;
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(r => setTimeout(r, 3000));
+        const statusRes = await fetch(`/api/scrape/status?id=${job.id}`);
+        if (!statusRes.ok) break;
+        job = await statusRes.json();
+      }
+      if (job.status === 'failed') {
+        const failed = Object.keys(job.stages || {}).filter(name => job.stages[name].status === 'failed');
+        alert("Scraping failed: " + failed.join(', '));
       }
+      // Refresh data; stages that succeeded have already published their results
+      await fetchData();
     } catch (error) {
       alert("Failed to trigger scraper");
     } finally {
@@ -93,6 +121,18 @@ export default function Home() {
     fetchData();
   }, []);
 
+  // Split once per data/category change instead of filtering the full array several times per render
+  const { liveItems, estimateItems } = useMemo(() => {
+    const liveItems: SaleItem[] = [];
+    const estimateItems: SaleItem[] = [];
+    for (const item of data) {
+      if (selectedCategory !== 'All' && item.Category?.trim() !== selectedCategory) continue;
+      (item.Source.includes('Real') ? liveItems : estimateItems).push(item);
+    }
+    return { liveItems, estimateItems };
+  }, [data, selectedCategory]);
+  const liveSummary = summaries?.sections?.live?.[selectedCategory];
+
   return (
     <main className="min-h-screen bg-neutral-900 text-white p-8 font-sans">
       <div className="max-w-6xl mx-auto space-y-8">
@@ -168,24 +208,27 @@ export default function Home() {
           <div className="space-y-12">
 
             {/* Real Data Section */}
-            {data.filter(i => i.Source.includes('Real') && (selectedCategory === 'All' || i.Category?.trim() === selectedCategory)).length > 0 && (
+            {liveItems.length > 0 && (
               <section>
                 <h2 className="text-2xl font-bold mb-6 flex items-center gap-2 text-green-400">
                   <span className="w-2 h-8 bg-green-500 rounded-full"></span>
                   Verified Live Sales {selectedCategory !== 'All' && <span className="text-neutral-500 text-sm font-normal">in {selectedCategory}</span>}
+                  {liveSummary && (
+                    <span className="text-neutral-500 text-sm font-normal">
+                      {liveSummary.count} deals, avg {Math.round(liveSummary.avg_discount)}% off
+                    </span>
+                  )}
                 </h2>
                 <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-                  {data
-                    .filter(i => i.Source.includes('Real') && (selectedCategory === 'All' || i.Category?.trim() === selectedCategory))
-                    .map((item, idx) => (
-                      <BrandCard key={idx} item={item} />
-                    ))}
+                  {liveItems.map((item, idx) => (
+                    <BrandCard key={idx} item={item} />
+                  ))}
                 </div>
               </section>
             )}
 
             {/* Estimated/Frequent Data Section */}
-            {data.filter(i => !i.Source.includes('Real') && (selectedCategory === 'All' || i.Category?.trim() === selectedCategory)).length > 0 && (
+            {estimateItems.length > 0 && (
               <section>
                 <h2 className="text-2xl font-bold mb-6 flex items-center gap-2 text-neutral-400">
                   <span className="w-2 h-8 bg-neutral-600 rounded-full"></span>
@@ -195,11 +238,9 @@ export default function Home() {
                   These brands frequently have sales. Click "Visit Site" to check current offers manually.
                 </p>
                 <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6 opacity-90">
-                  {data
-                    .filter(i => !i.Source.includes('Real') && (selectedCategory === 'All' || i.Category?.trim() === selectedCategory))
-                    .map((item, idx) => (
-                      <BrandCard key={idx} item={item} />
-                    ))}
+                  {estimateItems.map((item, idx) => (
+                    <BrandCard key={idx} item={item} />
+                  ))}
                 </div>
               </section>
             )}
@@ -366,7 +407,7 @@ function BrandCard({ item }: { item: SaleItem }) {
       ? `/assets/clothing_${variant}.png` // Generic for tech placeholders
       : `/assets/clothing_${variant}.png`;
 
-  const imagePath = item.ImageURL || placeholderPath;
+  const imagePath = item.Thumb || item.ImageURL || placeholderPath;
 
   return (
     <div className="group bg-neutral-800 border border-neutral-700 rounded-xl overflow-hidden hover:border-teal-500/50 transition-all hover:shadow-xl hover:-translate-y-1">
@@ -375,6 +416,8 @@ function BrandCard({ item }: { item: SaleItem }) {
         <img
           src={imagePath}
           alt={item.Category}
+          loading="lazy"
+          decoding="async"
           className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-500"
         />
         <div className="absolute inset-0 bg-gradient-to-t from-neutral-900 to-transparent opacity-90"></div>